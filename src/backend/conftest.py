@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def users():
+    # One (days, values) weight series per user: assorted lengths (including empty), sorted random days,
+    # a downward trend with noise and about 15% NaN gap days
+    rng = np.random.default_rng(0)
+    series = []
+    for length in (0, 1, 5, 40, 300):
+        days = np.sort(rng.choice(400, length, replace=False)).astype(float)
+        values = 80 - 0.05 * days + rng.normal(0, 0.8, length)
+        values[rng.random(length) < 0.15] = np.nan
+        series.append((days, values))
+    return series
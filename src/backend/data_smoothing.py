@@ -1,38 +1,144 @@
+"""
+Savitzky-Golay smoothing of weight histories.
+
+`dynamic_savgol_filter` smooths a whole series held in memory. For unbounded histories the streaming
+functions below produce exactly the same values as a full-array `savgol_filter(x, window_length,
+polyorder)` call (mode "interp") while holding only the last window_length - 1 points:
+
+    - Interior points are a fixed convolution over window_length neighbours, so a chunk only needs the
+      window_length - 1 points before it (overlap-save).
+    - The first and last window_length // 2 points are fitted by savgol_filter on the first and last
+      window_length points, as the full-array call does.
+
+`append_savgol` adds new points to a state dict and recomputes only the tail: the previous
+window_length // 2 provisional edge values plus the new points. `savgol_filter_chunked` runs it over an
+iterable of chunks and yields the smoothed series chunk by chunk.
+"""
 import numpy as np
-from scipy.signal import savgol_filter
+from scipy.ndimage import convolve1d
+from scipy.signal import savgol_coeffs, savgol_filter
+
+MIN_DYNAMIC_POINTS = 30
 
 def dynamic_savgol_filter(data):
     """
     Dynamically apply Savitzky-Golay filter with calculated window size and polynomial order.
-    
+
     Parameters:
         data (list or np.array): Input data sequence.
-    
+
     Returns:
         np.array: Smoothed data sequence.
     """
     n = len(data)
-    if n < 30 or n > 1000:
-        raise ValueError("Dataset size must be between 30 and 1000.")
-    
+    if n < MIN_DYNAMIC_POINTS:
+        raise ValueError(f"Dataset size must be at least {MIN_DYNAMIC_POINTS}.")
+
     # Calculate window size (must be odd, around 5% of the dataset size, capped at 101)
     window_size = min(max(5, (n // 20) | 1), 101)
-    
+
     # Polynomial order (fixed at 2 for weight data)
     poly_order = 2
-    
+
     # Ensure window size > poly_order
     if window_size <= poly_order:
         raise ValueError("Window size must be greater than polynomial order.")
-    
+
     # Apply Savitzky-Golay filter
     smoothed_data = savgol_filter(data, window_size, poly_order)
     return smoothed_data
 
-# Example usage
-np.random.seed(42)
-example_data = np.random.normal(70, 0.5, 500)  # Simulate 500 weight measurements with noise
-smoothed_data = dynamic_savgol_filter(example_data)
+def init_savgol_state(window_length, polyorder):
+    """
+    Create an empty streaming Savitzky-Golay state.
+
+    Parameters:
+        window_length (int): Odd filter window length.
+        polyorder (int): Polynomial order, less than window_length.
+
+    Returns:
+        dict: State for append_savgol.
+    """
+    if window_length < 1 or window_length % 2 == 0:
+        raise ValueError("window_length must be a positive odd integer.")
+    if not 0 <= polyorder < window_length:
+        raise ValueError("polyorder must be less than window_length.")
+    return {"window_length": int(window_length), "polyorder": int(polyorder), "count": 0, "tail": np.empty(0)}
+
+def append_savgol(state, points):
+    """
+    Append points to a streaming Savitzky-Golay filter.
+
+    Parameters:
+        state (dict): State from init_savgol_state or a previous append.
+        points (list or np.array): New data points.
+
+    Returns:
+        tuple: (start, values, new state). values are the smoothed values at indices start onwards
+        (through the last point so far) and replace any earlier values from start on. The last
+        window_length // 2 of them are provisional and change with the next append. If there is nothing
+        to recompute (no new points, or fewer than window_length points so far), values is empty and
+        start is the number of points so far.
+    """
+    window_length, polyorder = state["window_length"], state["polyorder"]
+    half = window_length // 2
+    points = np.asarray(points, dtype=float)
+    old_count, count = state["count"], state["count"] + len(points)
+    buffer = np.concatenate((state["tail"], points))
+    new_state = dict(state, count=count, tail=buffer[-(window_length - 1):] if window_length > 1 else np.empty(0))
+    if len(points) == 0 or count < window_length:
+        return count, np.empty(0), new_state
+
+    # buffer holds the points from index offset on; recompute from the first provisional value
+    offset = count - len(buffer)
+    start = 0 if old_count < window_length else old_count - half
+    values = np.empty(count - start)
+    if start < half:
+        values[:half - start] = savgol_filter(buffer[:window_length], window_length, polyorder)[start:half]
+    interior_start = max(start, half)
+    if interior_start < count - half:
+        coefficients = savgol_coeffs(window_length, polyorder)
+        lo, hi = interior_start - half - offset, count - offset
+        interior = convolve1d(buffer[lo:hi], coefficients, mode="constant")[half:hi - lo - half]
+        values[interior_start - start:count - half - start] = interior
+    values[count - half - start:] = savgol_filter(buffer[-window_length:], window_length, polyorder)[window_length - half:]
+    return start, values, new_state
+
+def savgol_filter_chunked(chunks, window_length, polyorder):
+    """
+    Smooth a series supplied in chunks, in bounded memory. The concatenated output equals
+    savgol_filter(np.concatenate(chunks), window_length, polyorder).
+
+    Parameters:
+        chunks (iterable): Iterable of arrays (e.g. a generator reading the history in pieces).
+        window_length (int): Odd filter window length.
+        polyorder (int): Polynomial order, less than window_length.
+
+    Yields:
+        np.array: Consecutive pieces of the smoothed series.
+    """
+    state = init_savgol_state(window_length, polyorder)
+    emitted, pending = 0, np.empty(0)
+    for chunk in chunks:
+        start, values, state = append_savgol(state, chunk)
+        if len(values) == 0:
+            continue
+        # Everything before the last window_length // 2 values is final
+        final = len(values) - window_length // 2
+        if final > emitted - start:
+            yield values[emitted - start:final]
+            emitted = start + final
+        pending = values[emitted - start:]
+    if state["count"] < window_length:
+        raise ValueError("window_length must be less than or equal to the size of the series.")
+    if len(pending):
+        yield pending
+
+if __name__ == "__main__":
+    # Example usage
+    np.random.seed(42)
+    example_data = np.random.normal(70, 0.5, 500)  # Simulate 500 weight measurements with noise
+    smoothed_data = dynamic_savgol_filter(example_data)
 
-print("Original Data (first 10):", example_data[:10])
-print("Smoothed Data (first 10):", smoothed_data[:10])
+    print("Original Data (first 10):", example_data[:10])
+    print("Smoothed Data (first 10):", smoothed_data[:10])
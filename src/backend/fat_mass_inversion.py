@@ -0,0 +1,152 @@
+"""
+Exact inversion of the NHANES FFM equation for the baseline fat mass.
+
+`thomas_model.calculate_baseline_fat_mass` estimates the initial fat mass F(0) from a linear regression
+because solving weight = FFM(F, age, height) + F with a root finder for every person was slow. This
+module serves the exact solution from a precomputed table instead:
+
+    - For each sex, F is solved once on a regular (age, height, weight) grid. For every (age, height)
+      node the curve W(F) = FFM(F) + F is tabulated on a fine fat mass grid, inverted along its monotone
+      branch (from F = 0 while FFM > 0 and dW/dF >= MIN_SLOPE) and polished with Newton steps using
+      the closed-form dFFM/dF, so the stored values are exact to rounding.
+    - Queries use trilinear interpolation, which preserves the monotonicity in weight. The table's
+      `error_bound` is ERROR_BOUND_SAFETY times the largest interpolation error at the cell centres
+      (where multilinear interpolation of smooth data errs most), measured against the exact root when
+      the table is built. It is dominated by extreme corners (very heavy, short profiles near the end of
+      the branch); for typical adults the interpolation error is a few grams.
+    - With refine=True the interpolated value is polished by Newton steps, giving the exact root at the
+      cost of a few vectorized polynomial evaluations.
+
+Where the equation has no root on the monotone branch (weight below FFM at zero fat mass, beyond the
+branch, or outside the grid) the result is NaN. With the female coefficients in FFM_COEFFICIENTS the
+branch ends below 1 kg of fat mass, so female profiles generally have no valid root.
+"""
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+from thomas_model import evaluate_ffm_polynomial
+
+DEFAULT_AGES = np.arange(18.0, 100.1, 2.0)        # years
+DEFAULT_HEIGHTS = np.arange(130.0, 220.1, 2.5)    # cm
+DEFAULT_WEIGHTS = np.arange(30.0, 300.1, 2.0)     # kg
+FAT_MASS_GRID = np.arange(0.0, 200.01, 0.05)      # kg, used to bracket the root before polishing
+NEWTON_STEPS = 5
+MIN_SLOPE = 0.5  # Minimum dW/dF on the branch; near the fold of W(F) the inverse is ill-conditioned
+RESIDUAL_TOLERANCE = 1e-6  # kg; larger residuals after polishing are reported as no root
+ERROR_BOUND_SAFETY = 2.0
+
+_TABLES = {}
+
+
+def _newton(fat_mass, weight_kg, years, height_cm, sex, steps=NEWTON_STEPS):
+    for _ in range(steps):
+        ffm, dffm_df, _ = evaluate_ffm_polynomial(fat_mass, years, height_cm, sex)
+        fat_mass = fat_mass - (ffm + fat_mass - weight_kg) / (1 + dffm_df)
+    ffm, dffm_df, _ = evaluate_ffm_polynomial(fat_mass, years, height_cm, sex)
+    valid = (np.abs(ffm + fat_mass - weight_kg) < RESIDUAL_TOLERANCE) & (ffm > 0) & (1 + dffm_df >= MIN_SLOPE) & (fat_mass >= 0)
+    return np.where(valid, fat_mass, np.nan)
+
+
+class FatMassTable:
+    """
+    Precomputed exact baseline fat mass for one sex on an (age, height, weight) grid.
+
+    Parameters:
+        sex (str): "male" or "female".
+        ages (np.ndarray): Age grid in years (increasing).
+        heights (np.ndarray): Height grid in centimeters (increasing).
+        weights (np.ndarray): Weight grid in kilograms (increasing).
+    """
+
+    def __init__(self, sex, ages=DEFAULT_AGES, heights=DEFAULT_HEIGHTS, weights=DEFAULT_WEIGHTS):
+        self.sex = sex
+        self.ages, self.heights, self.weights = (np.asarray(x, dtype=float) for x in (ages, heights, weights))
+        age_grid, height_grid = np.meshgrid(self.ages, self.heights, indexing="ij")
+        ffm, dffm_df, _ = evaluate_ffm_polynomial(FAT_MASS_GRID, age_grid[..., None], height_grid[..., None], sex)
+        total = ffm + FAT_MASS_GRID
+        # Monotone branch: the prefix of the fat mass grid where FFM > 0 and dW/dF >= MIN_SLOPE
+        branch = np.cumprod((ffm > 0) & (1 + dffm_df >= MIN_SLOPE), axis=-1).astype(bool)
+
+        values = np.full((len(self.ages), len(self.heights), len(self.weights)), np.nan)
+        for i in range(len(self.ages)):
+            for j in range(len(self.heights)):
+                end = branch[i, j].sum()
+                if end >= 2:
+                    values[i, j] = np.interp(self.weights, total[i, j, :end], FAT_MASS_GRID[:end], left=np.nan, right=np.nan)
+        self.values = _newton(
+            values, self.weights[None, None, :], self.ages[:, None, None], self.heights[None, :, None], sex
+        )
+        self._interpolator = RegularGridInterpolator(
+            (self.ages, self.heights, self.weights), self.values, bounds_error=False, fill_value=np.nan
+        )
+
+        # Interpolation error at the cell centres against the exact root
+        centres = np.meshgrid(*((grid[:-1] + grid[1:]) / 2 for grid in (self.ages, self.heights, self.weights)), indexing="ij")
+        approximate = self.lookup(centres[2], centres[0], centres[1])
+        error = np.abs(approximate - _newton(approximate, centres[2], centres[0], centres[1], sex))
+        self.error_bound = ERROR_BOUND_SAFETY * np.nanmax(error) if np.isfinite(error).any() else 0.0
+
+    def lookup(self, weight_kg, age, height_cm, refine=False):
+        """
+        Interpolate the baseline fat mass.
+
+        Parameters:
+            weight_kg (float or np.ndarray): Weight in kilograms.
+            age (float or np.ndarray): Age in years.
+            height_cm (float or np.ndarray): Height in centimeters.
+            refine (bool): Polish the interpolated value with Newton steps (exact to rounding).
+
+        Returns:
+            np.ndarray: Fat mass in kilograms (within error_bound of the exact root unless refined),
+            NaN where there is no valid root.
+        """
+        weight_kg, age, height_cm = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (weight_kg, age, height_cm)))
+        fat_mass = self._interpolator(np.stack([age, height_cm, weight_kg], axis=-1)).reshape(weight_kg.shape)
+        if refine:
+            fat_mass = _newton(fat_mass, weight_kg, age, height_cm, self.sex)
+        return fat_mass
+
+
+def get_fat_mass_table(sex):
+    """
+    Return the default table for a sex, building it on first use (about a second per sex).
+
+    Parameters:
+        sex (str): "male" or "female".
+
+    Returns:
+        FatMassTable: Shared table instance.
+    """
+    if sex not in ("male", "female"):
+        raise ValueError("Sex must be 'male' or 'female'.")
+    if sex not in _TABLES:
+        _TABLES[sex] = FatMassTable(sex)
+    return _TABLES[sex]
+
+
+def calculate_baseline_fat_mass_exact(weight_kg, age, height_cm, sex, refine=True):
+    """
+    Solve weight_kg = FFM(F, age, 0, height_cm, sex) + F for the baseline fat mass F. Works on scalars and
+    arrays; `sex` may be a string or an array of strings.
+
+    Parameters:
+        weight_kg (float or np.ndarray): Weight in kilograms.
+        age (float or np.ndarray): Age in years.
+        height_cm (float or np.ndarray): Height in centimeters.
+        sex (str or array of str): "male" or "female".
+        refine (bool): Polish the table value with Newton steps (default). Without it the result is
+            within get_fat_mass_table(sex).error_bound of the exact root.
+
+    Returns:
+        float or np.ndarray: Baseline fat mass in kilograms, NaN where the equation has no valid root.
+    """
+    if isinstance(sex, str):
+        fat_mass = get_fat_mass_table(sex).lookup(weight_kg, age, height_cm, refine)
+    else:
+        sex, weight_kg, age, height_cm = np.broadcast_arrays(np.asarray(sex), *(np.asarray(x, dtype=float) for x in (weight_kg, age, height_cm)))
+        fat_mass = np.full(sex.shape, np.nan)
+        for value in ("male", "female"):
+            selected = sex == value
+            if selected.any():
+                fat_mass[selected] = get_fat_mass_table(value).lookup(weight_kg[selected], age[selected], height_cm[selected], refine)
+    return float(fat_mass) if np.ndim(fat_mass) == 0 else fat_mass
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# As in hall-model-backend.py: the model-independent modules live one level up in src/backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -1,10 +1,20 @@
 import base64
+import os
+import sys
 from datetime import datetime as dt
+
+# The model-independent modules (trajectory, simulation_cache, ...) live one level up in src/backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from flask import Flask, render_template, request, jsonify
-from hall_model import calculate_energy_intake_for_target_weight, calculate_tee, simulate_hall_model
+from hall_model import calculate_energy_intake_for_target_weight, calculate_tee, simulate_hall_model, MODEL_VERSION
 from plot_models import get_weight_loss_plot_image, get_energy_expenditure_plot_image
+from simulation_cache import SimulationCache, normalize_value
 
 app = Flask(__name__, template_folder='templates')
+# Shared by the forward simulation, the target-weight solver and the rendered plots
+SIMULATION_CACHE = SimulationCache()
+cached_simulate_hall_model = SIMULATION_CACHE.wrap(simulate_hall_model, MODEL_VERSION)
+cached_calculate_energy_intake_for_target_weight = SIMULATION_CACHE.wrap(calculate_energy_intake_for_target_weight, MODEL_VERSION)
 MJ_TO_KCAL = 239.006
 KG_TO_LBS = 2.20462
 IN_TO_M = 0.0254
@@ -50,7 +60,7 @@ def simulate():
         duration = data['duration']
         baseline_ci = 0.5 * data['energy_intake'] / 4
 
-        results = simulate_hall_model(duration, sex, age, weight, height, energy_intake, baseline_ci, energy_intake, body_fat_percentage, pal_factor)
+        results = cached_simulate_hall_model(duration, sex, age, weight, height, energy_intake, baseline_ci, energy_intake, body_fat_percentage, pal_factor)
         maintenance_message = ""
     else:
         # Target Weight Mode
@@ -61,19 +71,21 @@ def simulate():
         baseline_ei = calculate_tee(weight, age, sex, 10.0, 0, pal_factor) # estimate of energy intake with 10 MJ/day EI assumed for TEF
         baseline_ci = 0.5 * baseline_ei / 4 # 50% of baseline energy intake for carbohydrate intake
 
-        results, required_energy_intake, maintenance_calories = calculate_energy_intake_for_target_weight(
+        results, required_energy_intake, maintenance_calories = cached_calculate_energy_intake_for_target_weight(
             duration, target_weight, sex, age, weight, height, baseline_ci, baseline_ei, body_fat_percentage, pal_factor
         )
 
         maintenance_message = f"Required energy intake of {required_energy_intake:.2f} to reach {data['target_weight']:.2f} lbs by {data['target_date']} and then {maintenance_calories:.2f} kcal/day to maintain new weight."
 
-    # Generate plots
-    weight_loss_plot_buffer = get_weight_loss_plot_image(results)
-    energy_expenditure_plot_buffer = get_energy_expenditure_plot_image(results)
+    # Generate plots (cached per normalized request, like the simulation itself)
+    weight_loss_plot_buffer, energy_expenditure_plot_buffer = SIMULATION_CACHE.get_or_compute(
+        ("plots", MODEL_VERSION, normalize_value(data)),
+        lambda: (get_weight_loss_plot_image(results), get_energy_expenditure_plot_image(results)),
+    )
 
     # Prepare response
     response = {
-        "results": results,
+        "results": results.to_records(),
         "weight_loss_plot": f"data:image/png;base64,{base64.b64encode(weight_loss_plot_buffer).decode('utf-8')}",
         "energy_expenditure_plot": f"data:image/png;base64,{base64.b64encode(energy_expenditure_plot_buffer).decode('utf-8')}",
         "maintenance_message": maintenance_message
@@ -82,6 +94,13 @@ def simulate():
 
     return jsonify(response)
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Return the simulation cache hit/miss/eviction counters.
+    """
+    return jsonify(SIMULATION_CACHE.stats())
+
 @app.route("/")
 def index():
     return render_template("index.html")
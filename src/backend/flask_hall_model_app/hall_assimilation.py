@@ -0,0 +1,244 @@
+"""
+Data assimilation of weigh-ins into Hall model forecasts, vectorized across users.
+
+`simulate_hall_model` forecasts from day 0 and never looks at what the scale said afterwards; the
+trend smoothers look at the scale but know nothing about energy balance. This module combines both in
+an extended Kalman filter:
+
+    - The process model is `hall_model_batch.step_hall_model_batch`, the daily forward-Euler step of
+      `simulate_hall_model_batch`, so without readings the filter reproduces the batch forecast.
+    - The filtered state per user is x = (fat mass, lean mass, intake bias). The intake bias (MJ/day)
+      is added to the planned energy balance and follows a random walk; it absorbs the difference
+      between the planned and the real intake, which is the main source of forecast error.
+      Glycogen, ECF and adaptive thermogenesis follow their deterministic dynamics.
+    - A scale reading measures fat + lean + glycogen + ECF with noise scale_sd.
+
+All users are held in one struct-of-arrays state dict (one entry per user in every array, the
+covariances as an (N, 3, 3) array). Each user can be at a different day: readings are assimilated by
+predicting every user to the day of their reading and updating, in O(days since last reading) per
+user and without re-simulating from day 0. `forecast_assimilation` then projects the corrected state
+forward with its uncertainty.
+"""
+import numpy as np
+
+from hall_model import BETA_TEF, FORBES_CONSTANT, MJ_TO_KCAL, PAL_FACTORS, RHO_F, RHO_L, RMR
+from hall_model_batch import STATE_FIELDS, calculate_initial_fat_mass_batch, step_hall_model_batch
+
+DEFAULT_SCALE_SD = 0.5          # kg, scale noise plus day-to-day water and gut content
+DEFAULT_FAT_MASS_SD = 3.0       # kg, prior uncertainty of the initial fat mass
+DEFAULT_INTAKE_BIAS_SD = 1.5    # MJ/day (~360 kcal), prior uncertainty of the real versus planned intake
+DEFAULT_BIAS_DRIFT_SD = 0.05    # MJ/day per day, random walk of the intake bias
+DEFAULT_MASS_NOISE_SD = 0.005   # kg per day, unmodelled fat and lean mass changes
+MEASUREMENT = np.array([1.0, 1.0, 0.0])  # A reading observes fat + lean (plus the deterministic glycogen and ECF)
+
+
+def create_assimilation_state(sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"],
+                              fat_mass_sd=DEFAULT_FAT_MASS_SD, intake_bias_sd=DEFAULT_INTAKE_BIAS_SD, scale_sd=DEFAULT_SCALE_SD,
+                              bias_drift_sd=DEFAULT_BIAS_DRIFT_SD, mass_noise_sd=DEFAULT_MASS_NOISE_SD):
+    """
+    Build the day-0 filter state for many users. Profile arguments are broadcast to a common shape (N,)
+    and have the same meaning and units as for `hall_model_batch.simulate_hall_model_batch`.
+
+    Parameters:
+        sex ... pal_factor: As for `simulate_hall_model_batch` (energy in MJ/day, height in meters).
+        fat_mass_sd (float): Prior standard deviation of the initial fat mass (kg). Use a smaller value
+            when body_fat_percentage was measured.
+        intake_bias_sd (float): Prior standard deviation of the intake bias (MJ/day).
+        scale_sd (float): Standard deviation of a scale reading (kg).
+        bias_drift_sd (float): Daily random-walk standard deviation of the intake bias (MJ/day).
+        mass_noise_sd (float): Daily process noise of fat and lean mass (kg).
+
+    Returns:
+        dict: Filter state (arrays with one entry per user; "covariance" has shape (N, 3, 3)).
+    """
+    sex = np.atleast_1d(np.asarray(sex))
+    is_male, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, pal_factor = np.broadcast_arrays(
+        sex == "male", *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (age, body_weight, height, energy_intake, baseline_ci, baseline_ei, pal_factor))
+    )
+    if body_fat_percentage is not None:
+        body_fat_percentage = np.broadcast_to(np.asarray(body_fat_percentage, dtype=float), is_male.shape)
+    n_users = is_male.shape[0]
+
+    fat_mass = calculate_initial_fat_mass_batch(is_male, age, body_weight, height, body_fat_percentage)
+    glycogen = np.full(n_users, 0.5)  # Initial glycogen stores in kg
+    ecf = np.full(n_users, 2.0)       # Initial extracellular fluid in kg
+    lean_mass = np.maximum(body_weight - fat_mass - glycogen - ecf, 0)
+
+    # The initial weight is known to within scale_sd, so fat and lean mass errors are anti-correlated
+    covariance = np.zeros((n_users, 3, 3))
+    covariance[:, 0, 0] = fat_mass_sd ** 2
+    covariance[:, 1, 1] = fat_mass_sd ** 2 + scale_sd ** 2
+    covariance[:, 0, 1] = covariance[:, 1, 0] = -fat_mass_sd ** 2
+    covariance[:, 2, 2] = intake_bias_sd ** 2
+
+    return {
+        "model": "hall_assimilation",
+        "day": np.zeros(n_users, dtype=np.int64),
+        "is_male": is_male.copy(), "age": age.copy(), "pal_factor": pal_factor.copy(),
+        "energy_intake": energy_intake.copy(), "baseline_ci": baseline_ci.copy(), "baseline_ei": baseline_ei.copy(),
+        "weight": body_weight.copy(), "fat_mass": fat_mass, "lean_mass": lean_mass,
+        "glycogen": glycogen, "ecf": ecf, "at": np.zeros(n_users), "intake_bias": np.zeros(n_users),
+        "covariance": covariance,
+        "scale_sd": float(scale_sd),
+        "process_noise": np.diag([mass_noise_sd ** 2, mass_noise_sd ** 2, bias_drift_sd ** 2]),
+    }
+
+
+def _step(state, active):
+    """
+    Advance the users in `active` by one day: the mean with the Hall model Euler step, the covariance
+    with its Jacobian.
+    """
+    step = step_hall_model_batch(state, state["intake_bias"])
+    weight, rmr, p, delta_energy = state["weight"], step["rmr"], step["p"], step["delta_energy"]
+
+    # Jacobian of (fat mass, lean mass, intake bias) -> next day. Weight enters through RMR and PA
+    c = np.where(state["is_male"], RMR["male"]["c"], RMR["female"]["c"])
+    exponent = np.where(state["is_male"], RMR["male"]["p"], RMR["female"]["p"])
+    drmr_dw = np.where(rmr > 0, c * exponent * np.maximum(weight, 1e-9) ** (exponent - 1) / MJ_TO_KCAL, 0)
+    dbalance_dw = -(1 - BETA_TEF) * state["pal_factor"] * drmr_dw
+    dp_df = -p * p / (FORBES_CONSTANT * (RHO_L / RHO_F))
+    jacobian = np.zeros((len(weight), 3, 3))
+    jacobian[:, 0, 0] = 1 - dp_df * delta_energy / RHO_F + (1 - p) * dbalance_dw / RHO_F
+    jacobian[:, 0, 1] = (1 - p) * dbalance_dw / RHO_F
+    jacobian[:, 0, 2] = (1 - p) / RHO_F
+    jacobian[:, 1, 0] = dp_df * delta_energy / RHO_L + p * dbalance_dw / RHO_L
+    jacobian[:, 1, 1] = 1 + p * dbalance_dw / RHO_L
+    jacobian[:, 1, 2] = p / RHO_L
+    jacobian[:, 2, 2] = 1
+    covariance = jacobian @ state["covariance"] @ jacobian.transpose(0, 2, 1) + state["process_noise"]
+
+    updates = {field: step[field] for field in STATE_FIELDS}
+    updates["day"] = state["day"] + 1
+    for key, values in updates.items():
+        state[key] = np.where(active, values, state[key])
+    state["covariance"] = np.where(active[:, None, None], covariance, state["covariance"])
+
+
+def predict_assimilation_state(state, days):
+    """
+    Advance every user by a number of days without readings. Updated in place.
+
+    Parameters:
+        state (dict): Filter state.
+        days (int or np.ndarray): Days to advance, per user (>= 0).
+
+    Returns:
+        dict: The state.
+    """
+    days = np.broadcast_to(np.asarray(days, dtype=np.int64), state["day"].shape)
+    if (days < 0).any():
+        raise ValueError("Cannot predict backwards in time.")
+    for step in range(int(days.max(initial=0))):
+        _step(state, days > step)
+    return state
+
+
+def update_assimilation_state(state, weight):
+    """
+    Assimilate one scale reading per user at the users' current day. Updated in place.
+
+    Parameters:
+        state (dict): Filter state.
+        weight (np.ndarray): Reading in kilograms per user; NaN for users without a reading.
+
+    Returns:
+        dict: The state.
+    """
+    weight = np.broadcast_to(np.asarray(weight, dtype=float), state["day"].shape)
+    observed = np.isfinite(weight)
+    covariance = state["covariance"]
+    cross = covariance @ MEASUREMENT                    # P H', shape (N, 3)
+    variance = cross @ MEASUREMENT + state["scale_sd"] ** 2
+    gain = cross / variance[:, None]
+    innovation = np.where(observed, weight - state["weight"], 0)
+
+    fat_mass = np.maximum(state["fat_mass"] + gain[:, 0] * innovation, 0)
+    lean_mass = np.maximum(state["lean_mass"] + gain[:, 1] * innovation, 0)
+    state["intake_bias"] = state["intake_bias"] + gain[:, 2] * innovation
+    state["weight"] = np.where(observed, fat_mass + lean_mass + state["glycogen"] + state["ecf"], state["weight"])
+    state["fat_mass"], state["lean_mass"] = fat_mass, lean_mass
+    updated = covariance - gain[:, :, None] * cross[:, None, :]
+    updated = (updated + updated.transpose(0, 2, 1)) / 2
+    state["covariance"] = np.where(observed[:, None, None], updated, covariance)
+    return state
+
+
+def assimilate_readings(state, day, weight):
+    """
+    Predict every user to the day of their reading and assimilate it. Updated in place.
+
+    Parameters:
+        state (dict): Filter state.
+        day (np.ndarray): Day of the reading per user, not before the user's current day. A 2-D array
+            (N, K) assimilates K readings per user in column order.
+        weight (np.ndarray): Readings in kilograms, same shape as day; NaN means no reading (the user is
+            still advanced to that day).
+
+    Returns:
+        dict: The state.
+    """
+    day, weight = np.broadcast_arrays(np.asarray(day, dtype=np.int64), np.asarray(weight, dtype=float))
+    if day.ndim == 1:
+        day, weight = day[:, None], weight[:, None]
+    for column in range(day.shape[1]):
+        predict_assimilation_state(state, day[:, column] - state["day"])
+        update_assimilation_state(state, weight[:, column])
+    return state
+
+
+def assimilation_estimate(state):
+    """
+    Report the corrected current state.
+
+    Parameters:
+        state (dict): Filter state.
+
+    Returns:
+        dict: Arrays per user: "day", "weight", "fat_mass", "lean_mass", "body_fat_percentage" (kg or
+        fraction), "intake_bias" (kcal/day), and standard deviations "fat_mass_sd", "lean_mass_sd",
+        "weight_sd" (kg) and "intake_bias_sd" (kcal/day).
+    """
+    covariance = state["covariance"]
+    return {
+        "day": state["day"].copy(),
+        "weight": state["weight"].copy(),
+        "fat_mass": state["fat_mass"].copy(),
+        "lean_mass": state["lean_mass"].copy(),
+        "body_fat_percentage": state["fat_mass"] / state["weight"],
+        "intake_bias": state["intake_bias"] * MJ_TO_KCAL,
+        "fat_mass_sd": np.sqrt(covariance[:, 0, 0]),
+        "lean_mass_sd": np.sqrt(covariance[:, 1, 1]),
+        "weight_sd": np.sqrt(np.maximum(covariance[:, 0, 0] + covariance[:, 1, 1] + 2 * covariance[:, 0, 1], 0)),
+        "intake_bias_sd": np.sqrt(covariance[:, 2, 2]) * MJ_TO_KCAL,
+    }
+
+
+def forecast_assimilation(state, duration_days, energy_intake=None):
+    """
+    Forecast every user forward from the corrected state, with the estimated intake bias applied.
+    The state is not modified.
+
+    Parameters:
+        state (dict): Filter state.
+        duration_days (int): Days to forecast.
+        energy_intake (np.ndarray): Planned intake from now on in MJ/day (default: unchanged).
+
+    Returns:
+        dict: "day" (offset from each user's current day, 0 .. duration_days) and arrays of shape
+        (N, duration_days + 1) for "weight", "weight_sd", "fat_mass" and "lean_mass".
+    """
+    forecast = {key: value.copy() if isinstance(value, np.ndarray) else value for key, value in state.items()}
+    if energy_intake is not None:
+        forecast["energy_intake"] = np.broadcast_to(np.asarray(energy_intake, dtype=float), state["day"].shape).copy()
+    active = np.ones(state["day"].shape, dtype=bool)
+    out = {field: np.empty((duration_days + 1, len(active))) for field in ("weight", "weight_sd", "fat_mass", "lean_mass")}
+    for day in range(duration_days + 1):
+        if day > 0:
+            _step(forecast, active)
+        estimate = assimilation_estimate(forecast)
+        for field, values in out.items():
+            values[day] = estimate[field]
+    results = {field: values.T for field, values in out.items()}
+    results["day"] = np.arange(duration_days + 1)
+    return results
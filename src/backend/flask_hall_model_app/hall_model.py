@@ -9,6 +9,16 @@ Hall, K., Sacks, G., Chandramohan, D., & Et Al. (2011). Dynamic Mathematical mod
 # Constants for the Hall Model
 import numpy as np
 
+# Shared backend modules (trajectory container, ...) live one level up in src/backend, which has to be
+# on the import path (hall-model-backend.py adds it)
+from trajectory import Trajectory
+from intake_schedule import daily_intake, intake_on_day, is_constant_intake
+import jit_backend
+from jit_backend import njit
+from observers import trace_rows
+from simulation_events import DEFAULT_CHUNK_DAYS, run_until_event
+from intake_solver import solve_target_intake
+
 
 RHO_F = 39.5  # Energy density of fat (MJ/kg)
 RHO_L = 7.6   # Energy density of lean tissue (MJ/kg)
@@ -21,6 +31,9 @@ TAU_AT = 14.0  # Time constant for adaptive thermogenesis (days)
 K_G = 0.1  # Glycogen adjustment constant
 GLYCOGEN_WATER_RATIO = 2.7  # Ratio of water to glycogen
 GLYCOGEN_BASELINE = 0.5  # ~Baseline glycogen stores in kg
+ECF_XI_NA = 0.005  # Example ECF sensitivity to dietary sodium changes (kg per mmol/day)
+ECF_XI_CI = 0.001  # Example ECF sensitivity to carbohydrate intake changes (kg per kg/day)
+FORBES_CONSTANT = 10.4  # Forbes curve: lean mass changes by FORBES_CONSTANT * ln(F / F0) kg as fat mass goes from F0 to F
 PAL_FACTORS = {
     "sedentary": 1.4, "lightly_active": 1.6, "moderately_active": 1.8, "active": 2.0, "very_active": 2.5
     }  # PAL factors
@@ -29,6 +42,28 @@ RMR = {
     "female": {"c": 248, "p": 0.4356, "y": 5.09}
 } 
 MJ_TO_KCAL = 239.006  # Conversion factor from MJ to kcal
+MODEL_VERSION = "3"  # Bump whenever results change, so cached simulations are invalidated
+RESULT_FIELDS = ("weight", "body_fat_percentage", "fat_mass", "lean_mass", "glycogen", "ecf", "tee", "at", "rmr", "tef", "pa")
+ENERGY_FIELDS = ("tee", "at", "rmr", "tef", "pa")  # Stored in MJ/day, reported in kcal/day
+TARGET_INTAKE_BOUNDS = (1.0, 20.0)  # Search range of the inverse solver in MJ/day
+MIXED_TISSUE_ENERGY_DENSITY = 32.2  # Approximate energy content of mixed weight change (MJ/kg, ~7700 kcal/kg)
+
+# Adaptive Runge-Kutta integration (Dormand-Prince 5(4) Butcher tableau)
+RK45_RTOL = 1e-6  # Relative error tolerance per step
+RK45_ATOL = 1e-6  # Absolute error tolerance per step (kg, MJ/day)
+RK45_MAX_STEP = 90.0  # Largest allowed step (days)
+RK45_EULER_BOUND = 0.1  # Documented max weight difference (kg) versus the daily-Euler reference
+DOPRI_C = (0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1)
+DOPRI_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+)
+DOPRI_B = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0)
+DOPRI_E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)  # 5th minus 4th order weights
 
 
 
@@ -74,7 +109,7 @@ def energy_partitioning(fat_mass):
         float: Nonlinear energy partitioning coefficient (dimensionless).
     
     """
-    C = 10.4 * (RHO_L / RHO_F)
+    C = FORBES_CONSTANT * (RHO_L / RHO_F)
     p = 0
     if C + fat_mass != 0:
         p = C / (C + fat_mass)
@@ -188,9 +223,18 @@ def calculate_rmr(weight, age, sex):
     Returns:
         float: Resting Metabolic Rate (RMR) in MJ/day.
     """
-    c, p, y = RMR[sex].values()
+    constants = RMR[sex]
+    return livingston_kohlstadt_rmr(weight, age, constants["c"], constants["p"], constants["y"])
+
+def livingston_kohlstadt_rmr(weight, age, c, p, y):
+    """
+    Livingston-Kohlstadt RMR for given constants (see `calculate_rmr`).
+
+    Returns:
+        float: Resting Metabolic Rate (RMR) in MJ/day.
+    """
     rmr = c * (max(weight, 0) ** p) - y * age
-    rmr /= 239.006  # Convert kcal/day to MJ/day
+    rmr /= MJ_TO_KCAL  # Convert kcal/day to MJ/day
     return max(rmr, 0)
 
 # Function to calculate adaptive thermogenesis
@@ -210,102 +254,557 @@ def calculate_adaptive_thermogenesis(delta_ei, at_old):
     return at_new
 
 # Function to simulate weight changes over time
-def simulate_hall_model(duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"]):
+def simulate_hall_model(duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], integrator="euler", output_days=None, observer=None):
     """
     Simulate weight changes using the Hall model.
 
+    The default integrator is the daily forward-Euler scheme. integrator="rk45" delegates to
+    `simulate_hall_model_adaptive`, which takes adaptive Runge-Kutta steps and only emits `output_days`.
+
     Parameters:
         duration_days (int): Simulation duration in days.
         sex (str): Either "male" or "female"
         age (int): Age in years.
         body_weight (float): Initial body weight in kilograms.
         height (float): Height in meters.
-        energy_intake (float): Energy intake in MJ/day.
+        energy_intake (float or schedule): Energy intake in MJ/day, or a per-day / piecewise schedule
+            (see intake_schedule). The step into day d uses the intake of day d - 1.
         baseline_ci (float): Baseline carbohydrate intake in grams/day.
         baseline_ei (float): Baseline energy intake (maintenance calories at beginning) in MJ/day.
         body_fat_percentage (float): Initial body fat percentage. If None, it is estimated based on body weight and height.
         pal_factor (float): Physical activity level (PAL), a multiplier for total energy expenditure in the range of 1.4 to 2.5.
+        integrator (str): "euler" (daily steps, default) or "rk45" (adaptive steps).
+        output_days (iterable of int): Days to emit with integrator="rk45". Ignored by "euler".
+        observer (observers.Observer): Optional per-step tracing hooks (see observers). None disables tracing.
+
+    Returns:
+        Trajectory: Simulation results containing daily weight, body fat percentage, fat mass, lean mass and its components,
+        and TEE and its components (kcal/day). Rows behave like the former result dictionaries.
+    """
+    if integrator == "rk45":
+        return simulate_hall_model_adaptive(
+            duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor, output_days,
+            observer=observer,
+        )
+    if integrator != "euler":
+        raise ValueError("Integrator must be 'euler' or 'rk45'.")
+
+    state = create_hall_state(sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor)
+    results = start_hall_results(state, capacity=max(duration_days - 1, 1))
+    return iterate_hall_model(state, duration_days - 2, results, observer)
+
+def start_hall_results(state, capacity=64):
+    """
+    Start a Hall model Trajectory with the day-0 row of a state from `create_hall_state`.
+
+    Parameters:
+        state (dict): Day-0 simulation state.
+        capacity (int): Days to allocate.
+
+    Returns:
+        Trajectory: One row (day 0), with the state in metadata["state"].
+    """
+    body_weight, fat_mass = state["weight"], state["fat_mass"]
+    rmr = calculate_rmr(body_weight, state["age"], state["sex"])
+    pa = calculate_pa(body_weight, rmr, state["pal_factor"])
+    tef = calculate_tef(intake_on_day(state["energy_intake"], 0))
+    tee = rmr + pa + tef + state["at"]
+
+    results = Trajectory(RESULT_FIELDS, {field: MJ_TO_KCAL for field in ENERGY_FIELDS}, capacity=capacity)
+    results.append_values(0, body_weight, fat_mass / body_weight, fat_mass, state["lean_mass"], state["glycogen"], state["ecf"], tee, state["at"], rmr, tef, pa)
+    results.metadata["state"] = state
+    return results
+
+def create_hall_state(sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"]):
+    """
+    Build the day-0 simulation state for the Hall model.
+
+    The state is a plain dictionary of numbers and strings, so it can be stored (e.g. as JSON) and later
+    passed to `continue_simulation` to extend a forecast without re-running the earlier days.
+
+    Parameters:
+        sex (str): Either "male" or "female"
+        age (int): Age in years.
+        body_weight (float): Initial body weight in kilograms.
+        height (float): Height in meters.
+        energy_intake (float or schedule): Energy intake in MJ/day, or a per-day / piecewise schedule.
+        baseline_ci (float): Baseline carbohydrate intake in grams/day.
+        baseline_ei (float): Baseline energy intake (maintenance calories at beginning) in MJ/day.
+        body_fat_percentage (float): Initial body fat percentage. If None, it is estimated based on body weight and height.
+        pal_factor (float): Physical activity level (PAL).
 
     Returns:
-        list: Simulation results containing daily weight, body fat percentage, fat mass, lean mass and its components, and TEE and its components
+        dict: Simulation state {model, day, sex, age, energy_intake, baseline_ci, baseline_ei, pal_factor,
+        weight, fat_mass, lean_mass, glycogen, ecf, at}.
     """
     fat_mass = calculate_initial_fat_mass(sex, age, body_weight, height, body_fat_percentage)
     glycogen = 0.5  # Initial glycogen stores in kg
     ecf = 2.0       # Initial extracellular fluid in kg
     lean_mass = calculate_initial_lean_mass(body_weight, fat_mass, glycogen, ecf)
-    at = 0 # Initial adaptive thermogenesis
-    rmr = calculate_rmr(body_weight, age, sex)
-    pa = calculate_pa(body_weight, rmr, pal_factor)
-    tef = calculate_tef(energy_intake)
-    tee = rmr + pa + tef + at
-
-    results = [{
-        "day": 0, 
+    if isinstance(energy_intake, np.ndarray):
+        energy_intake = energy_intake.tolist()  # Keep the state JSON-serializable
+    return {
+        "model": "hall",
+        "day": 0,
+        "sex": sex,
+        "age": age,
+        "energy_intake": energy_intake,
+        "baseline_ci": baseline_ci,
+        "baseline_ei": baseline_ei,
+        "pal_factor": pal_factor,
         "weight": body_weight,
-        "body_fat_percentage": fat_mass / body_weight,
-        "fat_mass": fat_mass,
-        "lean_mass": lean_mass,
+        "fat_mass": float(fat_mass),
+        "lean_mass": float(lean_mass),
         "glycogen": glycogen,
         "ecf": ecf,
-        "tee": tee * MJ_TO_KCAL,
-        "at": at * MJ_TO_KCAL,
-        "rmr": rmr * MJ_TO_KCAL,
-        "tef": tef * MJ_TO_KCAL,
-        "pa": pa * MJ_TO_KCAL
-    }]
-
-    for day in range(1, duration_days-1):
-        # Update TEE components
-        delta_ei = energy_intake - baseline_ei # Energy intake change from baseline
-        at = calculate_adaptive_thermogenesis(delta_ei, at)
-        rmr = calculate_rmr(body_weight, age, sex)
-        pa = calculate_pa(body_weight, rmr, pal_factor)
-        tef = calculate_tef(energy_intake)
-        tee = rmr + pa + tef + at
-        delta_energy = energy_intake - tee # Energy imbalance
-        
-        # Energy partitioning
-        p = energy_partitioning(fat_mass)
-        dF_dt = (1 - p) * delta_energy / RHO_F
-        dL_dt = p * delta_energy / RHO_L
+        "at": 0.0,  # Initial adaptive thermogenesis
+    }
 
-        # Update masses
-        fat_mass = max(fat_mass + dF_dt, 0)
-        lean_mass = max(lean_mass + dL_dt, 0)
+def iterate_hall_model(state, days, results, observer=None):
+    """
+    Advance a Hall model state by `days` daily forward-Euler steps, appending one row per day.
 
-        # Glycogen and ECF dynamics
-        dG_dt = calculate_glycogen_dynamics(energy_intake, baseline_ci)
-        glycogen = max(glycogen + dG_dt, 0)
+    Parameters:
+        state (dict): Simulation state from `create_hall_state` or a previous run. Updated in place.
+        days (int): Number of days to simulate.
+        results (Trajectory): Results to append to.
+        observer (observers.Observer): Optional per-step tracing hooks. None disables tracing.
 
-        dECF_dt = calculate_ecf_dynamics(0, 0, 0.005, 0.001)  # Example coefficients
-        ecf = max(ecf + dECF_dt, 0)
+    Returns:
+        Trajectory: The results, with the final state in metadata["state"].
+    """
+    sex, age, pal_factor = state["sex"], state["age"], state["pal_factor"]
+    energy_intake, baseline_ci, baseline_ei = state["energy_intake"], state["baseline_ci"], state["baseline_ei"]
+    fat_mass, lean_mass, glycogen, ecf, at = state["fat_mass"], state["lean_mass"], state["glycogen"], state["ecf"], state["at"]
+    body_weight = state["weight"]
+    first_day = state["day"] + 1
+    first_row = len(results)
+    if observer is not None:
+        observer.on_run_start("hall", first_day)
+    # Per-day intake for scheduled runs; None keeps the constant-intake loop free of lookups
+    schedule = daily_intake(energy_intake, first_day - 1, days)
+
+    if jit_backend.USE_JIT and days > 0:
+        intake = np.full(days, float(energy_intake)) if schedule is None else np.asarray(schedule, dtype=float)
+        constants = RMR[sex]
+        values = np.empty((len(RESULT_FIELDS), days))
+        fat_mass, lean_mass, glycogen, ecf, at, body_weight = hall_euler_kernel(
+            intake, float(baseline_ci), float(baseline_ei), float(age), float(pal_factor),
+            float(constants["c"]), float(constants["p"]), float(constants["y"]),
+            float(fat_mass), float(lean_mass), float(glycogen), float(ecf), float(at), float(body_weight), values,
+        )
+        results.extend_values(np.arange(first_day, first_day + days), values)
+    else:
+        for day in range(first_day, first_day + max(days, 0)):
+            if schedule is not None:
+                energy_intake = schedule[day - first_day]
+
+            # Update TEE components
+            delta_ei = energy_intake - baseline_ei # Energy intake change from baseline
+            at = calculate_adaptive_thermogenesis(delta_ei, at)
+            rmr = calculate_rmr(body_weight, age, sex)
+            pa = calculate_pa(body_weight, rmr, pal_factor)
+            tef = calculate_tef(energy_intake)
+            tee = rmr + pa + tef + at
+            delta_energy = energy_intake - tee # Energy imbalance
+
+            # Energy partitioning
+            p = energy_partitioning(fat_mass)
+            dF_dt = (1 - p) * delta_energy / RHO_F
+            dL_dt = p * delta_energy / RHO_L
+
+            # Update masses
+            fat_mass = max(fat_mass + dF_dt, 0)
+            lean_mass = max(lean_mass + dL_dt, 0)
+
+            # Glycogen and ECF dynamics
+            dG_dt = calculate_glycogen_dynamics(energy_intake, baseline_ci)
+            glycogen = max(glycogen + dG_dt, 0)
+
+            dECF_dt = calculate_ecf_dynamics(0, 0, ECF_XI_NA, ECF_XI_CI)  # No sodium or carbohydrate change
+            ecf = max(ecf + dECF_dt, 0)
+
+            # Update body weight
+            body_weight = fat_mass + lean_mass + glycogen + ecf
+
+            # Store results
+            results.append_values(day, body_weight, fat_mass / body_weight, fat_mass, lean_mass, glycogen, ecf, tee, at, rmr, tef, pa)
+
+    if observer is not None:
+        trace_rows(observer, "hall", results, first_row)
+        observer.on_run_end("hall", state["day"] + max(days, 0), len(results) - first_row)
+
+    state.update({
+        "day": state["day"] + max(days, 0), "weight": body_weight,
+        "fat_mass": fat_mass, "lean_mass": lean_mass, "glycogen": glycogen, "ecf": ecf, "at": at,
+    })
+    results.metadata["state"] = state
+    return results
+
+# The daily helpers compiled for hall_euler_kernel. They are built from the same functions the reference
+# loop calls, so the two paths cannot drift apart; the plain functions stay usable on arrays.
+_compiled_adaptive_thermogenesis = njit(cache=True)(calculate_adaptive_thermogenesis)
+_compiled_rmr = njit(cache=True)(livingston_kohlstadt_rmr)
+_compiled_pa = njit(cache=True)(calculate_pa)
+_compiled_tef = njit(cache=True)(calculate_tef)
+_compiled_partitioning = njit(cache=True)(energy_partitioning)
+_compiled_glycogen_dynamics = njit(cache=True)(calculate_glycogen_dynamics)
+_compiled_ecf_dynamics = njit(cache=True)(calculate_ecf_dynamics)
+
+@njit(cache=True)
+def hall_euler_kernel(intake, baseline_ci, baseline_ei, age, pal_factor, c, p, y, fat_mass, lean_mass, glycogen, ecf, at, body_weight, values):
+    """
+    Compiled form of the daily loop in `iterate_hall_model` (same helpers, same order), used when the
+    JIT backend is available. Writes one column per day into `values` in RESULT_FIELDS order, energy
+    terms in MJ/day.
+
+    Parameters:
+        intake (np.ndarray): Energy intake for each simulated day in MJ/day.
+        baseline_ci, baseline_ei, age, pal_factor (float): Profile parameters.
+        c, p, y (float): Livingston-Kohlstadt RMR constants for the profile's sex.
+        fat_mass, lean_mass, glycogen, ecf, at, body_weight (float): State before the first day.
+        values (np.ndarray): Output array of shape (len(RESULT_FIELDS), len(intake)).
+
+    Returns:
+        tuple: Final (fat_mass, lean_mass, glycogen, ecf, at, body_weight).
+    """
+    for i in range(intake.shape[0]):
+        energy_intake = intake[i]
+        at = _compiled_adaptive_thermogenesis(energy_intake - baseline_ei, at)
+        rmr = _compiled_rmr(body_weight, age, c, p, y)
+        pa = _compiled_pa(body_weight, rmr, pal_factor)
+        tef = _compiled_tef(energy_intake)
+        tee = rmr + pa + tef + at
+        delta_energy = energy_intake - tee
 
-        # Update body weight
+        partition = _compiled_partitioning(fat_mass)
+        fat_mass = max(fat_mass + (1 - partition) * delta_energy / RHO_F, 0.0)
+        lean_mass = max(lean_mass + partition * delta_energy / RHO_L, 0.0)
+        glycogen = max(glycogen + _compiled_glycogen_dynamics(energy_intake, baseline_ci), 0.0)
+        ecf = max(ecf + _compiled_ecf_dynamics(0.0, 0.0, ECF_XI_NA, ECF_XI_CI), 0.0)
         body_weight = fat_mass + lean_mass + glycogen + ecf
 
-        # Store results
-        results.append({
-            "day": day,
-            "weight": body_weight,
-            "body_fat_percentage": fat_mass / body_weight,
-            "fat_mass": fat_mass,
-            "lean_mass": lean_mass,
-            "glycogen": glycogen,
-            "ecf": ecf,
-            "tee": tee * MJ_TO_KCAL, 
-            "at": at * MJ_TO_KCAL,
-            "rmr": rmr * MJ_TO_KCAL,
-            "tef": tef * MJ_TO_KCAL,
-            "pa": pa * MJ_TO_KCAL
-        })
+        values[0, i] = body_weight
+        values[1, i] = fat_mass / body_weight
+        values[2, i] = fat_mass
+        values[3, i] = lean_mass
+        values[4, i] = glycogen
+        values[5, i] = ecf
+        values[6, i] = tee
+        values[7, i] = at
+        values[8, i] = rmr
+        values[9, i] = tef
+        values[10, i] = pa
+    return fat_mass, lean_mass, glycogen, ecf, at, body_weight
+
+def continue_simulation(state, days, observer=None):
+    """
+    Extend a Hall model forecast from a saved state. Only the new days are simulated, and the result is
+    identical to the corresponding rows of one longer `simulate_hall_model` run.
+
+    Parameters:
+        state (dict): State from results.metadata["state"] of a previous run (not modified).
+        days (int): Number of additional days to simulate.
+        observer (observers.Observer): Optional per-step tracing hooks. None disables tracing.
+
+    Returns:
+        Trajectory: Results for the new days only, with the new state in metadata["state"].
+    """
+    if state.get("model") != "hall":
+        raise ValueError("State was not produced by the Hall model.")
+    results = Trajectory(RESULT_FIELDS, {field: MJ_TO_KCAL for field in ENERGY_FIELDS}, capacity=max(days, 1))
+    return iterate_hall_model(dict(state), days, results, observer)
 
+def state_at_row(state, results, index):
+    """
+    Rebuild the state after a row of a run, so the run can be cut there and continued without
+    re-simulating (the rows hold every quantity that changes from day to day).
+
+    Parameters:
+        state (dict): State at the end of `results` (its metadata["state"]).
+        results (Trajectory): Rows of the run.
+        index (int): Row to cut at.
 
+    Returns:
+        dict: The state after that row.
+    """
+    state = dict(state, day=results.value("day", index))
+    for field in ("weight", "fat_mass", "lean_mass", "glycogen", "ecf", "at"):
+        state[field] = results.value(field, index, scaled=False)
+    return state
+
+def simulate_hall_model_until(max_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], events=(), chunk_days=DEFAULT_CHUNK_DAYS, observer=None):
+    """
+    Simulate the Hall model until the first of several events (target weight, body fat percentage or
+    plateau, see simulation_events) or for at most `max_days` days. Days after the event are not kept.
+
+    Parameters:
+        max_days (int): Maximum number of days to simulate.
+        sex ... pal_factor: As for `simulate_hall_model`.
+        events (list of dict): Event specs, e.g. [{"type": "weight", "value": 80.0}].
+        chunk_days (int): Days simulated between event checks.
+        observer (observers.Observer): Optional per-step tracing hooks.
+
+    Returns:
+        Trajectory: Results up to the first day on or after the event. metadata["event"] holds
+        {"type", "value", "day"} with the interpolated event day, or None if no event occurred.
+    """
+    state = create_hall_state(sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor)
+    results = start_hall_results(state)
+    return run_until_event(continue_simulation, state_at_row, results, max_days, events, chunk_days, observer)
+
+def calculate_hall_derivatives(fat_mass, lean_mass, at, glycogen, ecf, age, sex, energy_intake, baseline_ei, pal_factor):
+    """
+    Continuous-time right-hand side of the Hall model for fat mass, lean mass and adaptive thermogenesis.
+    This is the same physics as one step of `simulate_hall_model`, written as dX/dt.
+
+    Parameters:
+        fat_mass (float): Fat mass in kilograms.
+        lean_mass (float): Lean mass in kilograms.
+        at (float): Adaptive thermogenesis in MJ/day.
+        glycogen (float): Glycogen in kilograms.
+        ecf (float): Extracellular fluid in kilograms.
+        age (float): Age in years.
+        sex (str): "male" or "female".
+        energy_intake (float): Energy intake in MJ/day.
+        baseline_ei (float): Baseline energy intake in MJ/day.
+        pal_factor (float): Physical activity level (PAL).
+
+    Returns:
+        tuple: (dF/dt, dL/dt, dAT/dt) in kg/day, kg/day and MJ/day^2.
+    """
+    body_weight = fat_mass + lean_mass + glycogen + ecf
+    rmr = calculate_rmr(body_weight, age, sex)
+    tee = rmr + calculate_pa(body_weight, rmr, pal_factor) + calculate_tef(energy_intake) + at
+    delta_energy = energy_intake - tee
+    p = energy_partitioning(fat_mass)
+    dAT_dt = (BETA_AT * (energy_intake - baseline_ei) - at) / TAU_AT
+    return (1 - p) * delta_energy / RHO_F, p * delta_energy / RHO_L, dAT_dt
+
+def simulate_hall_model_adaptive(duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], output_days=None, rtol=RK45_RTOL, atol=RK45_ATOL, max_step=RK45_MAX_STEP, observer=None):
+    """
+    Simulate weight changes using the Hall model with an adaptive-step Runge-Kutta integrator.
+
+    Fat mass, lean mass and adaptive thermogenesis are integrated with the embedded Dormand-Prince 5(4)
+    pair and step-size control; glycogen and ECF have constant rates and are evaluated in closed form.
+    Samples are produced only at `output_days`, using cubic Hermite interpolation inside accepted steps,
+    so the step count depends on how fast the state changes, not on the horizon length. A 10-year
+    forecast with an energy imbalance takes about 100 accepted steps (about 45 at energy balance)
+    instead of ~3650. As in the Euler loop, fat and lean mass are clamped at zero during integration.
+
+    The result approximates the exact solution of the model ODEs, whereas `simulate_hall_model` is a
+    daily Euler discretization of it. Against that daily-Euler reference, weight stays within
+    RK45_EULER_BOUND kg for energy imbalances up to +/-5 MJ/day over 10 years; the difference is almost
+    entirely the Euler scheme's own first-order error (TAU_AT is only 14 days). Energy components are
+    reported for the state on each output day.
+
+    Parameters:
+        duration_days (int): Simulation duration in days.
+        sex (str): Either "male" or "female"
+        age (int): Age in years.
+        body_weight (float): Initial body weight in kilograms.
+        height (float): Height in meters.
+        energy_intake (float): Energy intake in MJ/day.
+        baseline_ci (float): Baseline carbohydrate intake in grams/day.
+        baseline_ei (float): Baseline energy intake (maintenance calories at beginning) in MJ/day.
+        body_fat_percentage (float): Initial body fat percentage. If None, it is estimated based on body weight and height.
+        pal_factor (float): Physical activity level (PAL).
+        output_days (iterable of int): Days to emit. Defaults to the same days as `simulate_hall_model`.
+        rtol (float): Relative error tolerance per step.
+        atol (float): Absolute error tolerance per step (kg for masses, MJ/day for AT).
+        max_step (float): Largest allowed step in days.
+        observer (observers.Observer): Optional tracing hooks; each output day is reported as a step.
+
+    Returns:
+        Trajectory: Simulation results at the output days. metadata["steps"] and metadata["rejected_steps"]
+        hold the number of accepted and rejected integrator steps.
+    """
+    if not is_constant_intake(energy_intake):
+        raise ValueError("The adaptive integrator requires a constant energy intake.")
+    if output_days is None:
+        output_days = range(max(duration_days - 1, 1))
+    output_days = sorted(set(int(day) for day in output_days))
+
+    fat_mass = calculate_initial_fat_mass(sex, age, body_weight, height, body_fat_percentage)
+    ecf = 2.0  # Initial extracellular fluid in kg; no sodium/carbohydrate change, so it stays constant
+    lean_mass = calculate_initial_lean_mass(body_weight, fat_mass, 0.5, ecf)
+    dG_dt = calculate_glycogen_dynamics(energy_intake, baseline_ci)
+
+    def glycogen_at(t):
+        return max(0.5 + dG_dt * t, 0)
+
+    def derivatives(t, y):
+        return calculate_hall_derivatives(max(y[0], 0.0), max(y[1], 0.0), y[2], glycogen_at(t), ecf, age, sex, energy_intake, baseline_ei, pal_factor)
+
+    results = Trajectory(RESULT_FIELDS, {field: MJ_TO_KCAL for field in ENERGY_FIELDS}, capacity=len(output_days))
+    tef = calculate_tef(energy_intake)
+
+    def emit(day, y):
+        fat, lean, at = max(y[0], 0), max(y[1], 0), y[2]
+        glycogen = glycogen_at(day)
+        weight = fat + lean + glycogen + ecf
+        rmr = calculate_rmr(weight, age, sex)
+        pa = calculate_pa(weight, rmr, pal_factor)
+        results.append_values(day, weight, fat / weight, fat, lean, glycogen, ecf, rmr + pa + tef + at, at, rmr, tef, pa)
+
+    if observer is not None:
+        observer.on_run_start("hall", 0)
+    t, y = 0.0, (fat_mass, lean_mass, 0.0)
+    f = derivatives(t, y)
+    h = 1.0
+    steps = rejected = 0
+    pending = iter(output_days)
+    next_day = next(pending, None)
+    while next_day is not None and next_day <= 0:
+        emit(next_day, y)
+        next_day = next(pending, None)
+    end = output_days[-1] if output_days else 0
+
+    while next_day is not None:
+        h = min(h, max_step, end - t)
+        # Dormand-Prince stages (FSAL: k1 is the derivative from the previous accepted step, k7 the new one)
+        k = [f]
+        for c, a_row in zip(DOPRI_C[1:], DOPRI_A[1:]):
+            stage = tuple(y[i] + h * sum(a * k_j[i] for a, k_j in zip(a_row, k)) for i in range(3))
+            k.append(derivatives(t + c * h, stage))
+        y_new = tuple(y[i] + h * sum(b * k_j[i] for b, k_j in zip(DOPRI_B, k)) for i in range(3))
+        f_new = derivatives(t + h, y_new)
+        k.append(f_new)
+        error = max(
+            abs(h * sum(e * k_j[i] for e, k_j in zip(DOPRI_E, k))) / (atol + rtol * max(abs(y[i]), abs(y_new[i])))
+            for i in range(3)
+        )
+
+        if error <= 1.0:
+            steps += 1
+            t_new = t + h
+            if y_new[0] < 0 or y_new[1] < 0:
+                # Masses cannot go negative (as in the Euler loop): clamp the state and restart the FSAL derivative
+                y_new = (max(y_new[0], 0.0), max(y_new[1], 0.0), y_new[2])
+                f_new = derivatives(t_new, y_new)
+            # Emit every requested day inside this step by cubic Hermite interpolation
+            while next_day is not None and next_day <= t_new + 1e-9:
+                theta = (next_day - t) / h
+                h00 = (1 + 2 * theta) * (1 - theta) ** 2
+                h10 = theta * (1 - theta) ** 2
+                h01 = theta ** 2 * (3 - 2 * theta)
+                h11 = theta ** 2 * (theta - 1)
+                emit(next_day, tuple(
+                    h00 * y[i] + h10 * h * f[i] + h01 * y_new[i] + h11 * h * f_new[i] for i in range(3)
+                ))
+                next_day = next(pending, None)
+            t, y, f = t_new, y_new, f_new
+        else:
+            rejected += 1
+        # Standard step-size controller for a 5th-order method
+        h *= min(5.0, max(0.2, 0.9 * (error if error > 0 else 1e-10) ** -0.2))
+
+    results.metadata["steps"] = steps
+    results.metadata["rejected_steps"] = rejected
+    if observer is not None:
+        trace_rows(observer, "hall", results, 0)
+        observer.on_run_end("hall", end, len(results))
     return results
 
-def calculate_energy_intake_for_target_weight(duration_days, target_weight, sex, age, body_weight, height, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], tolerance=0.01):
+def calculate_steady_state(sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], max_iterations=50):
+    """
+    Solve directly for the plateau that `simulate_hall_model` approaches at a constant energy intake.
+
+    At the fixed point adaptive thermogenesis settles at BETA_AT * (EI - baseline EI) and energy balance
+    is zero. Since RMR + PA = (1 - BETA_TEF) * PAL * RMR, the plateau RMR and therefore the plateau weight
+    follow in closed form from the Livingston-Kohlstadt formula. The fat/lean split comes from the
+    energy partitioning rule, which keeps every trajectory on the Forbes curve
+    L - L0 = FORBES_CONSTANT * ln(F / F0); a few Newton steps solve it for F.
+
+    The time constant is the energy that has to be stored or released to reach the plateau divided by
+    the initial energy imbalance (with adaptive thermogenesis already settled, since TAU_AT = 14 days is
+    much faster than the weight response). It tracks the simulated time to 63% of the change to within
+    ~10-20%; days_to_95_percent assumes an exponential approach and is rougher.
+
+    Glycogen has no plateau when the carbohydrate intake exceeds its baseline: it rises at a constant
+    glycogen_rate. Weight still levels off near the energy-balance plateau (lagging it by less than
+    glycogen_rate * time_constant_days), so fat and lean mass keep giving way to the growing glycogen
+    along the Forbes curve; they are reported at the initial glycogen store.
+
+    Parameters:
+        sex (str): Either "male" or "female"
+        age (int): Age in years.
+        body_weight (float): Initial body weight in kilograms.
+        height (float): Height in meters.
+        energy_intake (float): Energy intake in MJ/day.
+        baseline_ci (float): Baseline carbohydrate intake in grams/day.
+        baseline_ei (float): Baseline energy intake (maintenance calories at beginning) in MJ/day.
+        body_fat_percentage (float): Initial body fat percentage. If None, it is estimated based on body weight and height.
+        pal_factor (float): Physical activity level (PAL).
+        max_iterations (int): Maximum Newton iterations for the fat mass.
+
+    Returns:
+        dict: {weight, fat_mass, lean_mass, glycogen, glycogen_rate, ecf, body_fat_percentage, at, tee,
+        time_constant_days, days_to_95_percent}. Masses in kg, glycogen_rate in kg/day (0 unless
+        glycogen is rising), energy terms in kcal/day.
+    """
+    if not is_constant_intake(energy_intake):
+        raise ValueError("A steady state requires a constant energy intake.")
+    fat_mass0 = calculate_initial_fat_mass(sex, age, body_weight, height, body_fat_percentage)
+    ecf = 2.0
+    lean_mass0 = calculate_initial_lean_mass(body_weight, fat_mass0, 0.5, ecf)
+    # Glycogen changes at a constant rate: a falling store empties, a rising one keeps growing
+    dG_dt = calculate_glycogen_dynamics(energy_intake, baseline_ci)
+    glycogen = 0.0 if dG_dt < 0 else 0.5
+    glycogen_rate = max(dG_dt, 0.0)
+    if fat_mass0 <= 0:
+        raise ValueError("Initial fat mass must be positive to solve for a steady state.")
+
+    # Energy balance at the plateau: (1 - BETA_TEF) * PAL * RMR(W) + TEF + AT = EI
+    at = BETA_AT * (energy_intake - baseline_ei)
+    tef = calculate_tef(energy_intake)
+    rmr = (energy_intake - tef - at) / ((1 - BETA_TEF) * pal_factor)
+    c, p, y = RMR[sex]["c"], RMR[sex]["p"], RMR[sex]["y"]
+    rmr_kcal = rmr * MJ_TO_KCAL
+    if rmr_kcal + y * age <= 0:
+        raise ValueError("Energy intake is too low for a steady state.")
+    weight = ((rmr_kcal + y * age) / c) ** (1 / p)
+
+    # Forbes curve: F + L0 + FORBES_CONSTANT * ln(F / F0) + glycogen + ecf = W, solved for u = ln(F)
+    target = weight - lean_mass0 - glycogen - ecf + FORBES_CONSTANT * np.log(fat_mass0)
+    u = np.log(fat_mass0)
+    for _ in range(max_iterations):
+        step = (np.exp(u) + FORBES_CONSTANT * u - target) / (np.exp(u) + FORBES_CONSTANT)
+        u -= step
+        if abs(step) < 1e-12:
+            break
+    fat_mass = float(np.exp(u))
+    lean_mass = weight - fat_mass - glycogen - ecf
+
+    # Time constant: stored energy change over initial energy imbalance
+    stored_energy = RHO_F * (fat_mass - fat_mass0) + RHO_L * (lean_mass - lean_mass0)
+    initial_imbalance = energy_intake - calculate_tee(body_weight, age, sex, energy_intake, at, pal_factor)
+    time_constant = float(stored_energy / initial_imbalance) if initial_imbalance != 0 else 0.0
+
+    return {
+        "weight": weight,
+        "fat_mass": fat_mass,
+        "lean_mass": lean_mass,
+        "glycogen": glycogen,
+        "glycogen_rate": glycogen_rate,
+        "ecf": ecf,
+        "body_fat_percentage": fat_mass / weight,
+        "at": at * MJ_TO_KCAL,
+        "tee": energy_intake * MJ_TO_KCAL,
+        "time_constant_days": time_constant,
+        "days_to_95_percent": time_constant * float(np.log(20)),
+    }
+
+def calculate_energy_intake_for_target_weight(duration_days, target_weight, sex, age, body_weight, height, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], tolerance=0.01, max_iterations=20):
     """
     Calculate the required energy intake to reach a target weight within a given time.
 
+    Final weight is a smooth, increasing and nearly linear function of energy intake, so the root of
+    final_weight(EI) - target_weight is found with the bracketed secant search of
+    `intake_solver.solve_target_intake`, started from the baseline intake and searched on
+    TARGET_INTAKE_BOUNDS. This typically converges in 3-4 simulations. The trajectory of the best
+    evaluated intake is returned as is, without re-simulating.
+
     Parameters:
         duration_days (int): Number of days to reach the target weight.
         target_weight (float): Desired target weight in kilograms.
@@ -318,6 +817,7 @@ def calculate_energy_intake_for_target_weight(duration_days, target_weight, sex,
         body_fat_percentage (float): Initial body fat percentage.
         pal_factor (float): Physical activity level (PAL).
         tolerance (float): Allowable weight difference to consider the target met.
+        max_iterations (int): Maximum number of simulations to run.
 
     Returns:
         tuple: (results, required_energy_intake, maintenance_calories)
@@ -325,34 +825,14 @@ def calculate_energy_intake_for_target_weight(duration_days, target_weight, sex,
             required_energy_intake: Energy intake (kcal/day) needed to achieve the target weight.
             maintenance_calories: TEE (kcal/day) to maintain the target weight.
     """
-    # Start with an initial guess for energy intake
-    low_ei = 1.0  # Lower bound for energy intake (MJ/day)
-    high_ei = 20.0  # Upper bound for energy intake (MJ/day)
-    required_energy_intake = (low_ei + high_ei) / 2.0  # Midpoint initial guess
-
-    while high_ei - low_ei > 0.01:  # Iterate until energy intake is refined
+    def evaluate(energy_intake):
         results = simulate_hall_model(
-            duration_days, sex, age, body_weight, height, required_energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor
+            duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor
         )
-        final_weight = results[-1]["weight"]
-
-        if abs(final_weight - target_weight) <= tolerance:
-            # Target weight is reached within tolerance
-            maintenance_calories = results[-1]["tee"] 
-            return results, required_energy_intake * MJ_TO_KCAL, maintenance_calories
-        elif final_weight > target_weight:
-            # Weight is too high, reduce energy intake
-            high_ei = required_energy_intake
-        else:
-            # Weight is too low, increase energy intake
-            low_ei = required_energy_intake
+        return results, results[-1]["weight"] - target_weight
 
-        required_energy_intake = (low_ei + high_ei) / 2.0
-
-    # If we exit the loop without finding the exact target, return the closest result
-    results = simulate_hall_model(
-        duration_days, sex, age, body_weight, height, required_energy_intake, baseline_ci, baseline_ei, body_fat_percentage, pal_factor
+    required_energy_intake, results = solve_target_intake(
+        evaluate, baseline_ei, TARGET_INTAKE_BOUNDS, MIXED_TISSUE_ENERGY_DENSITY, duration_days, tolerance, max_iterations, min_bracket=0.01
     )
     maintenance_calories = results[-1]["tee"]
     return results, required_energy_intake * MJ_TO_KCAL, maintenance_calories
-
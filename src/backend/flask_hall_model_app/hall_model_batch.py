@@ -0,0 +1,196 @@
+"""
+Batch (vectorized) engine for the Hall model.
+
+Runs many profiles through the same daily forward-Euler scheme as `hall_model.simulate_hall_model`,
+but steps all of them together with NumPy in struct-of-arrays form: every state variable (fat mass,
+lean mass, glycogen, ECF, adaptive thermogenesis) is a 1-D array with one entry per profile, and the
+per-day loop runs once for the whole cohort instead of once per person.
+
+The update order and every formula are identical to the scalar path, so results match
+`simulate_hall_model` to within floating-point rounding (see BATCH_TOLERANCE). The one-day step,
+`step_hall_model_batch`, is shared with the assimilation filter (hall_assimilation).
+"""
+import numpy as np
+
+from hall_model import (
+    RHO_F, RHO_L, RMR, MJ_TO_KCAL, PAL_FACTORS, RESULT_FIELDS, ECF_XI_NA, ECF_XI_CI, FORBES_CONSTANT,
+    calculate_pa, calculate_tef, calculate_adaptive_thermogenesis,
+    calculate_glycogen_dynamics, calculate_ecf_dynamics,
+)
+
+BATCH_TOLERANCE = 1e-9  # Max relative difference versus the scalar simulate_hall_model results
+
+
+def calculate_initial_fat_mass_batch(is_male, age, body_weight, height, body_fat_percentage=None):
+    """
+    Vectorized version of `hall_model.calculate_initial_fat_mass`.
+
+    Parameters:
+        is_male (np.ndarray): Boolean array, True for "male".
+        age (np.ndarray): Age in years.
+        body_weight (np.ndarray): Total body weight in kilograms.
+        height (np.ndarray): Height in meters.
+        body_fat_percentage (np.ndarray): Initial body fat fraction. Entries that are None, NaN or <= 0
+            are estimated from body weight and height.
+
+    Returns:
+        np.ndarray: Initial fat mass in kilograms.
+    """
+    C = np.where(is_male, 37.31, 39.96)
+    D = np.where(is_male, -103.94, -102.01)
+    estimated = (body_weight / 100) * (0.14 * age + C * np.log(body_weight / height**2) + D)
+    if body_fat_percentage is None:
+        fat_mass = estimated
+    else:
+        bfp = np.asarray(body_fat_percentage, dtype=float)
+        measured = (bfp > 0) & ~np.isnan(bfp)
+        fat_mass = np.where(measured, body_weight * np.where(measured, bfp, 0), estimated)
+    return np.maximum(fat_mass, 0)
+
+
+def calculate_rmr_batch(weight, age, is_male):
+    """
+    Vectorized version of `hall_model.calculate_rmr` (Livingston-Kohlstadt formula).
+
+    Parameters:
+        weight (np.ndarray): Weight in kilograms.
+        age (np.ndarray): Age in years.
+        is_male (np.ndarray): Boolean array, True for "male".
+
+    Returns:
+        np.ndarray: Resting Metabolic Rate (RMR) in MJ/day.
+    """
+    c = np.where(is_male, RMR["male"]["c"], RMR["female"]["c"])
+    p = np.where(is_male, RMR["male"]["p"], RMR["female"]["p"])
+    y = np.where(is_male, RMR["male"]["y"], RMR["female"]["y"])
+    rmr = c * (np.maximum(weight, 0) ** p) - y * age
+    rmr /= MJ_TO_KCAL  # Convert kcal/day to MJ/day
+    return np.maximum(rmr, 0)
+
+
+def energy_partitioning_batch(fat_mass):
+    """
+    Vectorized version of `hall_model.energy_partitioning`.
+
+    Parameters:
+        fat_mass (np.ndarray): Fat mass in kilograms.
+
+    Returns:
+        np.ndarray: Nonlinear energy partitioning coefficient (dimensionless).
+    """
+    C = FORBES_CONSTANT * (RHO_L / RHO_F)
+    denominator = C + fat_mass
+    safe = denominator != 0
+    return np.where(safe, C / np.where(safe, denominator, 1), 0.0)
+
+
+STATE_FIELDS = ("fat_mass", "lean_mass", "glycogen", "ecf", "at", "weight")  # Advanced by step_hall_model_batch
+
+
+def step_hall_model_batch(state, intake_bias=0.0):
+    """
+    Advance many profiles by one daily forward-Euler step of the Hall model (the step of
+    `hall_model.iterate_hall_model`, with the same update order).
+
+    Parameters:
+        state (dict): Arrays with one entry per profile: the current STATE_FIELDS and the profile
+            "is_male", "age", "pal_factor", "energy_intake", "baseline_ci" and "baseline_ei" (MJ/day).
+        intake_bias (float or np.ndarray): Energy added to the daily balance in MJ/day (the unlogged
+            intake estimated by the assimilation filter).
+
+    Returns:
+        dict: The next day's STATE_FIELDS, and the terms of the step in MJ/day: "rmr", "pa", "tef"
+        and "tee" (at the current weight), "delta_energy" and the partitioning coefficient "p".
+    """
+    energy_intake, weight, fat_mass = state["energy_intake"], state["weight"], state["fat_mass"]
+    at = calculate_adaptive_thermogenesis(energy_intake - state["baseline_ei"], state["at"])
+    rmr = calculate_rmr_batch(weight, state["age"], state["is_male"])
+    pa = calculate_pa(weight, rmr, state["pal_factor"])
+    tef = calculate_tef(energy_intake)
+    tee = rmr + pa + tef + at
+    delta_energy = energy_intake - tee + intake_bias
+
+    p = energy_partitioning_batch(fat_mass)
+    fat_mass = np.maximum(fat_mass + (1 - p) * delta_energy / RHO_F, 0)
+    lean_mass = np.maximum(state["lean_mass"] + p * delta_energy / RHO_L, 0)
+    glycogen = np.maximum(state["glycogen"] + calculate_glycogen_dynamics(energy_intake, state["baseline_ci"]), 0)
+    ecf = np.maximum(state["ecf"] + calculate_ecf_dynamics(0, 0, ECF_XI_NA, ECF_XI_CI), 0)
+    return {
+        "fat_mass": fat_mass, "lean_mass": lean_mass, "glycogen": glycogen, "ecf": ecf, "at": at,
+        "weight": fat_mass + lean_mass + glycogen + ecf,
+        "rmr": rmr, "pa": pa, "tef": tef, "tee": tee, "delta_energy": delta_energy, "p": p,
+    }
+
+
+def simulate_hall_model_batch(duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"], fields=RESULT_FIELDS):
+    """
+    Simulate weight changes for many profiles at once using the Hall model.
+
+    Every profile argument may be a scalar or an array; all of them are broadcast to a common
+    shape (N,). The simulation uses the same daily step as `simulate_hall_model`, so row k of the
+    output corresponds to results[k] of the scalar path.
+
+    Parameters:
+        duration_days (int): Simulation duration in days (shared by all profiles).
+        sex (array of str): "male" or "female" per profile.
+        age (array of float): Age in years.
+        body_weight (array of float): Initial body weight in kilograms.
+        height (array of float): Height in meters.
+        energy_intake (array of float): Energy intake in MJ/day.
+        baseline_ci (array of float): Baseline carbohydrate intake in grams/day.
+        baseline_ei (array of float): Baseline energy intake in MJ/day.
+        body_fat_percentage (array of float): Initial body fat fraction; None, NaN or <= 0 means estimate.
+        pal_factor (array of float): Physical activity level (PAL).
+        fields (iterable of str): Fields to record; recording fewer fields saves memory on large batches.
+
+    Returns:
+        dict: Struct-of-arrays results. "day" is a 1-D array of simulated days; every field in
+        `fields` is a 2-D array of shape (N, len(day)) with the same units as the scalar path
+        (kg for masses, kcal/day for energy terms).
+    """
+    sex = np.atleast_1d(np.asarray(sex))
+    is_male, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, pal_factor = np.broadcast_arrays(
+        sex == "male", *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (age, body_weight, height, energy_intake, baseline_ci, baseline_ei, pal_factor))
+    )
+    if body_fat_percentage is not None:
+        body_fat_percentage = np.broadcast_to(
+            np.asarray(body_fat_percentage, dtype=float), is_male.shape
+        )
+    n_profiles = is_male.shape[0]
+    n_days = 1 + max(duration_days - 2, 0)
+
+    fat_mass = calculate_initial_fat_mass_batch(is_male, age, body_weight, height, body_fat_percentage)
+    glycogen = np.full(n_profiles, 0.5)  # Initial glycogen stores in kg
+    ecf = np.full(n_profiles, 2.0)       # Initial extracellular fluid in kg
+    state = {
+        "is_male": is_male, "age": age, "pal_factor": pal_factor,
+        "energy_intake": energy_intake, "baseline_ci": baseline_ci, "baseline_ei": baseline_ei,
+        "fat_mass": fat_mass, "lean_mass": np.maximum(body_weight - fat_mass - glycogen - ecf, 0),
+        "glycogen": glycogen, "ecf": ecf, "at": np.zeros(n_profiles), "weight": body_weight.copy(),
+    }
+
+    # Day-major buffers so each day's write is contiguous; transposed on return
+    out = {field: np.empty((n_days, n_profiles)) for field in fields}
+
+    # Day 0 reports the energy terms at the initial state
+    rmr = calculate_rmr_batch(body_weight, age, is_male)
+    terms = {"rmr": rmr, "pa": calculate_pa(body_weight, rmr, pal_factor), "tef": calculate_tef(energy_intake)}
+    terms["tee"] = terms["rmr"] + terms["pa"] + terms["tef"] + state["at"]
+
+    for day in range(n_days):
+        if day > 0:
+            terms = step_hall_model_batch(state)
+            state.update((field, terms[field]) for field in STATE_FIELDS)
+
+        weight, fat_mass = state["weight"], state["fat_mass"]
+        row = {
+            "weight": weight, "body_fat_percentage": fat_mass / weight, "fat_mass": fat_mass, "lean_mass": state["lean_mass"],
+            "glycogen": state["glycogen"], "ecf": state["ecf"], "tee": terms["tee"] * MJ_TO_KCAL, "at": state["at"] * MJ_TO_KCAL,
+            "rmr": terms["rmr"] * MJ_TO_KCAL, "tef": terms["tef"] * MJ_TO_KCAL, "pa": terms["pa"] * MJ_TO_KCAL,
+        }
+        for field, values in out.items():
+            values[day] = row[field]
+
+    results = {field: values.T for field, values in out.items()}
+    results["day"] = np.arange(n_days)
+    return results
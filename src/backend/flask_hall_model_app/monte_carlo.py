@@ -0,0 +1,230 @@
+"""
+Monte Carlo uncertainty bands for Hall and Thomas model forecasts.
+
+A single forecast hides how much the outcome depends on inputs nobody knows exactly: the starting body
+fat, the real activity level and how closely the plan will be followed. Here those inputs are drawn
+from configurable distributions, every draw is simulated, and the per-day percentiles of the chosen
+output (by default p10/p50/p90 of weight) are returned as a band.
+
+Draws are processed in chunks, and each chunk goes through the model's vectorized batch engine. Chunks
+can be spread over a process pool, and each chunk gets its own random stream spawned from the seed, so
+results depend only on the seed, the number of draws and the chunk size, never on the number of workers. Only the output field at the requested days is kept for each draw (as float32), so
+memory is draws x output days x 4 bytes regardless of the model's internal state.
+
+Distribution specs are tuples:
+    ("fixed", value)
+    ("normal", mean, sd)
+    ("uniform", low, high)
+    ("lognormal", mean, sigma)   # of the underlying normal; e.g. ("lognormal", 0, 0.1) for +-10 %
+Sampled values are clipped to PARAMETER_BOUNDS.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hall_model import PAL_FACTORS
+from hall_model_batch import calculate_initial_fat_mass_batch, simulate_hall_model_batch
+
+# Uncertain inputs. adherence is the fraction of the planned change in intake that is actually realized:
+# actual intake = baseline + adherence * (planned - baseline).
+DEFAULT_DISTRIBUTIONS = {
+    "body_fat_percentage": ("normal", 0.0, 0.03),  # Added to the given (or estimated) body fat fraction
+    "pal_factor": ("normal", 0.0, 0.1),            # Added to the given PAL (Hall model only)
+    "adherence": ("normal", 0.8, 0.15),
+}
+PARAMETER_BOUNDS = {
+    "body_fat_percentage": (-0.5, 0.5),
+    "pal_factor": (-1.0, 1.0),
+    "adherence": (0.0, 1.5),
+}
+ABSOLUTE_BOUNDS = {"body_fat_percentage": (0.03, 0.7), "pal_factor": (1.1, 2.5)}  # Applied after offsets
+DEFAULT_PERCENTILES = (10, 50, 90)
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def sample_parameter(rng, spec, size, bounds=None):
+    """
+    Draw values from a distribution spec.
+
+    Parameters:
+        rng (np.random.Generator): Random generator.
+        spec (tuple): Distribution spec (see module docstring).
+        size (int): Number of values.
+        bounds (tuple): Optional (low, high) clip range.
+
+    Returns:
+        np.ndarray: Sampled values.
+    """
+    kind, *params = spec
+    if kind == "fixed":
+        values = np.full(size, float(params[0]))
+    elif kind == "normal":
+        values = rng.normal(params[0], params[1], size)
+    elif kind == "uniform":
+        values = rng.uniform(params[0], params[1], size)
+    elif kind == "lognormal":
+        values = rng.lognormal(params[0], params[1], size)
+    else:
+        raise ValueError(f"Unknown distribution: {kind}")
+    if bounds is not None:
+        values = np.clip(values, *bounds)
+    return values
+
+
+def sample_parameters(rng, distributions, size):
+    """
+    Draw every uncertain input for one chunk.
+
+    Parameters:
+        rng (np.random.Generator): Random generator.
+        distributions (dict): Parameter name -> distribution spec; missing names use DEFAULT_DISTRIBUTIONS.
+        size (int): Number of draws.
+
+    Returns:
+        dict: Parameter name -> array of draws.
+    """
+    specs = dict(DEFAULT_DISTRIBUTIONS, **(distributions or {}))
+    unknown = set(specs) - set(DEFAULT_DISTRIBUTIONS)
+    if unknown:
+        raise ValueError(f"Unknown uncertain parameters: {sorted(unknown)}")
+    # Draw in a fixed order so a seed always produces the same samples
+    return {name: sample_parameter(rng, specs[name], size, PARAMETER_BOUNDS[name]) for name in DEFAULT_DISTRIBUTIONS}
+
+
+def chunk_sizes(draws, chunk_size):
+    """
+    Parameters:
+        draws (int): Total number of draws.
+        chunk_size (int): Maximum draws per chunk.
+
+    Returns:
+        list: Size of each chunk.
+    """
+    chunk_size = max(int(chunk_size), 1)
+    return [min(chunk_size, draws - start) for start in range(0, draws, chunk_size)]
+
+
+def _hall_chunk(seed, size, profile, distributions, field, output_days):
+    rng = np.random.default_rng(seed)
+    samples = sample_parameters(rng, distributions, size)
+    base_fat = profile["body_fat_percentage"]
+    if base_fat is None or base_fat <= 0:
+        # Offsets are applied to the estimated fraction
+        fat_mass = calculate_initial_fat_mass_batch(profile["sex"] == "male", profile["age"], profile["body_weight"], profile["height"])
+        base_fat = float(fat_mass / profile["body_weight"])
+    intake = profile["baseline_ei"] + samples["adherence"] * (profile["energy_intake"] - profile["baseline_ei"])
+    results = simulate_hall_model_batch(
+        profile["duration_days"], profile["sex"], profile["age"], profile["body_weight"], profile["height"], intake,
+        profile["baseline_ci"], profile["baseline_ei"],
+        np.clip(base_fat + samples["body_fat_percentage"], *ABSOLUTE_BOUNDS["body_fat_percentage"]),
+        np.clip(profile["pal_factor"] + samples["pal_factor"], *ABSOLUTE_BOUNDS["pal_factor"]),
+        fields=(field,),
+    )
+    return results[field][:, output_days].astype(np.float32)
+
+
+def _thomas_chunk(seed, size, profile, distributions, field, output_days):
+    import thomas_model
+    from thomas_model_batch import run_simulation_batch
+
+    rng = np.random.default_rng(seed)
+    samples = sample_parameters(rng, distributions, size)
+    sex, age, weight_kg, height_cm = profile["sex"], profile["age"], profile["weight_kg"], profile["height_cm"]
+    base_fat = profile["body_fat_percentage"]
+    if base_fat is None or base_fat <= 0:
+        base_fat = thomas_model.calculate_baseline_fat_mass(weight_kg, age, height_cm, sex) / weight_kg
+    baseline_energy = thomas_model.calculate_baseline_energy_requirements(weight_kg, age, height_cm, sex)
+    body_fat = np.clip(base_fat + samples["body_fat_percentage"], *ABSOLUTE_BOUNDS["body_fat_percentage"])
+    intake = baseline_energy + samples["adherence"] * (profile["energy_intake"] - baseline_energy)
+
+    results = run_simulation_batch(sex, age, weight_kg, height_cm, intake, profile["duration_days"], body_fat, fields=(field,))
+    # A run that stops early at the essential fat or lean mass stays at its last value
+    rows = np.minimum(output_days[None, :], results["days_simulated"][:, None])
+    return np.take_along_axis(results[field], rows, axis=1).astype(np.float32)
+
+
+def _run_chunks(chunk_function, profile, distributions, draws, seed, field, output_days, percentiles, chunk_size, workers):
+    sizes = chunk_sizes(draws, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    samples = np.empty((draws, len(output_days)), dtype=np.float32)
+    arguments = [(chunk_seed, size, profile, distributions, field, output_days) for chunk_seed, size in zip(seeds, sizes)]
+
+    if workers is None or workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = executor.map(chunk_function, *zip(*arguments))
+            start = 0
+            for values in chunks:
+                samples[start:start + len(values)] = values
+                start += len(values)
+    else:
+        start = 0
+        for args in arguments:
+            values = chunk_function(*args)
+            samples[start:start + len(values)] = values
+            start += len(values)
+
+    bands = {"day": np.asarray(output_days), "draws": draws, "field": field}
+    for q, values in zip(percentiles, np.percentile(samples, percentiles, axis=0)):
+        bands[f"p{q:g}"] = values.astype(float)
+    return bands
+
+
+def _output_days(n_days, output_days):
+    if output_days is None:
+        return np.arange(n_days)
+    output_days = np.asarray(output_days, dtype=int)
+    if output_days.size and (output_days.min() < 0 or output_days.max() >= n_days):
+        raise ValueError("output_days must lie within the simulated days.")
+    return output_days
+
+
+def simulate_hall_model_monte_carlo(duration_days, sex, age, body_weight, height, energy_intake, baseline_ci, baseline_ei, body_fat_percentage=None, pal_factor=PAL_FACTORS["sedentary"],
+                                    distributions=None, draws=1000, seed=0, field="weight", percentiles=DEFAULT_PERCENTILES, output_days=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Compute per-day uncertainty bands for a Hall model forecast.
+
+    Parameters:
+        duration_days (int) ... pal_factor (float): As for `hall_model.simulate_hall_model` (constant intake, MJ/day).
+        distributions (dict): Parameter name -> distribution spec for body_fat_percentage (offset),
+            pal_factor (offset) and adherence. Missing names use DEFAULT_DISTRIBUTIONS.
+        draws (int): Number of Monte Carlo draws.
+        seed (int): Seed; the same seed, draws and chunk_size always give the same bands.
+        field (str): Output field to summarize (any of hall_model.RESULT_FIELDS).
+        percentiles (tuple): Percentiles to return.
+        output_days (list of int): Row indices to keep (default: every day). Use a coarser grid to bound
+            memory for long horizons with many draws.
+        chunk_size (int): Draws simulated together in one batch.
+        workers (int): Worker processes (1 runs in this process; None uses every CPU).
+
+    Returns:
+        dict: {"day", "draws", "field", "p10", "p50", "p90", ...}, one value per output day.
+    """
+    profile = {
+        "duration_days": duration_days, "sex": sex, "age": age, "body_weight": body_weight, "height": height,
+        "energy_intake": energy_intake, "baseline_ci": baseline_ci, "baseline_ei": baseline_ei,
+        "body_fat_percentage": body_fat_percentage, "pal_factor": pal_factor,
+    }
+    days = _output_days(1 + max(duration_days - 2, 0), output_days)
+    return _run_chunks(_hall_chunk, profile, distributions, draws, seed, field, days, percentiles, chunk_size, workers)
+
+
+def run_simulation_monte_carlo(sex, age, weight_kg, height_cm, energy_intake, duration_days, body_fat_percentage=0,
+                               distributions=None, draws=1000, seed=0, field="weight", percentiles=DEFAULT_PERCENTILES, output_days=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Compute per-day uncertainty bands for a Thomas model forecast. The pal_factor distribution is
+    ignored, as the Thomas model derives physical activity from the baseline energy requirement.
+
+    Parameters:
+        sex ... body_fat_percentage: As for `thomas_model.run_simulation` (constant intake, kcal/day).
+        distributions, draws, seed, field, percentiles, output_days, chunk_size, workers:
+            As for `simulate_hall_model_monte_carlo`.
+
+    Returns:
+        dict: {"day", "draws", "field", "p10", "p50", "p90", ...}, one value per output day.
+    """
+    profile = {
+        "sex": sex, "age": age, "weight_kg": weight_kg, "height_cm": height_cm, "energy_intake": energy_intake,
+        "duration_days": duration_days, "body_fat_percentage": body_fat_percentage,
+    }
+    days = _output_days(duration_days + 1, output_days)
+    return _run_chunks(_thomas_chunk, profile, distributions, draws, seed, field, days, percentiles, chunk_size, workers)
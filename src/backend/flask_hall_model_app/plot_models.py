@@ -13,15 +13,15 @@ def create_weight_loss_plot(results, model_name="Weight Loss Model"):
     Generate the weight loss plot (weight, fat mass, and lean mass) over time.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, ...}]
         model_name (str): Name of the model for plot title.
     """
     matplotlib.use('Agg')
-    days = [res['day'] for res in results]
-    weights = [res['weight'] * CONVERSION_FACTOR for res in results]
-    fat_mass = [res['fat_mass'] * CONVERSION_FACTOR for res in results]
-    lean_mass = [res['lean_mass'] * CONVERSION_FACTOR for res in results]
+    days = results.column("day")
+    weights = results.column("weight", CONVERSION_FACTOR)
+    fat_mass = results.column("fat_mass", CONVERSION_FACTOR)
+    lean_mass = results.column("lean_mass", CONVERSION_FACTOR)
 
     plt.figure(figsize=(10, 6))
     weight_line, = plt.plot(days, weights, label='Total Weight (lbs)', linewidth=2)
@@ -47,7 +47,7 @@ def save_weight_loss_plot(results):
     Generate the plot and save it to a file.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, ...}]
         model_name (str): Name of the model for plot title.
         filename (str): Filename to save the plot.
@@ -64,17 +64,17 @@ def create_energy_expenditure_plot(results, model_name="Energy Expenditure Model
     Generate the energy expenditure plot (TEE, RMR, DIT, SPA, PA) over time.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
         model_name (str): Name of the model for plot title.
     """
     matplotlib.use('Agg')
-    days = [res['day'] for res in results]
-    tee = [res['tee'] for res in results]
-    at =  [res['at'] for res in results]
-    rmr = [res['rmr'] for res in results]
-    tef = [res['tef'] for res in results]
-    pa =  [res['pa'] for res in results]
+    days = results.column("day")
+    tee = results.column("tee")
+    at = results.column("at")
+    rmr = results.column("rmr")
+    tef = results.column("tef")
+    pa = results.column("pa")
 
     plt.figure(figsize=(10, 6))
     tee_line, = plt.plot(days, tee, label='Total Energy Expenditure (TEE)', linewidth=2)
@@ -103,7 +103,7 @@ def get_weight_loss_plot_image(results):
     Generate the weight loss plot and return the image buffer.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, ...}]
 
     Returns:
@@ -117,7 +117,7 @@ def get_energy_expenditure_plot_image(results):
     Generate the energy expenditure plot and return the image buffer.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
 
     Returns:
@@ -132,7 +132,7 @@ def save_energy_expenditure_plot(results):
     Generate the energy expenditure plot and save it to a file.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
         model_name (str): Name of the model for plot title.
         filename (str): Filename to save the plot.
@@ -149,7 +149,7 @@ def plot_weight_loss_display(results, model_name="Weight Loss Model"):
     Generate and display the weight loss plot locally.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, ...}]
         model_name (str): Name of the model for plot title.
     """
@@ -161,7 +161,7 @@ def plot_energy_expenditure_display(results, model_name="Energy Expenditure Mode
     Generate and display the energy expenditure plot locally.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
+        results (Trajectory): Results of the simulation for
         each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
         model_name (str): Name of the model for plot title.
     """
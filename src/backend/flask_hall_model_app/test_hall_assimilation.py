@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from hall_assimilation import assimilate_readings, assimilation_estimate, create_assimilation_state, forecast_assimilation, predict_assimilation_state
+from hall_model_batch import simulate_hall_model_batch
+
+# sex, age, weight (kg), height (m), energy intake (MJ/day), baseline ci, baseline ei, body fat, pal
+PROFILE = (["male", "female"], [35, 50], [95.0, 72.0], [1.80, 1.62], [9.0, 6.5], [300.0, 250.0], [11.5, 8.4], None, [1.6, 1.4])
+
+
+def test_without_readings_matches_batch_forecast():
+    batch = simulate_hall_model_batch(90, *PROFILE)
+    state = create_assimilation_state(*PROFILE)
+    forecast = forecast_assimilation(state, 88)
+    assert np.array_equal(forecast["weight"], batch["weight"])
+    assert np.array_equal(forecast["fat_mass"], batch["fat_mass"])
+    assert (np.diff(forecast["weight_sd"], axis=1) > 0).all()
+
+    # Users can be advanced by different numbers of days
+    predict_assimilation_state(state, [10, 30])
+    assert state["day"].tolist() == [10, 30]
+    assert state["weight"].tolist() == [batch["weight"][0, 10], batch["weight"][1, 30]]
+    with pytest.raises(ValueError):
+        predict_assimilation_state(state, [-1, 0])
+
+
+def test_readings_correct_state_and_forecast():
+    # The users really eat more than planned; the filter should find out from the scale
+    truth = simulate_hall_model_batch(200, *PROFILE[:4], [10.25, 7.45], *PROFILE[5:])
+    planned = simulate_hall_model_batch(200, *PROFILE)
+    rng = np.random.default_rng(0)
+    days = np.broadcast_to(np.arange(1, 120), (2, 119))
+    readings = truth["weight"][:, 1:120] + rng.normal(0, 0.5, (2, 119))
+    readings[:, ::3] = np.nan  # Missed weigh-ins
+
+    state = assimilate_readings(create_assimilation_state(*PROFILE), days, readings)
+    estimate = assimilation_estimate(state)
+    assert (estimate["day"] == 119).all()
+    assert (np.abs(estimate["fat_mass"] - truth["fat_mass"][:, 119]) < np.abs(planned["fat_mass"][:, 119] - truth["fat_mass"][:, 119]) / 3).all()
+    assert (estimate["intake_bias"] > 100).all() and (estimate["weight_sd"] < 0.5).all()
+
+    forecast = forecast_assimilation(state, 79)
+    assert (np.abs(forecast["weight"][:, -1] - truth["weight"][:, -1]) < 2 * forecast["weight_sd"][:, -1]).all()
+    assert (np.abs(planned["weight"][:, -1] - truth["weight"][:, -1]) > 3).all()
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import hall_model
+from hall_model import calculate_energy_intake_for_target_weight
+
+
+def test_target_intake_solver_converges_in_few_simulations(monkeypatch):
+    calls = []
+    simulate = hall_model.simulate_hall_model
+
+    def counting_simulate(*args, **kwargs):
+        calls.append(args)
+        return simulate(*args, **kwargs)
+
+    monkeypatch.setattr(hall_model, "simulate_hall_model", counting_simulate)
+    results, required_intake, maintenance = calculate_energy_intake_for_target_weight(
+        180, 80.0, "male", 35, 95.0, 1.8, 300.0, 11.0, None, 1.6
+    )
+
+    assert abs(results[-1]["weight"] - 80.0) <= 0.01
+    assert len(calls) <= 4  # The 3-4 simulations the solver documents
+    assert 1000 < required_intake < maintenance
+
+
+def test_adaptive_integrator_tracks_daily_euler_with_few_steps():
+    duration = 3652
+    args = (duration, "male", 35, 95.0, 1.8, 6.0, 300.0, 11.5, None, 1.6)
+    euler = hall_model.simulate_hall_model(*args)
+    adaptive = hall_model.simulate_hall_model(*args, integrator="rk45")
+    sparse = hall_model.simulate_hall_model(*args, integrator="rk45", output_days=[0, 365, duration - 2])
+
+    assert len(adaptive) == len(euler)
+    assert abs(adaptive["weight"] - euler["weight"]).max() <= hall_model.RK45_EULER_BOUND
+    assert 80 <= adaptive.metadata["steps"] <= 100  # "About 100 accepted steps" for 10 years
+    assert list(sparse["day"]) == [0, 365, duration - 2]
+    assert abs(sparse[-1]["weight"] - euler[-1]["weight"]) <= hall_model.RK45_EULER_BOUND
+
+
+def test_adaptive_integrator_clamps_masses_like_euler():
+    # No lean mass to start with, so the deficit would drive it negative without the clamp
+    args = (730, "male", 40, 100.0, 1.8, 7.0, 300.0, 11.5, 0.975, 1.6)
+    euler = hall_model.simulate_hall_model(*args)
+    adaptive = hall_model.simulate_hall_model(*args, integrator="rk45")
+
+    assert min(adaptive["lean_mass"]) == 0.0
+    assert abs(adaptive["weight"] - euler["weight"]).max() <= hall_model.RK45_EULER_BOUND
+
+
+def test_steady_state_matches_long_simulation():
+    args = ("female", 50, 70.0, 1.62, 7.5, 250.0, 8.5, 0.35, 1.4)
+    plateau = hall_model.calculate_steady_state(*args)
+    final = hall_model.simulate_hall_model(20000, *args)[-1]
+
+    for field in ("weight", "fat_mass", "lean_mass"):
+        assert abs(plateau[field] - final[field]) < 0.01
+    assert abs(plateau["tee"] - final["tee"]) < 0.1
+    assert 200 < plateau["time_constant_days"] < 600
+
+    assert plateau["glycogen_rate"] == 0.0
+
+    # The backend's carbohydrate baseline makes glycogen rise without bound; weight still levels off
+    args = ("male", 35, 95.0, 1.8, 10.0, 0.5 * 10.0 / 4, 11.0, None, 1.5)
+    plateau = hall_model.calculate_steady_state(*args)
+    final = hall_model.simulate_hall_model(20000, *args)[-1]
+    assert plateau["glycogen_rate"] == hall_model.calculate_glycogen_dynamics(10.0, 0.5 * 10.0 / 4) > 0
+    assert final["glycogen"] == pytest.approx(plateau["glycogen"] + plateau["glycogen_rate"] * final["day"])
+    assert 0 < final["weight"] - plateau["weight"] < plateau["glycogen_rate"] * plateau["time_constant_days"]
+
+
+def test_continue_simulation_extends_forecast_without_rerun():
+    args = ("male", 40, 100.0, 1.8, 9.0, 300.0, 11.5, None, 1.6)
+    full = hall_model.simulate_hall_model(400, *args)
+    head = hall_model.simulate_hall_model(370, *args)
+    tail = hall_model.continue_simulation(head.metadata["state"], 30)
+
+    assert list(tail["day"]) == list(range(369, 399))
+    assert list(tail["weight"]) == list(full["weight"][369:])
+    assert head.metadata["state"]["day"] == 368
+
+
+def test_weekly_intake_schedule_matches_chained_runs():
+    from intake_schedule import weekly_intake_schedule
+
+    schedule = weekly_intake_schedule(8.0, 11.0, 60)
+    scheduled = hall_model.simulate_hall_model(40, "female", 30, 75.0, 1.68, schedule, 250.0, 9.0)
+    chained = hall_model.create_hall_state("female", 30, 75.0, 1.68, 8.0, 250.0, 9.0)
+    weights = []
+    for day in range(38):
+        chained["energy_intake"] = schedule[day]
+        step = hall_model.continue_simulation(chained, 1)
+        weights.append(step[0]["weight"])
+        chained = step.metadata["state"]
+
+    assert list(scheduled["weight"][1:]) == weights
+
+
+def test_jit_kernel_matches_reference_loop(monkeypatch):
+    import jit_backend
+
+    runs = {}
+    for use_jit in (False, True):
+        monkeypatch.setattr(jit_backend, "USE_JIT", use_jit)
+        runs[use_jit] = hall_model.simulate_hall_model(500, "male", 45, 110.0, 1.83, [(0, 8.0), (200, 12.0)], 300.0, 12.0, None, 1.8)
+    for field in hall_model.RESULT_FIELDS:
+        np.testing.assert_allclose(runs[True][field], runs[False][field], rtol=1e-9)
+    assert runs[True].metadata["state"] == pytest.approx(runs[False].metadata["state"])
+
+
+def test_simulate_until_stops_at_interpolated_target_day(monkeypatch):
+    args = ("male", 35, 95.0, 1.8, 9.0, 300.0, 11.5, None, 1.6)
+    simulated_days = []
+    continue_simulation = hall_model.continue_simulation
+    monkeypatch.setattr(hall_model, "continue_simulation", lambda state, days: simulated_days.append(days) or continue_simulation(state, days))
+    results = hall_model.simulate_hall_model_until(2000, *args, events=[{"type": "weight", "value": 85.0}], chunk_days=30)
+    monkeypatch.undo()
+    full = hall_model.simulate_hall_model(400, *args)
+    event = results.metadata["event"]
+
+    assert event["type"] == "weight" and results[-1]["day"] == np.ceil(event["day"])
+    assert results[-2]["weight"] > 85.0 >= results[-1]["weight"]
+    assert list(results["weight"]) == list(full["weight"][:len(results)])
+    assert results.metadata["state"]["day"] == results[-1]["day"]
+    # Every day was simulated once: whole chunks only, and the event chunk was cut, not re-run
+    assert simulated_days == [30] * len(simulated_days) and sum(simulated_days) >= results[-1]["day"] > sum(simulated_days) - 30
+    tail = hall_model.continue_simulation(results.metadata["state"], 20)
+    assert list(tail["weight"]) == list(full["weight"][len(results):len(results) + 20])
@@ -0,0 +1,31 @@
+import numpy as np
+
+from hall_model import simulate_hall_model
+from hall_model_batch import simulate_hall_model_batch, BATCH_TOLERANCE, RESULT_FIELDS
+
+PROFILES = [
+    # sex, age, weight (kg), height (m), energy intake (MJ/day), baseline ci, baseline ei, body fat, pal
+    ("male", 35, 95.0, 1.80, 9.0, 300.0, 11.5, None, 1.6),
+    ("female", 52, 72.0, 1.62, 6.5, 250.0, 8.4, 0.38, 1.4),
+    ("male", 24, 68.0, 1.75, 13.0, 400.0, 11.0, 0.15, 2.0),
+]
+
+
+def test_batch_matches_scalar_path():
+    duration = 120
+    columns = list(zip(*PROFILES))
+    bfp = [np.nan if value is None else value for value in columns[7]]
+    batch = simulate_hall_model_batch(duration, columns[0], columns[1], columns[2], columns[3], columns[4], columns[5], columns[6], bfp, columns[8])
+
+    for i, profile in enumerate(PROFILES):
+        scalar = simulate_hall_model(duration, *profile)
+        assert batch["weight"].shape[1] == len(scalar)
+        for field in RESULT_FIELDS:
+            expected = np.array([row[field] for row in scalar])
+            np.testing.assert_allclose(batch[field][i], expected, rtol=BATCH_TOLERANCE, atol=1e-12)
+
+
+def test_batch_broadcasts_scalar_arguments():
+    batch = simulate_hall_model_batch(30, "female", 40, [60.0, 80.0, 100.0], 1.65, 7.0, 250.0, 8.0)
+    assert batch["weight"].shape == (3, 29)
+    assert np.all(np.diff(batch["weight"][:, -1]) > 0)
@@ -0,0 +1,32 @@
+import numpy as np
+
+import monte_carlo
+from hall_model import simulate_hall_model
+
+
+def test_hall_bands_are_ordered_and_reproducible():
+    args = (200, "female", 40, 80.0, 1.65, 7.0, 250.0, 9.0, 0.35, 1.5)
+    bands = monte_carlo.simulate_hall_model_monte_carlo(*args, draws=500, seed=7, chunk_size=128)
+    again = monte_carlo.simulate_hall_model_monte_carlo(*args, draws=500, seed=7, chunk_size=128, workers=2)
+
+    assert len(bands["day"]) == len(simulate_hall_model(*args))
+    assert np.all(bands["p10"] <= bands["p50"]) and np.all(bands["p50"] <= bands["p90"])
+    assert bands["p90"][-1] - bands["p10"][-1] > 0.5
+    np.testing.assert_array_equal(bands["p50"], again["p50"])
+
+
+def test_fixed_distributions_reproduce_single_forecast():
+    args = (100, "male", 30, 90.0, 1.8, 9.0, 300.0, 11.0, 0.25, 1.6)
+    fixed = {"body_fat_percentage": ("fixed", 0.0), "pal_factor": ("fixed", 0.0), "adherence": ("fixed", 1.0)}
+    bands = monte_carlo.simulate_hall_model_monte_carlo(*args, distributions=fixed, draws=10, output_days=[0, 50, 98])
+
+    expected = simulate_hall_model(*args)["weight"][[0, 50, 98]]
+    np.testing.assert_allclose(bands["p10"], expected, rtol=1e-6)
+    np.testing.assert_allclose(bands["p90"], expected, rtol=1e-6)
+
+
+def test_thomas_bands_cover_every_day():
+    bands = monte_carlo.run_simulation_monte_carlo("male", 35, 95.0, 180, 1900, 60, draws=20, seed=3)
+
+    assert len(bands["day"]) == 61
+    assert bands["p10"][-1] <= bands["p50"][-1] <= bands["p90"][-1] < 95.0
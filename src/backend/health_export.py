@@ -0,0 +1,225 @@
+"""
+Streaming ingestion of Apple Health export.xml files.
+
+A bulk export (export.xml from the Health app's "Export All Health Data") can be several GB, so it is
+never loaded as a tree. `ingest_health_export` walks it with ElementTree.iterparse, keeps only the
+record types the models use (RECORD_TYPES, the HealthKit types read by the app's HealthKitHelper), and
+clears every element once it has been handled. Accepted records are buffered in small per-type
+batches, converted to typed columns (timestamps parsed vectorized per batch) and appended to a
+measurement_store.MeasurementStore, so memory use stays flat regardless of the size of the export.
+
+Output, per user in the store (see measurement_store for the column format):
+    <kind>.day         record start day in the record's local time zone
+    <kind>.value       value in the model units (kg, fraction, kcal, steps, cm)
+    <kind>.timestamp   record start time, seconds since 1970-01-01 UTC
+    <kind>.source      index into manifest["sources"] (the app or device that wrote it)
+    manifest.json      counts per kind, the source names, the <Me> characteristics and the throughput
+
+`load_health_export` memory-maps the columns back.
+"""
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from measurement_store import MeasurementStore
+from weight_resampling import timestamps_to_days
+
+logger = logging.getLogger(__name__)
+
+# HealthKit record type -> (kind, {unit: factor to the model unit})
+RECORD_TYPES = {
+    "HKQuantityTypeIdentifierBodyMass": ("body_mass", {"kg": 1.0, "lb": 0.45359237, "g": 0.001, "st": 6.35029318}),
+    "HKQuantityTypeIdentifierBodyFatPercentage": ("body_fat_percentage", {"%": 1.0}),  # Exported as a fraction
+    "HKQuantityTypeIdentifierDietaryEnergyConsumed": ("dietary_energy", {"kcal": 1.0, "Cal": 1.0, "kJ": 1 / 4.184}),
+    "HKQuantityTypeIdentifierStepCount": ("steps", {"count": 1.0}),
+    "HKQuantityTypeIdentifierHeight": ("height", {"cm": 1.0, "m": 100.0, "in": 2.54, "ft": 30.48}),
+}
+COLUMNS = ("day", "value", "timestamp", "source")
+DEFAULT_BATCH_RECORDS = 16384  # Records buffered per kind before they are written
+MANIFEST = "manifest.json"
+INVALID_TIMESTAMP = np.datetime64("NaT").astype(np.int64)  # Marks dates parse_export_dates rejects
+
+
+def parse_export_dates(dates):
+    """
+    Convert export.xml dates ("2024-01-05 07:12:00 -0500") to Unix seconds and local days.
+
+    Parameters:
+        dates (list of str): Dates with a numeric UTC offset.
+
+    Returns:
+        tuple: (int64 seconds since 1970-01-01 UTC, int64 local calendar days since 1970-01-01).
+        Timestamps are INVALID_TIMESTAMP where a date cannot be parsed.
+    """
+    try:
+        return _parse_dates(dates)
+    except ValueError:
+        # A malformed date somewhere in the batch: parse one by one, so only the bad ones are lost
+        timestamps, days = np.empty(len(dates), dtype=np.int64), np.zeros(len(dates), dtype=np.int64)
+        for i, date in enumerate(dates):
+            try:
+                (timestamps[i],), (days[i],) = _parse_dates([date])
+            except ValueError:
+                timestamps[i] = INVALID_TIMESTAMP
+        return timestamps, days
+
+
+def _parse_dates(dates):
+    local = np.array([date[:19] for date in dates], dtype="datetime64[s]").astype(np.int64)
+    offsets = np.array([date[20:25] for date in dates]).astype(np.int64)  # e.g. -500 for -05:00
+    signs, offsets = np.sign(offsets), np.abs(offsets)
+    if (local == INVALID_TIMESTAMP).any() or (offsets > 1400).any() or (offsets % 100 >= 60).any():
+        raise ValueError("Invalid date or UTC offset.")
+    return local - signs * (offsets // 100 * 3600 + offsets % 100 * 60), timestamps_to_days(local)
+
+
+class _KindWriter:
+    """
+    Buffer records of one kind and append them to the store in batches.
+    """
+
+    def __init__(self, store, user_id, kind, batch_records):
+        self.store, self.user_id, self.kind = store, user_id, kind
+        store.delete(user_id, kind)  # A new export replaces the previous one
+        self.batch_records = batch_records
+        self.dates, self.values, self.sources = [], [], []
+        self.count = self.skipped = 0
+        self.last_day = None
+        self.ordered = True  # Exports are sorted by date within a type, but this is not guaranteed
+
+    def append(self, date, value, source):
+        self.dates.append(date)
+        self.values.append(value)
+        self.sources.append(source)
+        if len(self.dates) >= self.batch_records:
+            self.flush()
+
+    def flush(self):
+        if not self.dates:
+            return
+        timestamps, days = parse_export_dates(self.dates)
+        valid = timestamps != INVALID_TIMESTAMP
+        days = days[valid]
+        if len(days):
+            self.ordered &= not (np.diff(days) < 0).any() and (self.last_day is None or days[0] >= self.last_day)
+            self.last_day = days[-1] if self.last_day is None else max(self.last_day, days.max())
+            self.store.append(self.user_id, self.kind, days, np.array(self.values)[valid], check_order=False,
+                              timestamp=timestamps[valid], source=np.array(self.sources)[valid])
+        self.count += len(days)
+        self.skipped += len(valid) - len(days)
+        self.dates, self.values, self.sources = [], [], []
+
+    def close(self):
+        self.flush()
+        if not self.ordered:
+            self.store.sort(self.user_id, self.kind)
+
+
+def ingest_health_export(path, store, user_id, batch_records=DEFAULT_BATCH_RECORDS, clock=time.perf_counter):
+    """
+    Stream an Apple Health export.xml into a measurement store.
+
+    Parameters:
+        path (str): Path to export.xml (or an open binary file).
+        store (MeasurementStore): Store to write to.
+        user_id (str): User the export belongs to; the user's stored RECORD_TYPES kinds are replaced.
+        batch_records (int): Records buffered per kind before writing.
+        clock (callable): Timer for the throughput figure.
+
+    Returns:
+        dict: The manifest: {"counts": {kind: records}, "sources": [...], "person": {...},
+        "records_seen", "skipped", "seconds", "records_per_second"}.
+    """
+    started = clock()
+    writers = {kind: _KindWriter(store, user_id, kind, batch_records) for kind, _ in RECORD_TYPES.values()}
+    sources, person = {}, {}
+    seen = skipped = 0
+
+    try:
+        context = ET.iterparse(path, events=("start", "end"))
+        _, root = next(context)
+        depth = 1
+        for event, element in context:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue  # Nested elements (metadata, or records inside a Correlation, which repeat top-level ones)
+            if element.tag == "Record":
+                seen += 1
+                record_type = RECORD_TYPES.get(element.get("type"))
+                if record_type is not None:
+                    kind, units = record_type
+                    try:
+                        value = float(element.get("value")) * units[element.get("unit")]
+                        date = element.get("startDate")
+                        if date is None or len(date) < 25:
+                            raise ValueError(f"Invalid date: {date}")
+                        source = sources.setdefault(element.get("sourceName", ""), len(sources))
+                        writers[kind].append(date, value, source)
+                    except (KeyError, TypeError, ValueError):
+                        skipped += 1  # Unknown unit, or missing / non-numeric value or date
+            elif element.tag == "Me":
+                person = dict(element.attrib)
+            # Drop every finished top-level element, so the tree never grows
+            element.clear()
+            root.clear()
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    seconds = clock() - started
+    skipped += sum(writer.skipped for writer in writers.values())  # Malformed dates, found per batch
+    manifest = {
+        "counts": {kind: writer.count for kind, writer in writers.items()},
+        "sources": sorted(sources, key=sources.get),
+        "person": person,
+        "records_seen": seen,
+        "skipped": skipped,
+        "seconds": seconds,
+        "records_per_second": seen / seconds if seconds > 0 else 0.0,
+    }
+    os.makedirs(store.directory(user_id), exist_ok=True)
+    with open(os.path.join(store.directory(user_id), MANIFEST), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    logger.info("Ingested %d of %d records from %s in %.1f s (%.0f records/s).",
+                sum(manifest["counts"].values()), seen, path, seconds, manifest["records_per_second"])
+    return manifest
+
+
+def load_health_export(store, user_id):
+    """
+    Memory-map the columns written by ingest_health_export.
+
+    Parameters:
+        store (MeasurementStore): Store passed to ingest_health_export.
+        user_id (str): User id passed to ingest_health_export.
+
+    Returns:
+        dict: {kind: {"day", "value", "timestamp", "source"}} plus "manifest". Empty kinds are empty arrays.
+    """
+    with open(os.path.join(store.directory(user_id), MANIFEST)) as handle:
+        manifest = json.load(handle)
+    export = {"manifest": manifest}
+    for kind in manifest["counts"]:
+        export[kind] = dict(zip(COLUMNS, store.load(user_id, kind, COLUMNS)))
+    return export
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load an Apple Health export.xml into a measurement store.")
+    parser.add_argument("export", help="Path to export.xml")
+    parser.add_argument("store", help="Measurement store directory")
+    parser.add_argument("user", help="User id")
+    arguments = parser.parse_args()
+    result = ingest_health_export(arguments.export, MeasurementStore(arguments.store), arguments.user)
+    print(f"{result['records_seen']} records in {result['seconds']:.1f} s ({result['records_per_second']:.0f} records/s)")
+    for kind, count in result["counts"].items():
+        print(f"  {kind}: {count}")
@@ -0,0 +1,91 @@
+"""
+Energy intake schedules shared by the Hall and Thomas models.
+
+An energy intake argument may be:
+    - a number: the same intake every day (the default, handled without any per-day lookup),
+    - a sequence of numbers: the intake for day 0, 1, 2, ... (the last value repeats after the end),
+    - a sequence of (start_day, intake) pairs: a piecewise-constant schedule, e.g.
+      [(0, 1500), (28, 2500), (35, 1500)] for a one-week diet break starting on day 28.
+
+Units are whatever the model uses (MJ/day for Hall, kcal/day for Thomas). Schedules are kept in their
+original form inside simulation states, so they stay JSON-serializable and continued runs see the same
+absolute days.
+"""
+import numbers
+
+import numpy as np
+
+
+def is_constant_intake(energy_intake):
+    """
+    Parameters:
+        energy_intake: Energy intake number or schedule.
+
+    Returns:
+        bool: True if the intake is a single number.
+    """
+    return isinstance(energy_intake, numbers.Real) or (isinstance(energy_intake, np.ndarray) and energy_intake.ndim == 0)
+
+
+def _is_piecewise(energy_intake):
+    first = energy_intake[0]
+    return not isinstance(first, numbers.Real) and len(first) == 2
+
+
+def daily_intake(energy_intake, first_day, days):
+    """
+    Expand an intake schedule into one value per day.
+
+    Parameters:
+        energy_intake: Energy intake number or schedule (see module docstring).
+        first_day (int): First day to return.
+        days (int): Number of days to return.
+
+    Returns:
+        list or None: Intake for days first_day .. first_day + days - 1, or None for a constant intake.
+    """
+    if is_constant_intake(energy_intake):
+        return None
+    if len(energy_intake) == 0:
+        raise ValueError("Energy intake schedule must not be empty.")
+    day_index = np.arange(first_day, first_day + max(days, 0))
+    if _is_piecewise(energy_intake):
+        pieces = sorted((int(start), float(value)) for start, value in energy_intake)
+        starts = np.array([start for start, _ in pieces])
+        values = np.array([value for _, value in pieces])
+        positions = np.maximum(np.searchsorted(starts, day_index, side="right") - 1, 0)
+    else:
+        values = np.asarray(energy_intake, dtype=float)
+        positions = np.minimum(day_index, len(values) - 1)
+    return values[positions].tolist()
+
+
+def intake_on_day(energy_intake, day):
+    """
+    Parameters:
+        energy_intake: Energy intake number or schedule.
+        day (int): Day of the simulation.
+
+    Returns:
+        float: Intake on that day.
+    """
+    if is_constant_intake(energy_intake):
+        return energy_intake
+    return daily_intake(energy_intake, day, 1)[0]
+
+
+def weekly_intake_schedule(weekday_intake, weekend_intake, days, start_weekday=0):
+    """
+    Build a per-day schedule with one intake on weekdays and another on weekends.
+
+    Parameters:
+        weekday_intake (float): Intake Monday to Friday.
+        weekend_intake (float): Intake Saturday and Sunday.
+        days (int): Length of the schedule in days.
+        start_weekday (int): Weekday of day 0 (0 = Monday, as in datetime.weekday()).
+
+    Returns:
+        list: Intake for each day.
+    """
+    weekday = (np.arange(days) + start_weekday) % 7
+    return np.where(weekday >= 5, weekend_intake, weekday_intake).tolist()
@@ -0,0 +1,67 @@
+"""
+Inverse solver shared by the Hall and Thomas models: the constant energy intake that reaches a target
+weight after a given number of days.
+
+Final weight is a smooth, increasing and nearly linear function of the intake, so the root of
+final_weight(EI) - target_weight is found with a secant iteration. The first guess is the baseline
+(or warm-start) intake, the second spreads the required energy change over the duration using the
+energy density of weight change. Every evaluation tightens a bracket by the sign of its error; a
+secant step that would leave the bracket, or a flat response (e.g. early termination or a 1-day
+simulation), falls back to bisection. The best evaluated trajectory is returned as is, without
+re-simulating.
+
+Units are whatever the model uses (MJ/day for Hall, kcal/day for Thomas).
+"""
+
+
+def solve_target_intake(evaluate, initial_intake, bounds, energy_density, duration_days, tolerance=0.01, max_iterations=20, min_bracket=0.0):
+    """
+    Find the intake whose final weight is closest to the target.
+
+    Parameters:
+        evaluate (callable): evaluate(energy_intake) -> (results, final weight minus target weight in kg).
+        initial_intake (float): First guess; clamped to the bounds.
+        bounds (tuple): (lowest, highest) intake searched.
+        energy_density (float): Energy content of a kilogram of weight change, in intake units times days.
+        duration_days (int): Simulated days (for the second guess).
+        tolerance (float): Allowable weight difference in kilograms to consider the target met.
+        max_iterations (int): Maximum number of evaluations.
+        min_bracket (float): Stop once the bracket is this narrow.
+
+    Returns:
+        tuple: (energy_intake, results) of the best evaluation.
+    """
+    low_ei, high_ei = bounds
+    ei_prev = min(max(initial_intake, low_ei), high_ei)
+    results, error_prev = evaluate(ei_prev)
+    best = (abs(error_prev), ei_prev, results)
+    if error_prev > 0:
+        high_ei = ei_prev
+    else:
+        low_ei = ei_prev
+    ei = ei_prev - error_prev * energy_density / max(duration_days, 1)
+
+    for _ in range(max_iterations - 1):
+        if best[0] <= tolerance or high_ei - low_ei <= min_bracket:
+            break
+        if not low_ei < ei < high_ei:
+            ei = (low_ei + high_ei) / 2.0
+        results, error = evaluate(ei)
+        if abs(error) < best[0]:
+            best = (abs(error), ei, results)
+
+        # Final weight increases with intake, so the sign of the error tightens the bracket
+        if error > 0:
+            high_ei = ei
+        else:
+            low_ei = ei
+
+        # Secant step; a flat response falls back to bisection
+        if error != error_prev:
+            ei_next = ei - error * (ei - ei_prev) / (error - error_prev)
+        else:
+            ei_next = (low_ei + high_ei) / 2.0
+        ei_prev, error_prev, ei = ei, error, ei_next
+
+    _, energy_intake, results = best
+    return energy_intake, results
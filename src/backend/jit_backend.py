@@ -0,0 +1,29 @@
+"""
+Optional JIT compilation for the per-day model loops.
+
+When Numba is installed, `njit` compiles the kernels in hall_model and thomas_model to machine code.
+Otherwise `njit` returns the function unchanged and the models keep using their reference Python loops,
+so nothing else has to change. The backend is chosen once, at import; set FITMOMENTUM_JIT=0 in the
+environment to force the pure-Python backend.
+"""
+import os
+
+JIT_BACKEND = "python"
+
+if os.environ.get("FITMOMENTUM_JIT", "1") != "0":
+    try:
+        from numba import njit
+        JIT_BACKEND = "numba"
+    except ImportError:
+        pass
+
+if JIT_BACKEND == "python":
+    def njit(*args, **kwargs):
+        """
+        No-op stand-in for numba.njit, usable both as @njit and @njit(cache=True).
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
+
+USE_JIT = JIT_BACKEND == "numba"  # Whether the models route their loops through the compiled kernels
@@ -0,0 +1,247 @@
+"""
+Memory-mapped columnar store for per-user measurement histories.
+
+Measurement histories used to travel as {date_string: weight} dicts (see smooth_weight_data and
+estimate_caloric_intake) that were re-parsed on every request. The store keeps them on disk as raw
+little-endian columns, one file per user, kind and column:
+
+    <root>/<user_id>/<kind>.day         int32    local calendar day, days since 1970-01-01, non-decreasing
+    <root>/<user_id>/<kind>.value       float32  measurement value
+    <root>/<user_id>/<kind>.timestamp   int64    optional: seconds since 1970-01-01 UTC
+    <root>/<user_id>/<kind>.source      int32    optional: index into the user's source names
+
+This is also the output format of health_export.ingest_health_export, which fills the optional
+columns. Reads memory-map the files, so loading a user's history copies nothing and touches only the
+pages used; a date-range query is a binary search on the day column (O(log n)) and returns views.
+Writes are append-only and must not go back in time (bulk loads may append unordered data and call
+`sort` once at the end). The day column is written last and readers use the shortest column, so a
+reader never sees a half-written measurement.
+"""
+import os
+import re
+
+import numpy as np
+
+from weight_resampling import timestamps_to_days
+
+COLUMNS = {
+    "value": np.dtype("<f4"),
+    "timestamp": np.dtype("<i8"),
+    "source": np.dtype("<i4"),
+    "day": np.dtype("<i4"),        # Last: written after the others
+}
+REQUIRED_COLUMNS = ("day", "value")
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")  # User ids and kinds become file names
+
+
+def _as_days(dates):
+    # Epoch days as int32: integers are taken as days already, anything else (ISO date strings,
+    # datetime.date, datetime64) is converted like a UTC timestamp
+    dates = np.asarray(dates)
+    if not np.issubdtype(dates.dtype, np.integer):
+        dates = timestamps_to_days(dates.astype("datetime64[s]"))
+    return dates.astype(COLUMNS["day"])
+
+
+def weight_data_to_columns(weight_data):
+    """
+    Convert a {date_string: weight} dict to (epoch days, values) columns sorted by day.
+
+    Parameters:
+        weight_data (dict): Dates ("YYYY-MM-DD") as keys and weights (kg) as values.
+
+    Returns:
+        tuple: (int32 days, float32 values).
+    """
+    days = _as_days(list(weight_data.keys()))
+    values = np.asarray(list(weight_data.values()), dtype=COLUMNS["value"])
+    order = np.argsort(days, kind="stable")
+    return days[order], values[order]
+
+
+def columns_to_weight_data(days, values):
+    """
+    Convert (epoch days, values) columns to the {date_string: weight} dict used by smooth_weight_data
+    and estimate_caloric_intake.
+
+    Parameters:
+        days (np.ndarray): Epoch days.
+        values (np.ndarray): Values.
+
+    Returns:
+        dict: ISO date strings as keys, floats as values.
+    """
+    dates = np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(str)
+    return dict(zip(dates.tolist(), np.asarray(values, dtype=float).tolist()))
+
+
+class MeasurementStore:
+    """
+    Append-only, memory-mapped measurement columns per user and kind (see module docstring).
+
+    Parameters:
+        root (str): Directory holding the store; created if needed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def directory(self, user_id):
+        """
+        Returns:
+            str: The user's directory (which may not exist yet).
+        """
+        user_id = str(user_id)
+        if not NAME_PATTERN.match(user_id) or user_id in (".", ".."):
+            raise ValueError(f"Invalid user id: {user_id!r}")
+        return os.path.join(self.root, user_id)
+
+    def _path(self, user_id, kind, column):
+        if not NAME_PATTERN.match(str(kind)):
+            raise ValueError(f"Invalid kind: {kind!r}")
+        return os.path.join(self.directory(user_id), f"{kind}.{column}")
+
+    def users(self):
+        """
+        Returns:
+            list: Sorted ids of the users with stored measurements.
+        """
+        return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir())
+
+    def columns(self, user_id, kind):
+        """
+        Returns:
+            list: Names of the columns stored for the user and kind (empty if there are none).
+        """
+        return [column for column in COLUMNS if os.path.exists(self._path(user_id, kind, column))]
+
+    def count(self, user_id, kind):
+        """
+        Returns:
+            int: Number of complete measurements stored for the user and kind.
+        """
+        columns = self.columns(user_id, kind)
+        if not columns:
+            return 0
+        return min(os.path.getsize(self._path(user_id, kind, column)) // COLUMNS[column].itemsize for column in columns)
+
+    def load(self, user_id, kind, columns=REQUIRED_COLUMNS):
+        """
+        Memory-map a user's full history (zero-copy, read-only).
+
+        Parameters:
+            user_id (str): User id.
+            kind (str): Measurement kind, e.g. "weight".
+            columns (tuple): Columns to load (see COLUMNS).
+
+        Returns:
+            tuple: One array per column, empty if nothing is stored.
+        """
+        count = self.count(user_id, kind)
+        if count == 0:
+            return tuple(np.zeros(0, dtype=COLUMNS[column]) for column in columns)
+        return tuple(np.memmap(self._path(user_id, kind, column), dtype=COLUMNS[column], mode="r", shape=(count,))
+                     for column in columns)
+
+    def query(self, user_id, kind, start=None, end=None, columns=REQUIRED_COLUMNS):
+        """
+        Measurements between two dates (both inclusive), found by binary search.
+
+        Parameters:
+            user_id (str): User id.
+            kind (str): Measurement kind.
+            start, end: Epoch days, ISO date strings, datetime.date or datetime64 values; None leaves the
+                range open.
+            columns (tuple): Columns to return (see COLUMNS).
+
+        Returns:
+            tuple: One view into the memory-mapped columns per column.
+        """
+        days, *loaded = self.load(user_id, kind, ("day",) + tuple(columns))
+        lo = 0 if start is None else int(np.searchsorted(days, _as_days([start])[0], side="left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, _as_days([end])[0], side="right"))
+        return tuple(column[lo:hi] for column in loaded)
+
+    def last_day(self, user_id, kind):
+        """
+        Returns:
+            int or None: Epoch day of the latest stored measurement.
+        """
+        days, = self.load(user_id, kind, ("day",))
+        return int(days[-1]) if len(days) else None
+
+    def append(self, user_id, kind, days, values, check_order=True, **columns):
+        """
+        Append measurements. Days must be non-decreasing and not before the last stored day.
+
+        Parameters:
+            user_id (str): User id.
+            kind (str): Measurement kind.
+            days: Epoch days, ISO date strings, datetime.date or datetime64 values.
+            values (array-like): Values, one per day.
+            check_order (bool): Reject days that go back in time. Bulk loads may pass False and call
+                `sort` when they are done.
+            **columns: Optional columns ("timestamp", "source"); every append to a kind must give the
+                same ones.
+
+        Returns:
+            int: Number of measurements stored after the append.
+        """
+        columns = {"day": _as_days(days), "value": np.asarray(values, dtype=COLUMNS["value"]), **columns}
+        if set(columns) - set(COLUMNS):
+            raise ValueError(f"Unknown columns: {sorted(set(columns) - set(COLUMNS))}")
+        if columns["day"].ndim != 1 or any(np.shape(data) != columns["day"].shape for data in columns.values()):
+            raise ValueError("All columns must be 1-D arrays of equal length.")
+        stored = self.columns(user_id, kind)
+        if stored and set(stored) != set(columns):
+            raise ValueError(f"{kind} is stored with the columns {stored}.")
+        if check_order:
+            days, last = columns["day"], self.last_day(user_id, kind)
+            if len(days) and ((np.diff(days) < 0).any() or (last is not None and days[0] < last)):
+                raise ValueError("Measurements must be appended in date order.")
+
+        os.makedirs(self.directory(user_id), exist_ok=True)
+        count = self.count(user_id, kind)
+        # Drop the tail of an interrupted earlier append, then write the columns in COLUMNS order
+        for column in COLUMNS:
+            if column in columns:
+                with open(self._path(user_id, kind, column), "ab") as handle:
+                    handle.truncate(count * COLUMNS[column].itemsize)
+                    handle.write(np.asarray(columns[column]).astype(COLUMNS[column], copy=False).tobytes())
+        return count + len(columns["day"])
+
+    def append_weight_data(self, user_id, weight_data, kind="weight"):
+        """
+        Append a {date_string: weight} dict (e.g. from an older request format).
+
+        Returns:
+            int: Number of measurements stored after the append.
+        """
+        return self.append(user_id, kind, *weight_data_to_columns(weight_data))
+
+    def sort(self, user_id, kind):
+        """
+        Rewrite a kind's columns in date order (stable), after appends with check_order=False. Meant for
+        bulk loads: the columns are replaced one after the other, not atomically.
+        """
+        columns = self.columns(user_id, kind)
+        data = self.load(user_id, kind, columns)
+        days = data[columns.index("day")]
+        if not (np.diff(days) < 0).any():
+            return
+        order = np.argsort(days, kind="stable")
+        for column, values in zip(columns, data):
+            path = self._path(user_id, kind, column)
+            with open(path + ".tmp", "wb") as handle:
+                handle.write(np.asarray(values[order]).tobytes())
+        for column in columns:
+            path = self._path(user_id, kind, column)
+            os.replace(path + ".tmp", path)
+
+    def delete(self, user_id, kind):
+        """
+        Remove every column of a kind for the user.
+        """
+        for column in self.columns(user_id, kind):
+            os.remove(self._path(user_id, kind, column))
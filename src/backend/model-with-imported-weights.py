@@ -1,6 +1,8 @@
 import numpy as np
-from scipy.optimize import fsolve
-from thomas_model import calculate_baseline_fat_mass, calculate_rmr, calculate_dit, calculate_pa, calculate_spa, CL, CF, calculate_partial_derivatives
+from thomas_model import RMR
+from thomas_model_batch import calculate_dit_batch, calculate_pa_batch, calculate_rmr_batch, calculate_spa_batch
+
+ENERGY_PER_KG = 7700  # kcal per kg of weight change
 
 # Function to smooth weight data based on trends
 def smooth_weight_data(weight_data):
@@ -14,90 +16,85 @@ def smooth_weight_data(weight_data):
         dict: A smoothed version of the weight data.
     """
     dates = list(weight_data.keys())
-    weights = list(weight_data.values())
+    weights = np.asarray(list(weight_data.values()), dtype=float)
 
     # Calculate daily changes
     daily_changes = np.diff(weights)
     avg_change = np.mean(daily_changes)
 
-    # Generate smoothed weights based on the trend
-    smoothed_weights = [weights[0]]  # Start with the initial weight
-    for i in range(1, len(weights)):
-        smoothed_weights.append(smoothed_weights[-1] + avg_change)
+    # Generate smoothed weights based on the trend, starting with the initial weight
+    smoothed_weights = weights[0] + np.concatenate(([0.0], np.cumsum(np.full(len(weights) - 1, avg_change))))
 
-    # Adjust for reversing trends
-    for i in range(1, len(weights)):
-        if (weights[i] - weights[i - 1]) * avg_change < 0:  # Detect trend reversal
-            smoothed_weights[i] = weights[i]  # Align with actual data
+    # Adjust for reversing trends: align with actual data where the day's change opposes the trend
+    reversed_trend = np.concatenate(([False], daily_changes * avg_change < 0))
+    smoothed_weights[reversed_trend] = weights[reversed_trend]
 
     return {date: smoothed_weights[i] for i, date in enumerate(dates)}
 
-# Function to estimate caloric intake from weight data
-def estimate_caloric_intake(weight_data, sex, age, height_cm):
+# Function to estimate the caloric intake of every day from weight data
+def estimate_daily_caloric_intake(weight_data, sex, age, height_cm):
     """
-    Estimate caloric intake based on weight data and the Thomas model.
+    Estimate the caloric intake of each day from weight data and the Thomas model energy expenditure.
+
+    Every day is independent: the intake is the day's total energy expenditure (from the smoothed weight
+    at the start of the day) plus the energy stored in the day's weight change, so all days are computed
+    in one vectorized pass.
 
     Parameters:
-        weight_data (dict): A dictionary with dates as keys and weights (in kg) as values.
+        weight_data (dict): A dictionary with dates as keys and weights (in kg) as values, one per day.
         sex (str): "male" or "female".
         age (int): Age in years.
         height_cm (float): Height in centimeters.
 
     Returns:
-        float: Estimated average daily caloric intake.
+        dict: "date" (the first date of each daily interval), "weight" (smoothed weight at that date),
+        "weight_change" (kg), "tee" and "intake" (kcal/day), each with one entry per day.
     """
+    if sex not in RMR:
+        raise ValueError("Sex must be 'male' or 'female'.")
+    if len(weight_data) < 2:
+        raise ValueError("At least two weights are needed to estimate intake.")
+
     # Smooth the weight data
     smoothed_data = smooth_weight_data(weight_data)
 
     # Extract smoothed weights and calculate daily changes
-    dates = list(smoothed_data.keys())
-    weights = list(smoothed_data.values())
-    daily_changes = np.diff(weights)
+    dates = list(smoothed_data.keys())[:-1]
+    all_weights = np.fromiter(smoothed_data.values(), dtype=float)
+    weights = all_weights[:-1]
+    daily_changes = np.diff(all_weights)
+    losing = daily_changes < 0
+
+    # Energy expenditure components of each day
+    rmr = calculate_rmr_batch(weights, age + np.arange(len(weights)) / 365, sex == "male")
+    dit = calculate_dit_batch(rmr, losing)
+    pa = calculate_pa_batch(weights, 0.3 * rmr, weights[0])  # Assume 30% of RMR for baseline PA
+    spa = calculate_spa_batch(rmr, pa, dit, losing)
+    tee = rmr + dit + pa + spa
+
+    return {
+        "date": dates,
+        "weight": weights,
+        "weight_change": daily_changes,
+        "tee": tee,
+        "intake": tee + daily_changes * ENERGY_PER_KG,
+    }
+
+# Function to estimate caloric intake from weight data
+def estimate_caloric_intake(weight_data, sex, age, height_cm):
+    """
+    Estimate caloric intake based on weight data and the Thomas model.
+
+    Parameters:
+        weight_data (dict): A dictionary with dates as keys and weights (in kg) as values.
+        sex (str): "male" or "female".
+        age (int): Age in years.
+        height_cm (float): Height in centimeters.
 
-    # Initialize variables for estimation
-    estimated_intakes = []
-    fat_mass = calculate_baseline_fat_mass(weights[0], age, height_cm, sex)
-    ffm = weights[0] - fat_mass
-
-    for i, delta_weight in enumerate(daily_changes):
-        rmr = calculate_rmr(weights[i], age + i / 365, sex)
-        dit = calculate_dit(rmr, "loss" if delta_weight < 0 else "gain")
-        pa = calculate_pa(weights[i], 0.3 * rmr, weights[0])  # Assume 30% of RMR for baseline PA
-        spa = calculate_spa(rmr, pa, dit, "loss" if delta_weight < 0 else "gain", 0)
-        tee = rmr + dit + pa + spa
-
-        # Define equations for dF/dt and dFFM/dt
-        def coupled_equations(d_vars):
-            dF_dt, dFFM_dt = d_vars
-            eq1 = CL * dFFM_dt + CF * dF_dt - (delta_weight * 7700)  # Energy balance
-            eq2 = dFFM_dt - calculate_partial_derivatives(fat_mass, age, i, height_cm, sex)[1]
-            return [eq1, eq2]
-
-        # Solve for changes in fat and FFM
-        dF_dt, dFFM_dt = fsolve(coupled_equations, [0, 0])
-        fat_mass += dF_dt
-        ffm += dFFM_dt
-
-        # Estimate caloric intake
-        estimated_intakes.append(tee + (delta_weight * 7700))
-
-    # Return the average caloric intake
-    return np.mean(estimated_intakes)
-
-# Example usage
-data = {
-    "2024-01-01": 85,
-    "2024-01-02": 84.9,
-    "2024-01-03": 84.8,
-    "2024-01-04": 84.7,
-    "2024-01-05": 84.6,
-}
-
-smoothed_data = smooth_weight_data(data)
-print("Smoothed Data:", smoothed_data)
-
-estimated_calories = estimate_caloric_intake(data, "male", 35, 175)
-print("Estimated Daily Caloric Intake:", estimated_calories)
+    Returns:
+        float: Estimated average daily caloric intake.
+    """
+    return float(np.mean(estimate_daily_caloric_intake(weight_data, sex, age, height_cm)["intake"]))
 
 def test_caloric_intake_estimation():
     """
@@ -139,7 +136,22 @@ def test_caloric_intake_estimation():
 
     print("All tests passed.")
 
-if __name__ == "__main__":  
+if __name__ == "__main__":
+    # Example usage
+    data = {
+        "2024-01-01": 85,
+        "2024-01-02": 84.9,
+        "2024-01-03": 84.8,
+        "2024-01-04": 84.7,
+        "2024-01-05": 84.6,
+    }
+
+    smoothed_data = smooth_weight_data(data)
+    print("Smoothed Data:", smoothed_data)
+
+    estimated_calories = estimate_caloric_intake(data, "male", 35, 175)
+    print("Estimated Daily Caloric Intake:", estimated_calories)
+
     # Run the test
     test_caloric_intake_estimation()
 
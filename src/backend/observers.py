@@ -0,0 +1,211 @@
+"""
+Per-step tracing hooks for the Hall and Thomas simulations.
+
+The simulation loops used to print several lines per simulated day, which dominated the cost of a
+run. They now report to an optional observer instead. Passing no observer (the default) costs one
+`is None` check per run, and nothing per day.
+
+An observer receives:
+    on_run_start(model, day)              before the first simulated day
+    on_step(model, day, values)           once per simulated day; values is a dict of that day's results
+                                          (same keys and units as the returned Trajectory rows)
+    on_event(model, day, name, message)   for notable events, e.g. "terminated" when the Thomas model
+                                          reaches the essential fat or lean mass
+    on_run_end(model, day, steps)         after the last simulated day
+
+Tracing is post-hoc: the compiled kernels cannot call back into Python, so every run first simulates
+all of its days and then replays the stored rows as on_step calls (`trace_rows`), followed by
+on_run_end. Kernel and Python runs are traced identically, but an observer sees the steps only once
+the run is complete, and anything an observer does per step happens after the simulation rather than
+during it. CounterObserver therefore stops a run's timer at the first replayed step.
+
+Sinks:
+    LogObserver         structured (JSON) records on a logging.Logger
+    RingBufferObserver  the most recent records in memory
+    CounterObserver     step, event and run counters plus wall-clock timers per model
+    CompositeObserver   fans out to several observers
+"""
+import json
+import logging
+import time
+from collections import Counter, deque
+
+DEFAULT_RING_CAPACITY = 1000
+TRACE_LOGGER = "fitmomentum.trace"
+
+
+class Observer:
+    """
+    Base class for simulation observers. Every hook is a no-op; override the ones you need.
+    """
+
+    def on_run_start(self, model, day):
+        pass
+
+    def on_step(self, model, day, values):
+        pass
+
+    def on_event(self, model, day, name, message):
+        pass
+
+    def on_run_end(self, model, day, steps):
+        pass
+
+
+class CompositeObserver(Observer):
+    """
+    Forward every hook to several observers, in order.
+
+    Parameters:
+        *observers (Observer): Observers to notify.
+    """
+
+    def __init__(self, *observers):
+        self.observers = observers
+
+    def on_run_start(self, model, day):
+        for observer in self.observers:
+            observer.on_run_start(model, day)
+
+    def on_step(self, model, day, values):
+        for observer in self.observers:
+            observer.on_step(model, day, values)
+
+    def on_event(self, model, day, name, message):
+        for observer in self.observers:
+            observer.on_event(model, day, name, message)
+
+    def on_run_end(self, model, day, steps):
+        for observer in self.observers:
+            observer.on_run_end(model, day, steps)
+
+
+class LogObserver(Observer):
+    """
+    Write one JSON record per hook to a logger. The record is also attached to the log record as
+    `trace` for handlers that want the dict itself.
+
+    Parameters:
+        logger (logging.Logger): Destination; defaults to the "fitmomentum.trace" logger.
+        level (int): Level for run and step records. Events are logged at WARNING.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(TRACE_LOGGER)
+        self.level = level
+
+    def _log(self, level, record):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps(record), extra={"trace": record})
+
+    def on_run_start(self, model, day):
+        self._log(self.level, {"kind": "run_start", "model": model, "day": day})
+
+    def on_step(self, model, day, values):
+        self._log(self.level, {"kind": "step", "model": model, "day": day, **values})
+
+    def on_event(self, model, day, name, message):
+        self._log(logging.WARNING, {"kind": "event", "model": model, "day": day, "name": name, "message": message})
+
+    def on_run_end(self, model, day, steps):
+        self._log(self.level, {"kind": "run_end", "model": model, "day": day, "steps": steps})
+
+
+class RingBufferObserver(Observer):
+    """
+    Keep the most recent step and event records in memory.
+
+    Parameters:
+        capacity (int): Maximum number of records kept; older records are dropped.
+    """
+
+    def __init__(self, capacity=DEFAULT_RING_CAPACITY):
+        self.buffer = deque(maxlen=capacity)
+
+    def on_step(self, model, day, values):
+        self.buffer.append({"kind": "step", "model": model, "day": day, **values})
+
+    def on_event(self, model, day, name, message):
+        self.buffer.append({"kind": "event", "model": model, "day": day, "name": name, "message": message})
+
+    def records(self):
+        """
+        Returns:
+            list: Buffered records, oldest first.
+        """
+        return list(self.buffer)
+
+    def clear(self):
+        self.buffer.clear()
+
+
+class CounterObserver(Observer):
+    """
+    Count runs, steps and events, and time runs, per model.
+
+    Attributes:
+        runs (Counter): model -> number of runs.
+        steps (Counter): model -> number of simulated days.
+        events (Counter): (model, event name) -> number of events.
+        seconds (Counter): model -> total wall-clock time spent simulating, from on_run_start to the first
+            replayed step (or on_run_end for runs without steps), so the replay is not counted.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.runs = Counter()
+        self.steps = Counter()
+        self.events = Counter()
+        self.seconds = Counter()
+        self._started = {}
+
+    def on_run_start(self, model, day):
+        self._started[model] = self.clock()
+
+    def _stop(self, model):
+        started = self._started.pop(model, None)
+        if started is not None:
+            self.seconds[model] += self.clock() - started
+
+    def on_step(self, model, day, values):
+        self.steps[model] += 1
+        if model in self._started:
+            self._stop(model)  # The simulation is done once its rows are replayed
+
+    def on_event(self, model, day, name, message):
+        self.events[(model, name)] += 1
+
+    def on_run_end(self, model, day, steps):
+        self.runs[model] += 1
+        self._stop(model)
+
+    def stats(self):
+        """
+        Returns:
+            dict: model -> {runs, steps, seconds, steps_per_second}.
+        """
+        return {
+            model: {
+                "runs": self.runs[model],
+                "steps": self.steps[model],
+                "seconds": self.seconds[model],
+                "steps_per_second": self.steps[model] / self.seconds[model] if self.seconds[model] else 0.0,
+            }
+            for model in self.runs
+        }
+
+
+def trace_rows(observer, model, results, start):
+    """
+    Report the rows a run appended to its results as steps, after the run has simulated them (see the
+    module docstring).
+
+    Parameters:
+        observer (Observer): Observer to notify.
+        model (str): Model name ("hall" or "thomas").
+        results (Trajectory): Simulation results.
+        start (int): Index of the first row produced by the run.
+    """
+    for index in range(start, len(results)):
+        row = results[index]
+        observer.on_step(model, row["day"], {field: row[field] for field in results.fields})
@@ -0,0 +1,321 @@
+"""
+Rolling-window statistics for weight and nutrition series in O(n), except the median.
+
+The app's `calculateMovingAverage` re-sums every window (O(n * w)) and `detectAnomalies` loops over the
+elements. Here every statistic is computed in one vectorized pass over either a single 1-D series or a
+`trend_pipeline.PackedSeries` holding many users (windows never cross from one user into the next):
+
+    rolling_sum, rolling_mean, rolling_std    prefix sums of the values, squares and non-NaN counts
+    rolling_min, rolling_max                  van Herk/Gil-Werman block prefix/suffix extrema, O(n)
+    rolling_median                            sliding windows reduced with np.nanmedian, in chunks (O(n * w),
+                                              but in compiled code; short windows are the common case)
+    rolling_anomalies                         percentage change from the median of the preceding values
+
+Windows are trailing and count-based: the value at i summarizes elements i - window + 1 .. i of the
+same series. NaN marks a missing value (e.g. a gap from weight_resampling): it is skipped, and a window
+with fewer than min_periods non-NaN values (default: window, i.e. a full window) gives NaN.
+
+`RollingWindow` keeps the same statistics incrementally for a single stream, with monotonic deques for
+the extrema and two heaps (with lazy deletion) for the median, so each new value costs O(log window).
+"""
+import heapq
+import math
+import warnings
+from collections import deque
+
+import numpy as np
+
+DEFAULT_ANOMALY_THRESHOLD = 2.0   # Percent change from the baseline
+MEDIAN_CHUNK_ROWS = 65536         # Windows reduced per np.nanmedian call, bounds temporary memory
+
+
+def _layout(data):
+    # (values, offsets) of a 1-D array or a PackedSeries (duck-typed: trend_pipeline builds on this module)
+    if hasattr(data, "offsets"):
+        return data.values, data.offsets
+    values = np.asarray(data, dtype=float)
+    return values, np.array([0, len(values)])
+
+
+def _padded(values, offsets, window, fill):
+    """
+    Copy the series into one array where every user is preceded by window - 1 fill values, so trailing
+    windows of exactly `window` elements never reach into the previous user.
+
+    Returns:
+        tuple: (padded array, position of every original element in it).
+    """
+    lengths = np.diff(offsets)
+    users = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(len(values)) + (users + 1) * (window - 1)
+    padded = np.full(len(values) + len(lengths) * (window - 1), fill)
+    padded[positions] = values
+    return padded, positions
+
+
+def _check_window(window, min_periods):
+    if window < 1:
+        raise ValueError("window must be positive.")
+    min_periods = window if min_periods is None else min_periods
+    if not 1 <= min_periods <= window:
+        raise ValueError("min_periods must lie between 1 and window.")
+    return min_periods
+
+
+def _window_sums(values, offsets, window):
+    """
+    Count, sum and sum of squares of the non-NaN values in every trailing window. Values are taken
+    relative to each user's mean, which keeps the prefix sums well conditioned.
+
+    Returns:
+        tuple: (count, sum, sum of squares of the centered values, per-element user mean).
+    """
+    lengths = np.diff(offsets)
+    users = np.repeat(np.arange(len(lengths)), lengths)
+    finite = np.isfinite(values)
+    user_counts = np.bincount(users[finite], minlength=len(lengths))
+    user_sums = np.bincount(users[finite], weights=values[finite], minlength=len(lengths))
+    mean = np.repeat(np.divide(user_sums, user_counts, out=np.zeros(len(lengths)), where=user_counts > 0), lengths)
+    centered = np.where(finite, values - mean, 0.0)
+
+    totals = []
+    for column in (finite.astype(float), centered, centered * centered):
+        padded, positions = _padded(column, offsets, window, 0.0)
+        prefix = np.concatenate(([0.0], np.cumsum(padded)))
+        totals.append(prefix[positions + 1] - prefix[positions + 1 - window])
+    count, total, squares = totals
+    return np.rint(count), total, squares, mean
+
+
+def rolling_sum(data, window, min_periods=None):
+    """
+    Trailing rolling sum of the non-NaN values.
+
+    Parameters:
+        data (np.ndarray or PackedSeries): One series or many users.
+        window (int): Number of elements per window.
+        min_periods (int): Minimum non-NaN values for a result (default: window).
+
+    Returns:
+        np.ndarray: Aligned with the values; NaN where a window has too few values.
+    """
+    min_periods = _check_window(window, min_periods)
+    values, offsets = _layout(data)
+    count, total, _, mean = _window_sums(values, offsets, window)
+    return np.where(count >= min_periods, total + count * mean, np.nan)
+
+
+def rolling_mean(data, window, min_periods=None):
+    """
+    Trailing rolling mean of the non-NaN values (arguments as for rolling_sum).
+    """
+    min_periods = _check_window(window, min_periods)
+    values, offsets = _layout(data)
+    count, total, _, mean = _window_sums(values, offsets, window)
+    valid = count >= min_periods
+    return np.where(valid, total / np.where(valid, count, 1) + mean, np.nan)
+
+
+def rolling_std(data, window, min_periods=None, ddof=1):
+    """
+    Trailing rolling standard deviation of the non-NaN values (arguments as for rolling_sum).
+
+    Parameters:
+        ddof (int): Delta degrees of freedom (1 for the sample standard deviation).
+    """
+    min_periods = _check_window(window, min_periods)
+    values, offsets = _layout(data)
+    count, total, squares, _ = _window_sums(values, offsets, window)
+    valid = (count >= min_periods) & (count > ddof)
+    safe_count = np.where(valid, count, ddof + 1)
+    variance = np.maximum(squares - total * total / safe_count, 0) / (safe_count - ddof)
+    return np.where(valid, np.sqrt(variance), np.nan)
+
+
+def _rolling_extreme(data, window, min_periods, ufunc, fill):
+    min_periods = _check_window(window, min_periods)
+    values, offsets = _layout(data)
+    padded, positions = _padded(np.where(np.isnan(values), fill, values), offsets, window, fill)
+    # van Herk/Gil-Werman: within blocks of `window`, the extreme of any window is the extreme of a
+    # block suffix and the next block's prefix
+    blocks = np.concatenate((padded, np.full(-len(padded) % window, fill))).reshape(-1, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    extreme = ufunc(suffix[positions - window + 1], prefix[positions])
+    count, _, _, _ = _window_sums(values, offsets, window)
+    return np.where(count >= min_periods, extreme, np.nan)
+
+
+def rolling_min(data, window, min_periods=None):
+    """
+    Trailing rolling minimum of the non-NaN values (arguments as for rolling_sum).
+    """
+    return _rolling_extreme(data, window, min_periods, np.minimum, np.inf)
+
+
+def rolling_max(data, window, min_periods=None):
+    """
+    Trailing rolling maximum of the non-NaN values (arguments as for rolling_sum).
+    """
+    return _rolling_extreme(data, window, min_periods, np.maximum, -np.inf)
+
+
+def rolling_median(data, window, min_periods=None):
+    """
+    Trailing rolling median of the non-NaN values (arguments as for rolling_sum).
+    """
+    min_periods = _check_window(window, min_periods)
+    values, offsets = _layout(data)
+    if len(values) == 0:
+        return np.full(0, np.nan)  # sliding_window_view needs at least one full window
+    padded, positions = _padded(values, offsets, window, np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    median = np.empty(len(values))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN windows; masked below
+        for start in range(0, len(values), MEDIAN_CHUNK_ROWS):
+            rows = positions[start:start + MEDIAN_CHUNK_ROWS] - window + 1
+            median[start:start + MEDIAN_CHUNK_ROWS] = np.nanmedian(windows[rows], axis=1)
+    count, _, _, _ = _window_sums(values, offsets, window)
+    return np.where(count >= min_periods, median, np.nan)
+
+
+def rolling_anomalies(data, threshold_percentage=DEFAULT_ANOMALY_THRESHOLD, window=1):
+    """
+    Flag values that differ by at least threshold_percentage percent from the median of the preceding
+    `window` values of the same series. With window=1 this is the app's detectAnomalies rule (change
+    from the previous value).
+
+    Parameters:
+        data (np.ndarray or PackedSeries): One series or many users.
+        threshold_percentage (float): Threshold in percent.
+        window (int): Number of preceding values in the baseline.
+
+    Returns:
+        np.ndarray: Boolean mask aligned with the values. Values without a baseline (the first of a
+        series, or only NaN before them) and NaN values are never flagged.
+    """
+    values, offsets = _layout(data)
+    baseline = rolling_median(data, window, min_periods=1)
+    # The baseline of element i is the window ending at i - 1 in the same series
+    previous = np.full(len(values), np.nan)
+    previous[1:] = baseline[:-1]
+    previous[offsets[:-1][np.diff(offsets) > 0]] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.abs((values - previous) / previous) * 100
+    return change >= threshold_percentage
+
+
+class RollingWindow:
+    """
+    Incremental trailing-window statistics for one stream of values, O(log window) per value.
+
+    NaN values occupy a slot in the window but are excluded from every statistic.
+
+    Parameters:
+        window (int): Number of most recent values in the window.
+    """
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be positive.")
+        self.window = window
+        self.values = deque()
+        self.index = 0                # Index of the next value
+        self.count = 0                # Non-NaN values in the window
+        self.sum = 0.0
+        self.sum_of_squares = 0.0
+        self._minima = deque()        # (index, value), increasing values
+        self._maxima = deque()        # (index, value), decreasing values
+        self._low, self._high = [], []  # Max-heap (negated) and min-heap of (value, index)
+        self._low_size = self._high_size = 0
+        self._side = {}               # index -> True if the value is in the low heap
+        self._removed = set()         # Indices evicted but still in a heap
+
+    def push(self, value):
+        """
+        Add a value, evicting the oldest one once the window is full.
+        """
+        value = float(value)
+        index, self.index = self.index, self.index + 1
+        self.values.append(value)
+        if not math.isnan(value):
+            self.count += 1
+            self.sum += value
+            self.sum_of_squares += value * value
+            while self._minima and self._minima[-1][1] >= value:
+                self._minima.pop()
+            self._minima.append((index, value))
+            while self._maxima and self._maxima[-1][1] <= value:
+                self._maxima.pop()
+            self._maxima.append((index, value))
+            self._prune()
+            if not self._low or value <= -self._low[0][0]:
+                heapq.heappush(self._low, (-value, index))
+                self._low_size += 1
+                self._side[index] = True
+            else:
+                heapq.heappush(self._high, (value, index))
+                self._high_size += 1
+                self._side[index] = False
+
+        if len(self.values) > self.window:
+            old_index, old = index - self.window, self.values.popleft()
+            if not math.isnan(old):
+                self.count -= 1
+                self.sum -= old
+                self.sum_of_squares -= old * old
+                if self._minima[0][0] == old_index:
+                    self._minima.popleft()
+                if self._maxima[0][0] == old_index:
+                    self._maxima.popleft()
+                if self._side.pop(old_index):
+                    self._low_size -= 1
+                else:
+                    self._high_size -= 1
+                self._removed.add(old_index)
+        self._rebalance()
+
+    def _prune(self):
+        # Drop evicted entries from the heap tops
+        while self._low and self._low[0][1] in self._removed:
+            self._removed.discard(heapq.heappop(self._low)[1])
+        while self._high and self._high[0][1] in self._removed:
+            self._removed.discard(heapq.heappop(self._high)[1])
+
+    def _rebalance(self):
+        # Keep low_size == high_size or high_size + 1
+        self._prune()
+        while self._low_size > self._high_size + 1:
+            value, index = heapq.heappop(self._low)
+            heapq.heappush(self._high, (-value, index))
+            self._side[index] = False
+            self._low_size, self._high_size = self._low_size - 1, self._high_size + 1
+            self._prune()
+        while self._high_size > self._low_size:
+            value, index = heapq.heappop(self._high)
+            heapq.heappush(self._low, (-value, index))
+            self._side[index] = True
+            self._low_size, self._high_size = self._low_size + 1, self._high_size - 1
+            self._prune()
+
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def std(self, ddof=1):
+        if self.count <= ddof:
+            return math.nan
+        return math.sqrt(max(self.sum_of_squares - self.sum * self.sum / self.count, 0) / (self.count - ddof))
+
+    def min(self):
+        return self._minima[0][1] if self._minima else math.nan
+
+    def max(self):
+        return self._maxima[0][1] if self._maxima else math.nan
+
+    def median(self):
+        if self.count == 0:
+            return math.nan
+        if self._low_size > self._high_size:
+            return -self._low[0][0]
+        return (-self._low[0][0] + self._high[0][0]) / 2
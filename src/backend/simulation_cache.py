@@ -0,0 +1,202 @@
+"""
+Bounded LRU/TTL memoization for simulation results.
+
+The Flask backends receive the same simulation request over and over (the UI re-posts the form), and
+every request used to recompute the full trajectory. A SimulationCache keeps the most recently used
+results, keyed on the normalized inputs and the model version, so identical requests are answered
+from memory. Entries expire after a time-to-live and the least recently used entry is evicted when
+the cache is full. Hit, miss, eviction and expiration counters are available from `stats()`.
+
+Values are deep-copied when they are stored and when they are returned, so every caller gets its own
+copy: a caller that modifies its results (extends a Trajectory, edits its metadata, ...) cannot change
+what later callers receive. Copying a 10-year trajectory takes ~50 microseconds, a small fraction of
+simulating it.
+"""
+import copy
+import functools
+import inspect
+import numbers
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 3600.0
+KEY_DECIMALS = 9  # Floats that agree to this many decimals share a cache entry
+
+
+def normalize_value(value):
+    """
+    Convert an argument into a hashable, canonical form for use in a cache key.
+
+    Parameters:
+        value: Argument value (number, string, None, sequence, mapping or NumPy array).
+
+    Returns:
+        Hashable normalized value: numbers become rounded floats, sequences and arrays become tuples
+        and mappings become sorted tuples of pairs.
+    """
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, numbers.Real):
+        return round(float(value), KEY_DECIMALS)
+    if isinstance(value, np.ndarray):
+        return normalize_value(value.tolist())
+    if isinstance(value, Mapping):
+        return tuple(sorted((key, normalize_value(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(item) for item in value)
+    return value
+
+
+def make_key(name, model_version, function, args, kwargs):
+    """
+    Build a cache key from a function call. Positional and keyword spellings of the same call, and calls
+    that rely on defaults versus passing them explicitly, produce the same key.
+
+    Parameters:
+        name (str): Name of the cached function.
+        model_version (str): Version of the model; bump it whenever results change.
+        function (callable): The function, used to bind arguments to parameter names.
+        args (tuple): Positional arguments.
+        kwargs (dict): Keyword arguments.
+
+    Returns:
+        tuple: Hashable cache key.
+    """
+    bound = inspect.signature(function).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return (name, model_version, normalize_value(dict(bound.arguments)))
+
+
+class SimulationCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+
+    Parameters:
+        max_entries (int): Maximum number of cached results.
+        ttl_seconds (float): Lifetime of an entry in seconds (None for no expiry).
+        clock (callable): Time source in seconds, replaceable in tests.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """
+        Look up a key, counting a hit or a miss.
+
+        Parameters:
+            key: Cache key.
+            default: Value returned on a miss.
+
+        Returns:
+            A copy of the cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Parameters:
+            key: Cache key.
+            value: Value to store (a copy is stored).
+        """
+        value = copy.deepcopy(value)
+        expires_at = None if self.ttl_seconds is None else self.clock() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for `key`, computing and storing it on a miss.
+
+        Parameters:
+            key: Cache key.
+            compute (callable): Zero-argument function producing the value.
+
+        Returns:
+            The cached or newly computed value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def wrap(self, function, model_version, name=None):
+        """
+        Return a memoized version of a simulation function that shares this cache.
+
+        Parameters:
+            function (callable): Function to memoize (e.g. simulate_hall_model).
+            model_version (str): Model version included in every key.
+            name (str): Key namespace; defaults to the function name.
+
+        Returns:
+            callable: Wrapper with the same signature.
+        """
+        name = name or function.__name__
+
+        @functools.wraps(function)
+        def cached_function(*args, **kwargs):
+            key = make_key(name, model_version, function, args, kwargs)
+            return self.get_or_compute(key, lambda: function(*args, **kwargs))
+
+        return cached_function
+
+    def clear(self):
+        """
+        Remove every entry (counters are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: {entries, max_entries, hits, misses, evictions, expirations, hit_rate}.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
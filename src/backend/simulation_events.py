@@ -0,0 +1,162 @@
+"""
+Early-stop events for the Hall and Thomas simulations.
+
+Answering "when will I reach X?" used to mean simulating the full duration and scanning the results.
+`run_until_event` instead advances a simulation state in chunks of `chunk_days` with the model's
+`continue_simulation`, checks each chunk for the requested events and stops at the first one. The rows
+up to the first day on or after the event are kept: the chunk is cut there and the model's
+`state_at_row` rebuilds the state of the last kept row, so metadata["state"] can be continued later
+without simulating any day twice. Nothing after the event is simulated beyond the current chunk.
+
+An event is a dict:
+    {"type": "weight", "value": 80.0}                 weight (kg) crosses the value, in either direction
+    {"type": "body_fat_percentage", "value": 0.25}    body fat fraction crosses the value
+    {"type": "plateau", "value": 0.01}                |dW/dt| falls below the value (kg/day)
+
+The event day is interpolated linearly between the two simulated days around the crossing, so it is
+fractional.
+"""
+import math
+
+import numpy as np
+
+from observers import trace_rows
+
+DEFAULT_CHUNK_DAYS = 28
+EVENT_TYPES = ("weight", "body_fat_percentage", "plateau")
+
+
+def find_crossing(days, values, threshold):
+    """
+    Find the first time a sampled series reaches a threshold, from either side.
+
+    Parameters:
+        days (np.ndarray): Sample days (increasing). days[0] is the reference sample.
+        values (np.ndarray): Sampled values.
+        threshold (float): Level to detect.
+
+    Returns:
+        float or None: Interpolated day of the first crossing after days[0], or None.
+    """
+    offset = np.asarray(values, dtype=float) - threshold
+    if offset[0] == 0:
+        return float(days[0])
+    crossed = np.flatnonzero(np.sign(offset[1:]) != np.sign(offset[0]))
+    if crossed.size == 0:
+        return None
+    i = crossed[0] + 1
+    fraction = offset[i - 1] / (offset[i - 1] - offset[i])
+    return float(days[i - 1] + fraction * (days[i] - days[i - 1]))
+
+
+def find_plateau(days, weights, rate):
+    """
+    Find the first time the weight change rate falls below `rate` in magnitude.
+
+    Parameters:
+        days (np.ndarray): Sample days (increasing).
+        weights (np.ndarray): Sampled weights in kilograms.
+        rate (float): Plateau threshold in kg/day.
+
+    Returns:
+        float or None: Interpolated day of the plateau, or None.
+    """
+    if len(days) < 2:
+        return None
+    speed = np.abs(np.diff(weights) / np.diff(days))
+    below = np.flatnonzero(speed < rate)
+    if below.size == 0:
+        return None
+    i = below[0]
+    if i == 0:
+        return float(days[1])
+    # Speeds are attributed to the end of each interval; interpolate between the two around the crossing
+    fraction = (speed[i - 1] - rate) / (speed[i - 1] - speed[i])
+    return float(days[i] + fraction * (days[i + 1] - days[i]))
+
+
+def detect_event(days, columns, events):
+    """
+    Return the earliest of several events in a sampled trajectory.
+
+    Parameters:
+        days (np.ndarray): Sample days; the first sample is the reference (already simulated) row.
+        columns (dict): "weight" and "body_fat_percentage" arrays aligned with days.
+        events (list of dict): Event specs (see module docstring).
+
+    Returns:
+        tuple or None: (event index, interpolated day) of the earliest event, or None.
+    """
+    earliest = None
+    for index, event in enumerate(events):
+        if event["type"] == "plateau":
+            day = find_plateau(days, columns["weight"], event["value"])
+        else:
+            day = find_crossing(days, columns[event["type"]], event["value"])
+        if day is not None and day > days[0] and (earliest is None or day < earliest[1]):
+            earliest = (index, day)
+    return earliest
+
+
+def run_until_event(continue_function, state_function, results, max_days, events, chunk_days=DEFAULT_CHUNK_DAYS, observer=None):
+    """
+    Advance a simulation until the first event or for at most `max_days` more days.
+
+    Parameters:
+        continue_function (callable): The model's continue_simulation(state, days).
+        state_function (callable): The model's state_at_row(state, results, index).
+        results (Trajectory): Rows simulated so far, with the current state in metadata["state"].
+            Extended in place.
+        max_days (int): Maximum number of days to simulate.
+        events (list of dict): Event specs (see module docstring).
+        chunk_days (int): Days simulated between event checks.
+        observer (observers.Observer): Optional tracing hooks; only the kept rows are reported as steps.
+
+    Returns:
+        Trajectory: The results, truncated at the first row on or after the event, with
+        metadata["event"] = {"type", "value", "day"} (None if no event occurred) and the state of the
+        last kept row in metadata["state"].
+    """
+    for event in events:
+        if event["type"] not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event['type']}")
+    state = results.metadata["state"]
+    if observer is not None:
+        observer.on_run_start(state["model"], state["day"] + 1)
+    first_row = len(results)
+    previous = (results.value("day", -1), results.value("weight", -1), results.value("body_fat_percentage", -1))
+    event = None
+    remaining = max_days
+    while remaining > 0 and event is None:
+        requested = min(chunk_days, remaining)
+        chunk = continue_function(state, requested)
+        if len(chunk) == 0:
+            break
+        days = np.concatenate(([previous[0]], chunk["day"]))
+        columns = {
+            "weight": np.concatenate(([previous[1]], chunk["weight"])),
+            "body_fat_percentage": np.concatenate(([previous[2]], chunk["body_fat_percentage"])),
+        }
+        hit = detect_event(days, columns, events)
+        if hit is not None:
+            index, day = hit
+            event = dict(events[index], day=day)
+            # Keep the rows up to the first day on or after the event
+            rows = int(np.searchsorted(chunk["day"], math.ceil(day - 1e-9))) + 1
+            state = state_function(chunk.metadata["state"], chunk, rows - 1)
+            chunk = chunk[:rows]
+        else:
+            state = chunk.metadata["state"]
+        results.extend(chunk)
+        previous = (chunk.value("day", -1), chunk.value("weight", -1), chunk.value("body_fat_percentage", -1))
+        remaining -= len(chunk)
+        if len(chunk) < requested and event is None:
+            break  # The model ended the run early (e.g. the Thomas essential fat mass limit)
+    if observer is not None:
+        trace_rows(observer, state["model"], results, first_row)
+        if event is not None:
+            observer.on_event(state["model"], event["day"], event["type"], f"Reached {event['type']} {event['value']} on day {event['day']:.2f}.")
+        observer.on_run_end(state["model"], state["day"], len(results) - first_row)
+    results.metadata["state"] = state
+    results.metadata["event"] = event
+    return results
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from scipy.signal import savgol_filter
+
+from data_smoothing import append_savgol, dynamic_savgol_filter, init_savgol_state, savgol_filter_chunked
+
+
+@pytest.mark.parametrize("window_length, polyorder", [(5, 2), (101, 2), (31, 4)])
+def test_chunked_matches_full_array(window_length, polyorder):
+    rng = np.random.default_rng(0)
+    data = 80 - 0.01 * np.arange(5000) + rng.normal(0, 0.5, 5000)
+    chunks = np.split(data, [7, 7, 130, 1000, 1001, 4990])
+
+    smoothed = np.concatenate(list(savgol_filter_chunked(chunks, window_length, polyorder)))
+    assert np.array_equal(smoothed, savgol_filter(data, window_length, polyorder))
+
+
+def test_append_recomputes_only_the_tail():
+    rng = np.random.default_rng(1)
+    data = rng.normal(70, 0.5, 300)
+    state, smoothed = init_savgol_state(21, 2), np.full(data.size, np.nan)
+    for end in range(0, 300, 25):
+        start, values, state = append_savgol(state, data[end:end + 25])
+        if end >= 25:
+            assert start == end - 10 and len(values) == 35
+        smoothed[start:start + len(values)] = values
+        if state["count"] >= 21:
+            assert np.array_equal(smoothed[:state["count"]], savgol_filter(data[:state["count"]], 21, 2))
+    assert len(state["tail"]) == 20
+
+
+def test_dynamic_filter_accepts_long_histories():
+    data = np.random.default_rng(2).normal(70, 0.5, 5000)
+    assert np.array_equal(dynamic_savgol_filter(data), savgol_filter(data, 101, 2))
+    with pytest.raises(ValueError):
+        dynamic_savgol_filter(data[:10])
+    with pytest.raises(ValueError):
+        list(savgol_filter_chunked([data[:10]], 21, 2))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from fat_mass_inversion import calculate_baseline_fat_mass_exact, get_fat_mass_table
+from thomas_model import calculate_baseline_fat_mass, calculate_ffm
+
+
+def test_exact_fat_mass_solves_ffm_equation():
+    rng = np.random.default_rng(0)
+    weight, age, height = rng.uniform(75, 150, 2000), rng.uniform(20, 80, 2000), rng.uniform(150, 195, 2000)
+    fat_mass = calculate_baseline_fat_mass_exact(weight, age, height, "male")
+
+    assert np.isfinite(fat_mass).all()
+    np.testing.assert_allclose(calculate_ffm(fat_mass, age, 0, height, "male") + fat_mass, weight, atol=1e-8)
+    assert isinstance(calculate_baseline_fat_mass_exact(weight[0], age[0], height[0], "male"), float)
+
+
+def test_table_interpolation_stays_within_error_bound():
+    table = get_fat_mass_table("male")
+    rng = np.random.default_rng(1)
+    weight, age, height = rng.uniform(30, 300, 50000), rng.uniform(18, 100, 50000), rng.uniform(130, 220, 50000)
+    approximate = table.lookup(weight, age, height)
+    exact = table.lookup(weight, age, height, refine=True)
+    valid = np.isfinite(approximate)
+
+    assert valid.mean() > 0.5
+    assert np.abs(approximate - exact)[valid].max() <= table.error_bound
+
+
+def test_exact_method_falls_back_to_regression_without_root():
+    sexes = np.array(["male", "female"])
+    exact = calculate_baseline_fat_mass_exact(80.0, 40, 165, sexes)
+    assert np.isfinite(exact[0]) and np.isnan(exact[1])
+
+    assert calculate_baseline_fat_mass(80.0, 40, 165, "female", method="exact") == calculate_baseline_fat_mass(80.0, 40, 165, "female")
+    assert calculate_baseline_fat_mass(80.0, 40, 165, "male", method="exact") == exact[0]
@@ -0,0 +1,96 @@
+import tracemalloc
+
+import numpy as np
+
+from health_export import ingest_health_export, load_health_export
+from measurement_store import MeasurementStore
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE HealthData [
+<!ELEMENT HealthData (ExportDate,Me,(Record|Correlation|Workout|ActivitySummary)*)>
+<!ATTLIST HealthData locale CDATA #REQUIRED>
+]>
+<HealthData locale="en_US">
+ <ExportDate value="2024-02-01 08:00:00 -0500"/>
+ <Me HKCharacteristicTypeIdentifierDateOfBirth="1990-04-01" HKCharacteristicTypeIdentifierBiologicalSex="HKBiologicalSexFemale"/>
+"""
+RECORD = ' <Record type="{type}" sourceName="{source}" unit="{unit}" startDate="{date}" endDate="{date}" value="{value}">\n  <MetadataEntry key="HKWasUserEntered" value="1"/>\n </Record>\n'
+
+
+def write_export(path, records, repeat=1):
+    with open(path, "w") as handle:
+        handle.write(HEADER)
+        for _ in range(repeat):
+            for record in records:
+                handle.write(RECORD.format(**record))
+        handle.write("</HealthData>\n")
+
+
+def test_ingest_filters_converts_and_round_trips(tmp_path):
+    records = [
+        {"type": "HKQuantityTypeIdentifierBodyMass", "source": "Scale", "unit": "lb", "date": "2024-01-05 07:12:00 -0500", "value": "176.4"},
+        {"type": "HKQuantityTypeIdentifierBodyMass", "source": "Health", "unit": "kg", "date": "2024-01-06 23:30:00 +0530", "value": "79.9"},
+        {"type": "HKQuantityTypeIdentifierBodyFatPercentage", "source": "Scale", "unit": "%", "date": "2024-01-05 07:12:00 -0500", "value": "0.24"},
+        {"type": "HKQuantityTypeIdentifierDietaryEnergyConsumed", "source": "Tracker", "unit": "kJ", "date": "2024-01-05 12:00:00 +0000", "value": "2092"},
+        {"type": "HKQuantityTypeIdentifierStepCount", "source": "Phone", "unit": "count", "date": "2024-01-05 12:00:00 +0000", "value": "5000"},
+        {"type": "HKQuantityTypeIdentifierHeartRate", "source": "Watch", "unit": "count/min", "date": "2024-01-05 12:00:00 +0000", "value": "60"},
+        {"type": "HKQuantityTypeIdentifierBodyMass", "source": "Scale", "unit": "oz", "date": "2024-01-07 07:00:00 -0500", "value": "2800"},
+    ]
+    path = tmp_path / "export.xml"
+    write_export(path, records)
+    with open(path) as handle:
+        text = handle.read()
+    # Records nested in a correlation repeat top-level records and are ignored
+    nested = '<Correlation type="HKCorrelationTypeIdentifierFood">' + RECORD.format(**records[3]) + "</Correlation>\n</HealthData>"
+    path.write_text(text.replace("</HealthData>", nested))
+
+    store = MeasurementStore(str(tmp_path / "store"))
+    manifest = ingest_health_export(str(path), store, "user")
+    assert manifest["counts"] == {"body_mass": 2, "body_fat_percentage": 1, "dietary_energy": 1, "steps": 1, "height": 0}
+    assert manifest["records_seen"] == 7 and manifest["skipped"] == 1 and manifest["records_per_second"] > 0
+    assert manifest["person"]["HKCharacteristicTypeIdentifierBiologicalSex"] == "HKBiologicalSexFemale"
+
+    export = load_health_export(store, "user")
+    np.testing.assert_allclose(export["body_mass"]["value"], [176.4 * 0.45359237, 79.9], rtol=1e-6)
+    expected = np.array(["2024-01-05T12:12:00", "2024-01-06T18:00:00"], dtype="datetime64[s]").astype(np.int64)
+    assert export["body_mass"]["timestamp"].tolist() == expected.tolist()
+    # Days are the local calendar days of the records
+    assert export["body_mass"]["day"].astype("datetime64[D]").astype(str).tolist() == ["2024-01-05", "2024-01-06"]
+    assert store.query("user", "body_mass", "2024-01-06")[1].tolist() == [np.float32(79.9)]
+    assert [export["manifest"]["sources"][i] for i in export["body_mass"]["source"]] == ["Scale", "Health"]
+    assert export["dietary_energy"]["value"][0] == np.float32(2092 / 4.184)
+    assert len(export["height"]["value"]) == 0
+
+
+def test_memory_stays_flat(tmp_path):
+    record = {"type": "HKQuantityTypeIdentifierBodyMass", "source": "Scale", "unit": "kg", "date": "2024-01-05 07:12:00 -0500", "value": "80"}
+    peaks = []
+    for repeat in (2000, 20000):
+        path = tmp_path / f"export_{repeat}.xml"
+        write_export(path, [record], repeat)
+        tracemalloc.start()
+        manifest = ingest_health_export(str(path), MeasurementStore(str(tmp_path)), f"user_{repeat}", batch_records=500)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert manifest["counts"]["body_mass"] == repeat
+    assert peaks[1] < 1.5 * peaks[0]
+
+
+def test_malformed_dates_are_skipped(tmp_path):
+    good = {"type": "HKQuantityTypeIdentifierBodyMass", "source": "Scale", "unit": "kg", "date": "2024-01-05 07:12:00 -0500", "value": "80"}
+    records = [good, dict(good, date="2024-13-45 07:12:00 -0500"), dict(good, date="2024-01-06 07:12:00 +9900"),
+               dict(good, date="2024-01-06 07:12:00 -0500", value="79.5"), dict(good, date="yesterday at 7 in the morning")]
+    path = tmp_path / "export.xml"
+    write_export(path, records, repeat=3)
+
+    store = MeasurementStore(str(tmp_path))
+    manifest = ingest_health_export(str(path), store, "user", batch_records=4)
+    assert manifest["counts"]["body_mass"] == 6 and manifest["skipped"] == 9
+    # The repeated records go back in time; the columns are sorted by day once the ingest is done
+    export = load_health_export(store, "user")
+    assert export["body_mass"]["value"].tolist() == [80.0] * 3 + [79.5] * 3
+    assert (np.diff(export["body_mass"]["day"]) >= 0).all()
+
+    # Re-ingesting replaces the previous export
+    assert ingest_health_export(str(path), store, "user")["counts"]["body_mass"] == 6
+    assert store.count("user", "body_mass") == 6
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from measurement_store import MeasurementStore, columns_to_weight_data, weight_data_to_columns
+from weight_resampling import timestamps_to_days
+
+
+def test_append_and_query_match_full_scan(tmp_path):
+    store = MeasurementStore(str(tmp_path))
+    rng = np.random.default_rng(0)
+    # Five years of weigh-ins with missed and repeated days, appended in chunks
+    days = np.sort(rng.integers(19000, 19000 + 5 * 365, 2000)).astype(np.int32)
+    values = (80 + rng.normal(0, 1, len(days))).astype(np.float32)
+    for chunk in np.array_split(np.arange(len(days)), 7):
+        store.append("user-1", "weight", days[chunk], values[chunk])
+    assert store.count("user-1", "weight") == len(days)
+    assert store.users() == ["user-1"]
+
+    loaded_days, loaded_values = store.load("user-1", "weight")
+    assert isinstance(loaded_days, np.memmap) and isinstance(loaded_values, np.memmap)
+    assert np.array_equal(loaded_days, days) and np.array_equal(loaded_values, values)
+
+    for start, end in [(19100, 19400), (days[5], days[5]), (18000, 18500), (None, 19200), (19300, None)]:
+        query_days, query_values = store.query("user-1", "weight", start, end)
+        mask = np.ones(len(days), dtype=bool)
+        if start is not None:
+            mask &= days >= start
+        if end is not None:
+            mask &= days <= end
+        assert np.array_equal(query_days, days[mask]) and np.array_equal(query_values, values[mask])
+        assert len(query_days) == 0 or isinstance(query_days, np.memmap)  # Views, not copies
+
+    # Date strings work as bounds
+    assert np.array_equal(store.query("user-1", "weight", "2022-01-01", "2022-01-31")[0],
+                          days[(days >= timestamps_to_days(np.datetime64("2022-01-01"))) & (days <= timestamps_to_days(np.datetime64("2022-01-31")))])
+
+
+def test_append_rejects_out_of_order_and_invalid_names(tmp_path):
+    store = MeasurementStore(str(tmp_path))
+    assert store.load("nobody", "weight")[0].shape == (0,)
+    assert store.last_day("nobody", "weight") is None
+    store.append("a", "weight", ["2024-01-02", "2024-01-05"], [80.0, 79.5])
+    with pytest.raises(ValueError):
+        store.append("a", "weight", ["2024-01-04"], [79.0])
+    with pytest.raises(ValueError):
+        store.append("a", "weight", ["2024-01-07", "2024-01-06"], [79.0, 79.1])
+    with pytest.raises(ValueError):
+        store.append("../a", "weight", ["2024-01-07"], [79.0])
+    store.append("a", "weight", ["2024-01-05"], [79.4])  # Same day as the last one is allowed
+    assert store.count("a", "weight") == 3
+    with pytest.raises(ValueError):
+        store.append("a", "weight", ["2024-01-08"], [79.0], source=[0])  # Not stored for this kind
+
+
+def test_interrupted_append_is_invisible_and_repaired(tmp_path):
+    store = MeasurementStore(str(tmp_path))
+    store.append("a", "weight", [100, 101], [80.0, 79.0])
+    # Simulate a crash after the values but before the days were written
+    with open(os.path.join(str(tmp_path), "a", "weight.value"), "ab") as handle:
+        handle.write(np.float32(78.0).tobytes())
+    assert store.count("a", "weight") == 2
+    store.append("a", "weight", [102], [77.0])
+    days, values = store.load("a", "weight")
+    assert days.tolist() == [100, 101, 102] and values.tolist() == [80.0, 79.0, 77.0]
+
+
+def test_weight_data_round_trip(tmp_path):
+    weight_data = {"2024-01-03": 80.5, "2024-01-01": 81.0, "2024-01-02": 80.75}
+    days, values = weight_data_to_columns(weight_data)
+    assert columns_to_weight_data(days, values) == dict(sorted(weight_data.items()))
+
+    store = MeasurementStore(str(tmp_path))
+    store.append_weight_data("a", weight_data)
+    assert columns_to_weight_data(*store.query("a", "weight", "2024-01-02")) == {"2024-01-02": 80.75, "2024-01-03": 80.5}
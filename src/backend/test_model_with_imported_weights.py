@@ -0,0 +1,50 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from thomas_model import calculate_dit, calculate_pa, calculate_rmr, calculate_spa
+
+# The module name has hyphens, so it cannot be imported with an import statement
+_spec = importlib.util.spec_from_file_location(
+    "model_with_imported_weights", os.path.join(os.path.dirname(__file__), "model-with-imported-weights.py")
+)
+imported_weights = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(imported_weights)
+
+
+def _reference_intakes(weight_data, sex, age):
+    # The per-day loop the vectorized estimate replaced
+    weights = list(imported_weights.smooth_weight_data(weight_data).values())
+    intakes = []
+    for i, delta_weight in enumerate(np.diff(weights)):
+        phase = "loss" if delta_weight < 0 else "gain"
+        rmr = calculate_rmr(weights[i], age + i / 365, sex)
+        dit = calculate_dit(rmr, phase)
+        pa = calculate_pa(weights[i], 0.3 * rmr, weights[0])
+        spa = calculate_spa(rmr, pa, dit, phase, 0)
+        intakes.append(rmr + dit + pa + spa + delta_weight * imported_weights.ENERGY_PER_KG)
+    return intakes
+
+
+def test_daily_intake_matches_reference_loop():
+    rng = np.random.default_rng(3)
+    days = np.arange("2024-01-01", "2024-04-10", dtype="datetime64[D]").astype(str)
+    weights = 90 - 0.04 * np.arange(len(days)) + rng.normal(0, 0.4, len(days))
+    weight_data = dict(zip(days.tolist(), weights.tolist()))
+
+    for sex in ("male", "female"):
+        daily = imported_weights.estimate_daily_caloric_intake(weight_data, sex, 42, 178)
+        assert daily["date"] == days[:-1].tolist()
+        assert len(daily["weight"]) == len(daily["weight_change"]) == len(daily["tee"]) == len(days) - 1
+        np.testing.assert_allclose(daily["intake"], _reference_intakes(weight_data, sex, 42), rtol=1e-12)
+        np.testing.assert_allclose(daily["intake"], daily["tee"] + daily["weight_change"] * imported_weights.ENERGY_PER_KG)
+        assert imported_weights.estimate_caloric_intake(weight_data, sex, 42, 178) == pytest.approx(np.mean(daily["intake"]))
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        imported_weights.estimate_daily_caloric_intake({"2024-01-01": 80.0}, "male", 30, 175)
+    with pytest.raises(ValueError):
+        imported_weights.estimate_daily_caloric_intake({"2024-01-01": 80.0, "2024-01-02": 79.9}, "other", 30, 175)
@@ -0,0 +1,55 @@
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "flask_hall_model_app"))
+import hall_model
+import jit_backend
+import thomas_model
+from observers import CompositeObserver, CounterObserver, LogObserver, Observer, RingBufferObserver
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_thomas_run_is_silent_and_traced(monkeypatch, capsys, use_jit):
+    monkeypatch.setattr(jit_backend, "USE_JIT", use_jit)
+    ring, counters = RingBufferObserver(capacity=10), CounterObserver()
+    results = thomas_model.run_simulation("female", 30, 70.0, 165, 1600, 60, observer=CompositeObserver(ring, counters))
+
+    assert capsys.readouterr().out == ""
+    assert counters.steps["thomas"] == 60 and counters.runs["thomas"] == 1
+    records = ring.records()
+    assert len(records) == 10 and records[-1]["day"] == 60
+    assert records[-1]["weight"] == results[-1]["weight"]
+
+
+def test_thomas_termination_is_reported_as_event():
+    counters = CounterObserver()
+    results = thomas_model.run_simulation("male", 30, 60.0, 180, 500, 2000, 0.06, observer=counters)
+
+    assert results.metadata["state"]["terminated"]
+    assert counters.events[("thomas", "terminated")] == 1
+
+
+def test_hall_log_observer_writes_structured_records(caplog):
+    with caplog.at_level(logging.DEBUG, logger="fitmomentum.trace"):
+        hall_model.simulate_hall_model(10, "male", 35, 95.0, 1.8, 9.0, 300.0, 11.5, observer=LogObserver())
+
+    kinds = [record.trace["kind"] for record in caplog.records]
+    assert kinds == ["run_start"] + ["step"] * 8 + ["run_end"]
+    assert caplog.records[1].trace["day"] == 1 and "tee" in caplog.records[1].trace
+
+
+def test_counter_observer_times_the_simulation_not_the_replay():
+    now = [0.0]
+
+    class SlowObserver(Observer):
+        def on_step(self, model, day, values):
+            now[0] += 1.0  # A second per replayed step
+
+    counters = CounterObserver(clock=lambda: now[0])
+    thomas_model.run_simulation("female", 30, 70.0, 165, 1600, 60, observer=CompositeObserver(counters, SlowObserver()))
+
+    assert counters.steps["thomas"] == 60 and now[0] == 60.0
+    assert counters.seconds["thomas"] == 0.0
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from rolling_statistics import RollingWindow, rolling_anomalies, rolling_max, rolling_mean, rolling_median, rolling_min, rolling_std, rolling_sum
+from trend_pipeline import PackedSeries
+
+NAIVE = {
+    rolling_sum: np.nansum, rolling_mean: np.nanmean, rolling_min: np.nanmin, rolling_max: np.nanmax,
+    rolling_median: np.nanmedian, rolling_std: lambda x: np.nanstd(x, ddof=1),
+}
+
+
+@pytest.fixture
+def packed(users):
+    return PackedSeries.from_series(users)
+
+
+@pytest.mark.parametrize("function", list(NAIVE))
+@pytest.mark.parametrize("window, min_periods", [(1, None), (5, 3), (7, None)])
+def test_packed_statistics_match_naive_windows(packed, function, window, min_periods):
+    result = function(packed, window, min_periods)
+    required = window if min_periods is None else min_periods
+    for user in range(len(packed)):
+        _, values = packed.series(user)
+        start = packed.offsets[user]
+        for i in range(len(values)):
+            window_values = values[max(i - window + 1, 0):i + 1]
+            enough = np.isfinite(window_values).sum() >= max(required, 2 if function is rolling_std else 1)
+            expected = NAIVE[function](window_values) if enough else np.nan
+            np.testing.assert_allclose(result[start + i], expected, rtol=1e-9, atol=1e-9)
+
+
+def test_streaming_window_matches_vectorized():
+    rng = np.random.default_rng(1)
+    values = np.round(rng.normal(70, 1, 500), 1)  # Rounded, so the median heaps see ties
+    values[rng.random(500) < 0.1] = np.nan
+    window = RollingWindow(9)
+    statistics = {"mean": [], "std": [], "min": [], "max": [], "median": []}
+    for value in values:
+        window.push(value)
+        for name, collected in statistics.items():
+            collected.append(getattr(window, name)())
+    for name, function in (("mean", rolling_mean), ("std", rolling_std), ("min", rolling_min), ("max", rolling_max), ("median", rolling_median)):
+        np.testing.assert_allclose(statistics[name], function(values, 9, min_periods=1), rtol=1e-9, atol=1e-9)
+
+
+def test_anomalies_generalize_previous_value_rule():
+    packed = PackedSeries.from_series([(np.arange(5), [80.0, 82.0, 82.1, 79.0, 79.1]), (np.arange(3), [60.0, 60.1, 58.0])])
+    assert rolling_anomalies(packed, 2.0).tolist() == [False, True, False, True, False, False, False, True]
+    # A single outlier does not shift a median baseline
+    values = np.array([80.0, 80.1, 85.0, 80.2, 80.0])
+    assert rolling_anomalies(values, 2.0, window=3).tolist() == [False, False, True, False, False]
+    assert rolling_anomalies(values, 2.0, window=1).tolist() == [False, False, True, True, False]
+
+
+@pytest.mark.parametrize("function", list(NAIVE))
+def test_empty_input_gives_empty_result(function):
+    assert function(np.zeros(0), 3).shape == (0,)
+    assert function(PackedSeries.from_series([([], []), ([], [])]), 3).shape == (0,)
+    assert rolling_anomalies(np.zeros(0), window=3).shape == (0,)
@@ -0,0 +1,54 @@
+from simulation_cache import SimulationCache
+
+
+def simulate(duration_days, weight, energy_intake=2000.0):
+    simulate.calls += 1
+    return (duration_days, weight, energy_intake)
+
+
+simulate.calls = 0
+
+
+def test_wrapped_function_normalizes_arguments_and_counts_hits():
+    cache = SimulationCache(max_entries=2)
+    cached = cache.wrap(simulate, "1")
+    first = cached(30, 80.0)
+    assert cached(30, weight=80.0000000001, energy_intake=2000) == first
+    assert simulate.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    cached(31, 80.0)
+    cached(32, 80.0)
+    assert cache.stats()["evictions"] == 1
+    cached(30, 80.0)
+    assert simulate.calls == 4
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = SimulationCache(ttl_seconds=10, clock=lambda: now[0])
+    cache.put("key", "value")
+    assert cache.get("key") == "value"
+    now[0] = 11.0
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_callers_get_their_own_copies():
+    from trajectory import Trajectory
+
+    def simulate_trajectory(days):
+        trajectory = Trajectory(("weight",))
+        for day in range(days):
+            trajectory.append_values(day, 80.0 - day)
+        return trajectory
+
+    cached = SimulationCache().wrap(simulate_trajectory, "1")
+    first = cached(3)
+    first.append_values(3, 0.0)
+    first.metadata["edited"] = True
+    second = cached(3)
+    second.truncate(1)
+
+    assert len(cached(3)) == 3 and cached(3).metadata == {}
+    assert len(first) == 4 and len(second) == 1
@@ -0,0 +1,65 @@
+import numpy as np
+
+from thomas_model import run_simulation
+from thomas_model_batch import run_simulation_batch, BATCH_TOLERANCE, RESULT_FIELDS
+
+PROFILES = [
+    # sex, age, weight (kg), height (cm), energy intake (kcal/day), body fat
+    ("male", 35, 95.0, 180, 1900, 0),
+    ("female", 52, 72.0, 162, 2600, 0.38),
+    ("male", 30, 60.0, 180, 500, 0.06),  # Reaches the essential fat mass early
+    ("female", 45, 88.0, 168, 900, 0),   # Very-low-calorie adaptation constants
+]
+
+
+def test_batch_matches_scalar_path():
+    duration = 240
+    columns = list(zip(*PROFILES))
+    batch = run_simulation_batch(*columns[:5], duration, columns[5])
+
+    for i, profile in enumerate(PROFILES):
+        scalar = run_simulation(*profile[:5], duration, profile[5])
+        rows = len(scalar)
+        assert batch["days_simulated"][i] == rows - 1
+        assert batch["terminated"][i] == scalar.metadata["state"]["terminated"]
+        for field in RESULT_FIELDS:
+            np.testing.assert_allclose(batch[field][i, :rows], scalar[field], rtol=BATCH_TOLERANCE)
+            assert np.isnan(batch[field][i, rows:]).all()
+
+
+def test_batch_accepts_daily_intake_arrays():
+    schedule = np.where(np.arange(61) % 7 >= 5, 2600.0, 1700.0)
+    batch = run_simulation_batch("male", 40, [90.0, 100.0], 180, np.tile(schedule, (2, 1)), 60, fields=("weight",))
+    scalar = run_simulation("male", 40, 100.0, 180, schedule, 60)
+
+    assert set(batch) == {"weight", "day", "days_simulated", "terminated"}
+    np.testing.assert_allclose(batch["weight"][1], scalar["weight"], rtol=BATCH_TOLERANCE)
+
+
+def test_target_weight_solver_batch_matches_scalar_solver(monkeypatch):
+    import thomas_model
+    from thomas_model import calculate_energy_intake_for_target_weight
+    from thomas_model_batch import calculate_energy_intake_for_target_weight_batch
+
+    targets = [88.0, 70.0, 75.0]
+    profiles = [("male", 35, 95.0, 180), ("female", 52, 72.0, 162), ("female", 30, 68.0, 170)]
+    columns = list(zip(*profiles))
+    batch = calculate_energy_intake_for_target_weight_batch(180, targets, *columns)
+
+    assert batch["converged"].all()
+    for i, (target, profile) in enumerate(zip(targets, profiles)):
+        simulations = []
+        monkeypatch.setattr(thomas_model, "run_simulation", lambda *args: simulations.append(args) or run_simulation(*args))
+        results, intake, maintenance = calculate_energy_intake_for_target_weight(180, target, *profile)
+        # Both solvers take the same secant steps, within the documented 4-6 simulations
+        assert batch["iterations"][i] == len(simulations) <= 6
+        assert abs(results[-1]["weight"] - target) <= 0.01
+        assert abs(batch["energy_intake"][i] - intake) < 2.0
+        assert abs(batch["maintenance_calories"][i] - maintenance) < 2.0
+
+
+def test_batch_exact_baseline_fat_mass_matches_scalar_path():
+    batch = run_simulation_batch(["male", "female"], 40, [90.0, 70.0], [178, 165], 2000, 30, fat_mass_method="exact")
+    for i, (sex, weight, height) in enumerate((("male", 90.0, 178), ("female", 70.0, 165))):
+        scalar = run_simulation(sex, 40, weight, height, 2000, 30, fat_mass_method="exact")
+        np.testing.assert_allclose(batch["fat_mass"][i], scalar["fat_mass"], rtol=BATCH_TOLERANCE)
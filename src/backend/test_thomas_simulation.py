@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+
+from thomas_model import run_simulation, continue_simulation
+
+
+def test_continue_simulation_matches_single_run():
+    full = run_simulation("female", 45, 80.0, 165, 1600, 200)
+    head = run_simulation("female", 45, 80.0, 165, 1600, 120)
+    state = json.loads(json.dumps(head.metadata["state"]))
+    tail = continue_simulation(state, 80)
+
+    assert list(tail["day"]) == list(range(121, 201))
+    np.testing.assert_allclose(tail["weight"], full["weight"][121:], rtol=1e-12)
+    assert tail.metadata["state"]["day"] == full.metadata["state"]["day"]
+
+
+def test_intake_schedule_runs_in_single_pass():
+    constant = run_simulation("male", 40, 95.0, 180, 2200, 60)
+    as_array = run_simulation("male", 40, 95.0, 180, [2200] * 61, 60)
+    np.testing.assert_allclose(as_array["weight"], constant["weight"], rtol=1e-12)
+
+    schedule = [(0, 2000), (28, 2800), (35, 2000)]
+    full = run_simulation("male", 40, 95.0, 180, schedule, 60)
+    head = run_simulation("male", 40, 95.0, 180, schedule, 30)
+    tail = continue_simulation(json.loads(json.dumps(head.metadata["state"])), 30)
+    np.testing.assert_allclose(tail["weight"], full["weight"][31:], rtol=1e-12)
+    # The refeed week (days 28-34) raises weight relative to staying at 2000 kcal
+    steady = run_simulation("male", 40, 95.0, 180, 2000, 60)
+    assert full[40]["weight"] > steady[40]["weight"]
+    assert full[28]["weight"] == steady[28]["weight"]
+
+
+def test_jit_kernel_matches_reference_loop(monkeypatch):
+    import jit_backend
+
+    # Loss, then gain phase (SPA and DIT use the phase constants)
+    for intake in ([(0, 1300), (100, 1700)], [(0, 1300), (100, 3600)]):
+        runs = {}
+        for use_jit in (False, True):
+            monkeypatch.setattr(jit_backend, "USE_JIT", use_jit)
+            runs[use_jit] = run_simulation("female", 38, 92.0, 168, intake, 250)
+        assert len(runs[True]) == len(runs[False])
+        for field in runs[False].keys():
+            np.testing.assert_allclose(runs[True][field], runs[False][field], rtol=1e-9)
+        assert runs[True].metadata["state"]["day"] == runs[False].metadata["state"]["day"]
+
+    # Early termination at the essential fat mass is reported the same way
+    for use_jit in (False, True):
+        monkeypatch.setattr(jit_backend, "USE_JIT", use_jit)
+        runs[use_jit] = run_simulation("male", 30, 60.0, 180, 800, 400, 0.08)
+    assert runs[True].metadata["state"]["terminated"] and len(runs[True]) == len(runs[False])
+
+
+def test_analytic_ffm_partials_match_finite_differences():
+    from thomas_model import calculate_ffm, calculate_partial_derivatives
+
+    fat_mass = np.array([8.0, 15.0, 30.0, 45.0])
+    for sex in ("male", "female"):
+        dFFM_dF, dFFM_dt = calculate_partial_derivatives(fat_mass, 40, 100, 175, sex)
+        h = 1e-4
+        numeric_dF = (calculate_ffm(fat_mass + h, 40, 100, 175, sex) - calculate_ffm(fat_mass - h, 40, 100, 175, sex)) / (2 * h)
+        numeric_dt = (calculate_ffm(fat_mass, 40, 100 + 1, 175, sex) - calculate_ffm(fat_mass, 40, 100 - 1, 175, sex)) / 2
+        positive = calculate_ffm(fat_mass, 40, 100, 175, sex) > 0
+        np.testing.assert_allclose(dFFM_dF[positive], numeric_dF[positive], rtol=1e-6)
+        np.testing.assert_allclose(dFFM_dt[positive], numeric_dt[positive], rtol=1e-6, atol=1e-12)
+        assert calculate_partial_derivatives(30.0, 40, 100, 175, sex)[0] == dFFM_dF[2]
+
+    mixed = calculate_ffm(fat_mass, 40, 100, 175, np.array(["male", "female", "male", "female"]))
+    assert mixed[0] == calculate_ffm(8.0, 40, 100, 175, "male")
+    assert mixed[3] == calculate_ffm(45.0, 40, 100, 175, "female")
+
+
+def test_run_until_reports_first_event():
+    from thomas_model import run_simulation_until
+
+    events = [{"type": "plateau", "value": 0.005}, {"type": "body_fat_percentage", "value": 0.15}]
+    results = run_simulation_until("male", 35, 95.0, 180, 1900, 3000, events=events)
+    event = results.metadata["event"]
+    full = run_simulation("male", 35, 95.0, 180, 1900, len(results) + 10)
+
+    assert event["type"] == "plateau" and len(results) - 2 < event["day"] <= len(results) - 1
+    np.testing.assert_allclose(results["weight"], full["weight"][:len(results)], rtol=1e-12)
+    speed = np.abs(np.diff(full["weight"]))
+    assert speed[len(results) - 2] < 0.005 <= speed[len(results) - 3]
+
+    tail = continue_simulation(results.metadata["state"], 10)
+    np.testing.assert_allclose(tail["weight"], full["weight"][len(results):len(results) + 10], rtol=1e-12)
+
+    unreachable = run_simulation_until("male", 35, 95.0, 180, 1900, 60, events=[{"type": "weight", "value": 50.0}])
+    assert unreachable.metadata["event"] is None and len(unreachable) == 61
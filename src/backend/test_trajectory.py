@@ -0,0 +1,62 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from trajectory import Trajectory
+
+
+def test_rows_columns_and_lazy_scaling():
+    trajectory = Trajectory(("weight", "tee"), {"tee": 1000.0}, capacity=1)
+    for day in range(5):
+        trajectory.append_values(day, 80.0 - day, 10.0 + day)
+    trajectory.append({"day": 5, "weight": 75.0, "tee": 15.0})
+
+    assert len(trajectory) == 6
+    assert trajectory[-1]["weight"] == 75.0
+    assert trajectory[0]["tee"] == 10000.0
+    assert dict(trajectory[2]) == {"day": 2, "weight": 78.0, "tee": 12000.0}
+    np.testing.assert_array_equal(trajectory["day"], np.arange(6))
+    np.testing.assert_allclose(trajectory.column("weight", 2.0), 2 * np.arange(80.0, 74.0, -1))
+    assert trajectory.to_records()[3] == {"day": 3, "weight": 77.0, "tee": 13000.0}
+    assert [row["day"] for row in trajectory] == list(range(6))
+
+
+def test_slices_behave_like_list_slices():
+    trajectory = Trajectory(("weight",), {"weight": 2.0})
+    for day in range(10):
+        trajectory.append_values(day, 80.0 - day)
+    trajectory.metadata["state"] = {"day": 9}
+
+    for key in (slice(3), slice(-4, None), slice(2, 8, 3), slice(5, 2)):
+        sliced = trajectory[key]
+        assert isinstance(sliced, Trajectory) and sliced.metadata == {}
+        assert sliced.to_records() == trajectory.to_records()[key]
+    assert trajectory[-3:][0]["day"] == 7
+    with pytest.raises(IndexError):
+        trajectory[10]
+
+
+def _allocated(build):
+    # Bytes still allocated after build() returns (NumPy reports its buffers to tracemalloc)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_per_day_is_several_times_below_dicts():
+    from thomas_model import run_simulation
+
+    days = 3650
+    run_simulation("male", 40, 95.0, 180, 2000, 10)  # Warm up (imports, compiled kernels, caches)
+    columnar, results = _allocated(lambda: run_simulation("male", 40, 95.0, 180, 2000, days))
+    records, _ = _allocated(results.to_records)
+
+    # The models allocate the trajectory at its final size, so what stays allocated is the packed rows
+    assert results.nbytes <= columnar <= results.nbytes + 64 * 1024
+    # 4 + 8 bytes per field per day, against a dict and a boxed float per field (~7x for these 9 fields)
+    assert columnar * 5 <= records
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from trend_pipeline import PackedSeries, compute_trends, detect_anomalies, moving_average
+
+
+def _nanmean(values):
+    return np.nanmean(values) if np.isfinite(values).any() else np.nan
+
+
+def test_trends_match_per_user_definitions(users):
+    packed = PackedSeries.from_series(users)
+    trends = compute_trends(packed, window_size=7, window_days=5, threshold_percentage=1.5)
+
+    for user, (days, values) in enumerate(users):
+        start, stop = packed.offsets[user], packed.offsets[user + 1]
+        expected_average = [_nanmean(values[i - 6:i + 1]) if i >= 6 else np.nan for i in range(len(values))]
+        np.testing.assert_allclose(trends["moving_average"][start:stop], expected_average, rtol=1e-12)
+
+        expected_trend = [_nanmean(values[np.abs(days - day) < 5]) for day in days]
+        np.testing.assert_allclose(trends["trend"][start:stop], expected_trend, rtol=1e-12)
+
+        expected_anomaly = [i > 0 and abs((values[i] - values[i - 1]) / values[i - 1]) * 100 >= 1.5 for i in range(len(values))]
+        assert trends["anomaly"][start:stop].tolist() == expected_anomaly
+
+        finite = np.isfinite(values)
+        if finite.sum() >= 2:
+            assert trends["rate"][user] == pytest.approx(np.polyfit(days[finite], values[finite], 1)[0], rel=1e-9)
+        else:
+            assert np.isnan(trends["rate"][user])
+
+
+def test_from_rows_sorts_users_and_days(users):
+    packed = PackedSeries.from_series(users)
+    users_of_rows = packed.user_index()
+    shuffle = np.random.default_rng(1).permutation(len(packed.values))
+    rebuilt = PackedSeries.from_rows(users_of_rows[shuffle], packed.days[shuffle], packed.values[shuffle], n_users=len(users))
+
+    assert np.array_equal(rebuilt.offsets, packed.offsets)
+    assert np.array_equal(rebuilt.values, packed.values, equal_nan=True)
+    assert np.array_equal(moving_average(rebuilt, 3), moving_average(packed, 3), equal_nan=True)
+    assert not detect_anomalies(rebuilt)[rebuilt.starts_mask()].any()
+    with pytest.raises(ValueError):
+        PackedSeries([2.0, 1.0], [80.0, 79.0], [0, 2])
+
+
+def test_nan_gaps_do_not_leak_into_other_users():
+    # User 0 has a gap day (as resample_daily leaves for long gaps); user 1 is constant
+    gappy = np.array([80.0, 79.8, np.nan, 79.5, 79.4, 79.6, 79.2, 79.0])
+    packed = PackedSeries.from_series([(np.arange(8.0), gappy), (np.arange(6.0), np.full(6, 70.0)), (np.arange(2.0), [np.nan, np.nan])])
+    trends = compute_trends(packed, window_size=3, window_days=2)
+
+    expected_average = [np.nanmean(gappy[i - 2:i + 1]) if i >= 2 else np.nan for i in range(8)]
+    np.testing.assert_allclose(trends["moving_average"][:8], expected_average, rtol=1e-12)
+    np.testing.assert_allclose(trends["trend"][:8], [np.nanmean(gappy[max(i - 1, 0):i + 2]) for i in range(8)], rtol=1e-12)
+    np.testing.assert_allclose(trends["moving_average"][8:14], [np.nan, np.nan, 70, 70, 70, 70], rtol=1e-12)
+    np.testing.assert_allclose(trends["trend"][8:14], 70.0, rtol=1e-12)
+    assert np.isnan(trends["moving_average"][14:]).all() and np.isnan(trends["trend"][14:]).all()
+
+    finite = np.isfinite(gappy)
+    assert trends["rate"][0] == pytest.approx(np.polyfit(np.arange(8.0)[finite], gappy[finite], 1)[0], rel=1e-9)
+    assert trends["rate"][1] == 0 and np.isnan(trends["rate"][2])
+    assert not trends["anomaly"].any()
+
+
+def test_empty_series_give_empty_trends():
+    for packed in (PackedSeries.from_series([]), PackedSeries.from_rows([], [], [], n_users=3)):
+        trends = compute_trends(packed)
+        assert all(len(trends[name]) == 0 for name in ("moving_average", "trend", "anomaly"))
+        assert len(trends["rate"]) == len(packed) and np.isnan(trends["rate"]).all()
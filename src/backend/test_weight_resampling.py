@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from weight_resampling import aggregate_by_day, contiguous_segments, resample_daily
+
+
+def test_resample_aggregates_and_marks_gaps():
+    timestamps = np.array([
+        "2024-01-01T07:00", "2024-01-01T21:00", "2024-01-01T12:00",  # Three weigh-ins on one day
+        "2024-01-03T07:00",                                          # One missed day
+        "2024-01-14T07:00", "2024-01-15T07:00",                      # Ten missed days
+    ], dtype="datetime64[s]")
+    values = np.array([80.0, 81.0, 80.4, 79.8, 79.0, np.nan])
+
+    result = resample_daily(timestamps, values, "last", max_gap_days=7)
+    assert result["date"][0] == np.datetime64("2024-01-01") and result["date"][-1] == np.datetime64("2024-01-14")
+    assert result["value"][0] == 81.0 and result["value"][1] == pytest.approx(80.4)
+    assert result["count"][:3].tolist() == [3, 0, 1] and result["observed"].sum() == 3
+    assert result["gap"].tolist() == [False] * 3 + [True] * 10 + [False]
+    assert np.isnan(result["value"][3:13]).all()
+    assert contiguous_segments(~result["gap"]) == [(0, 3), (13, 14)]
+
+    assert resample_daily(timestamps, values, "min")["value"][0] == 80.0
+    assert resample_daily(timestamps, values, "median")["value"][0] == 80.4
+    # Late evening UTC is the next local day at UTC+5
+    assert resample_daily(timestamps, values, "last", utc_offset_hours=5)["count"][:2].tolist() == [2, 1]
+
+
+def test_aggregation_matches_per_day_loop():
+    rng = np.random.default_rng(0)
+    days = rng.integers(0, 1000, 20000)
+    values = rng.normal(70, 1, 20000)
+    unique, medians, counts = aggregate_by_day(days, values, "median")
+    for day in rng.choice(unique, 20):
+        i = np.searchsorted(unique, day)
+        assert medians[i] == np.median(values[days == day]) and counts[i] == (days == day).sum()
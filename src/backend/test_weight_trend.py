@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+import pytest
+
+from weight_trend import init_trend_state, smooth_weight_series, trend_estimate, update_trend_state
+
+
+@pytest.mark.parametrize("method", ["ewma", "kalman"])
+def test_trend_recovers_linear_loss(method):
+    rng = np.random.default_rng(0)
+    days = np.arange(120.0)
+    weights = 90 - 0.1 * days + rng.normal(0, 0.5, days.size)
+    estimates, _ = smooth_weight_series(days, weights, method)
+
+    assert abs(estimates[-1]["trend"] - (90 - 0.1 * 119)) < 0.5
+    assert abs(estimates[-1]["rate"] + 0.1) < 0.02
+    # The trend is much less noisy than the raw weigh-ins
+    assert np.std(np.diff([e["trend"] for e in estimates[30:]])) < 0.2 * np.std(np.diff(weights[30:]))
+
+
+@pytest.mark.parametrize("method", ["ewma", "kalman"])
+def test_persisted_state_resumes_identically(method):
+    days = [0, 1, 2, 5, 5, 9, 10, 14]  # Gaps and a repeated day
+    weights = [80.0, 79.6, 79.9, 79.1, 79.3, 78.8, 78.9, 78.2]
+    _, uninterrupted = smooth_weight_series(days, weights, method)
+
+    _, state = smooth_weight_series(days[:4], weights[:4], method)
+    state = json.loads(json.dumps(state))
+    for day, weight in zip(days[4:], weights[4:]):
+        state = update_trend_state(state, day, weight)
+    assert state == uninterrupted
+
+
+def test_kalman_uncertainty_and_projection():
+    state = init_trend_state(0, 80.0)
+    for day in range(1, 30):
+        state = update_trend_state(state, day, 80.0 - 0.05 * day)
+    now, later = trend_estimate(state), trend_estimate(state, 40)
+
+    assert later["trend"] == pytest.approx(now["trend"] + 11 * now["rate"])
+    assert later["trend_sd"] > now["trend_sd"] > 0
+    with pytest.raises(ValueError):
+        update_trend_state(state, 10, 79.0)
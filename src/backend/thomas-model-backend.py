@@ -1,8 +1,12 @@
 import base64
 from flask import Flask, render_template, request, jsonify
-from thomas_model import run_simulation, get_weight_loss_plot_image, get_energy_expenditure_plot_image
+from thomas_model import run_simulation, calculate_energy_intake_for_target_weight, get_weight_loss_plot_image, get_energy_expenditure_plot_image, MODEL_VERSION
+from simulation_cache import SimulationCache, normalize_value
 
 app = Flask(__name__ , template_folder='templates')
+SIMULATION_CACHE = SimulationCache()
+cached_run_simulation = SIMULATION_CACHE.wrap(run_simulation, MODEL_VERSION)
+cached_calculate_energy_intake_for_target_weight = SIMULATION_CACHE.wrap(calculate_energy_intake_for_target_weight, MODEL_VERSION)
 
 @app.route('/simulate', methods=['POST'])
 def simulate():
@@ -15,7 +19,8 @@ def simulate():
             "age": int,
             "weight": float (in lbs),
             "height": float (in inches),
-            "energy_intake": float (in kcal/day),
+            "energy_intake": float (in kcal/day), or omitted/0 for target weight mode
+            "target_weight": float (in lbs, target weight mode only),
             "duration": int (number of days)
         }
 
@@ -23,7 +28,8 @@ def simulate():
         {
             "results": [...],  # List of dictionaries for each day
             "weight_loss_plot": "data:image/png;base64,...",  # Weight loss plot as base64-encoded image
-            "energy_expenditure_plot": "data:image/png;base64,..."  # Energy expenditure plot as base64-encoded image
+            "energy_expenditure_plot": "data:image/png;base64,...",  # Energy expenditure plot as base64-encoded image
+            "maintenance_message": str  # Required and maintenance intake (target weight mode only)
         }
     """
     # Parse input data
@@ -32,26 +38,44 @@ def simulate():
     age = data['age']
     weight = data['weight'] / 2.20462  # Convert lbs to kg
     height = data['height'] * 2.54  # Convert inches to cm
-    energy_intake = data['energy_intake']
     body_fat_percentage = data['body_fat_percentage']
     duration = data['duration']
 
-    # Run simulation
-    results = run_simulation(sex, age, weight, height, energy_intake, duration, body_fat_percentage)
+    if data.get('energy_intake'):
+        # Energy Intake Mode
+        results = cached_run_simulation(sex, age, weight, height, data['energy_intake'], duration, body_fat_percentage)
+        maintenance_message = ""
+    else:
+        # Target Weight Mode
+        target_weight = data['target_weight'] / 2.20462  # lbs -> kg
+        results, required_energy_intake, maintenance_calories = cached_calculate_energy_intake_for_target_weight(
+            duration, target_weight, sex, age, weight, height, body_fat_percentage
+        )
+        maintenance_message = f"Required energy intake of {required_energy_intake:.2f} to reach {data['target_weight']:.2f} lbs in {duration} days and then {maintenance_calories:.2f} kcal/day to maintain new weight."
 
-    # Generate plots
-    weight_loss_plot_buffer = get_weight_loss_plot_image(results)
-    energy_expenditure_plot_buffer = get_energy_expenditure_plot_image(results)
+    # Generate plots (cached per normalized request, like the simulation itself)
+    weight_loss_plot_buffer, energy_expenditure_plot_buffer = SIMULATION_CACHE.get_or_compute(
+        ("plots", MODEL_VERSION, normalize_value(data)),
+        lambda: (get_weight_loss_plot_image(results), get_energy_expenditure_plot_image(results)),
+    )
 
     # Prepare response
     response = {
-        "results": results,
+        "results": results.to_records(),
         "weight_loss_plot": f"data:image/png;base64,{base64.b64encode(weight_loss_plot_buffer).decode('utf-8')}",
         "energy_expenditure_plot": f"data:image/png;base64,{base64.b64encode(energy_expenditure_plot_buffer).decode('utf-8')}",
+        "maintenance_message": maintenance_message,
     }
 
     return jsonify(response)
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Return the simulation cache hit/miss/eviction counters.
+    """
+    return jsonify(SIMULATION_CACHE.stats())
+
 @app.route("/")
 def index():
     print("route/: should return index.html")
@@ -22,6 +22,8 @@ Thomas, D. M., Martin, C. K., Heymsfield, S., Redman, L. M., Schoeller, D. A., &
 Thomas, D. M., Gonzalez, M. C., Pereira, A. Z., Redman, L. M., & Heymsfield, S. B. (2014). Time to correctly predict the amount of weight loss with dieting. Journal of the Academy of Nutrition and Dietetics, 114(6), 857–861. https://doi.org/10.1016/j.jand.2014.02.003
 """
 
+import logging
+
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
@@ -30,6 +32,14 @@ import mplcursors
 import scipy.optimize as opt
 from scipy.optimize import fsolve
 
+from trajectory import Trajectory
+from intake_schedule import daily_intake, intake_on_day
+import jit_backend
+from jit_backend import njit
+from observers import trace_rows
+from simulation_events import DEFAULT_CHUNK_DAYS, run_until_event
+from intake_solver import solve_target_intake
+
 
 # Constants
 CF = 1020  # Energy density of FFM (kcal/kg)
@@ -46,6 +56,33 @@ BASELINE_SPA_FACTOR = 0.326 # SPA(0) = 0.326 * E(0) or baseline energy
 CONVERSION_FACTOR = 2.20462  # lbs to kg conversion factor
 ESSENTIAL_FAT_MASS = {"male":2.5, "female":5}  # Essential fat mass in kg, smallest healthy fat mass
 ESSENTIAL_LEAN_MASS = {"male": 18, "female": 18} # Smallest healthy lean mass in kg, smallest healthy lean mass
+ADAPTATION_CONSTANTS = np.array([A_METABOLIC[key] for key in ("CR0", "CR3", "CR6", "VLCR0", "VLCR3", "VLCR6")])  # Array form, indexed by period
+MODEL_VERSION = "2"  # Bump whenever results change, so cached simulations are invalidated
+MIXED_TISSUE_ENERGY_DENSITY = 7700  # kcal/kg, first-order energy content of weight change (inverse solver first guess)
+TARGET_INTAKE_BOUNDS = (500.0, 8000.0)  # Search range of the inverse solver in kcal/day
+RESULT_FIELDS = ("weight", "fat_mass", "lean_mass", "body_fat_percentage", "tee", "rmr", "dit", "spa", "pa")
+# NHANES FFM regression (Thomas 2011) as a polynomial in fat mass F whose coefficients are linear in
+# years = age + t / 365 and height: FFM = sum_k (const_k + years_k * years + height_k * height) * F**k.
+# Rows are (const, years, height) for k = 0..4.
+FFM_COEFFICIENTS = {
+    "male": (
+        (-71.7, -0.04, 0.7),
+        (3.6, -0.002, -0.01),
+        (-0.07, 0.00003, 0.0003),
+        (0.0006, 0.0, -0.000002),
+        (-0.000002, 0.0, 0.0),
+    ),
+    "female": (
+        (-72.1, -0.042, 0.7),
+        (2.5, 0.0, -0.01),
+        (0.0, -0.04, 0.0003),
+        (0.0002, 0.0, -0.000002),
+        (0.0000004, 0.0, 0.0),
+    ),
+}
+FFM_COEFFICIENT_ARRAYS = {sex: np.array(rows) for sex, rows in FFM_COEFFICIENTS.items()}  # Shape (5, 3), for the JIT kernel
+
+logger = logging.getLogger(__name__)
 
 # Functions
 def calculate_rmr(weight, age, sex, a=0):
@@ -62,10 +99,38 @@ def calculate_rmr(weight, age, sex, a=0):
     Returns:
         float: Resting Metabolic Rate (RMR) in kcal/day.
     """
-    c, p, y = RMR[sex].values()
+    constants = RMR[sex]
+    return livingston_kohlstadt_rmr(weight, age, constants["c"], constants["p"], constants["y"], a)
+
+def livingston_kohlstadt_rmr(weight, age, c, p, y, a=0):
+    """
+    Livingston-Kohlstadt RMR for given constants (see `calculate_rmr`).
+
+    Returns:
+        float: Resting Metabolic Rate (RMR) in kcal/day.
+    """
     rmr = (1 - a) * c * (max(weight, 0) ** p) - y * age
     return max(rmr, 0)
 
+def select_metabolic_adaptation(day, delta_energy):
+    """
+    Metabolic adaptation constant for a day of the simulation: by diet severity (very low calorie when
+    the deficit exceeds 1000 kcal/day) and duration (0, 3 or 6 months), 0 without a deficit.
+
+    Parameters:
+        day (int): Simulation day.
+        delta_energy (float): Energy balance of the day in kcal/day.
+
+    Returns:
+        float: Adaptation constant a for `calculate_rmr`.
+    """
+    if delta_energy >= 0:
+        return 0.0
+    period = 2 if day >= 180 else (1 if day >= 90 else 0)  # 6, 3 or 0 months
+    if delta_energy < -1000:
+        return float(ADAPTATION_CONSTANTS[3 + period])
+    return float(ADAPTATION_CONSTANTS[period])
+
 def calculate_pa(weight, baseline_pa, baseline_weight):
     """
     Calculate Physical Activity (PA) based on current weight and baseline values.
@@ -116,7 +181,6 @@ def calculate_spa(rmr, pa, dit, weight_change_phase, constant_c):
     """
     s = S_LOSS if weight_change_phase == "loss" else S_GAIN
     spa = (s / (1 - s)) * (dit + pa + rmr) + constant_c
-    print(f"(s / (1 - s)) {(s / (1 - s))} * {(dit + pa + rmr)} + {constant_c} = {spa}")
     return max(spa, 0)
 
 def calculate_constant_c(baseline_energy, rmr, pa, dit, weight_change_phase):
@@ -157,6 +221,37 @@ def calculate_baseline_pa(baseline_energy, dit0, spa0, rmr0):
     return max(pa0, 0)
 
 
+def evaluate_ffm_polynomial(fat_mass, years, height, sex):
+    """
+    Evaluate the FFM regression and its exact partial derivatives in one Horner pass over
+    FFM_COEFFICIENTS. Works on scalars and NumPy arrays alike (arguments broadcast).
+
+    Parameters:
+        fat_mass (float or np.ndarray): Fat mass in kilograms.
+        years (float or np.ndarray): Age in years at the evaluated time (age + t / 365).
+        height (float or np.ndarray): Height in centimeters.
+        sex (str or array of str): "male" or "female".
+
+    Returns:
+        tuple: (FFM, dFFM/dF, dFFM/dyears), unclamped. FFM in kilograms.
+    """
+    if isinstance(sex, str):
+        if sex not in FFM_COEFFICIENTS:
+            raise ValueError("Sex must be 'male' or 'female'.")
+        rows = FFM_COEFFICIENTS[sex]
+    else:
+        is_male = np.asarray(sex) == "male"
+        rows = [
+            tuple(np.where(is_male, male, female) for male, female in zip(male_row, female_row))
+            for male_row, female_row in zip(FFM_COEFFICIENTS["male"], FFM_COEFFICIENTS["female"])
+        ]
+    ffm = dffm_df = dffm_dyears = 0.0
+    for const, years_coefficient, height_coefficient in reversed(rows):
+        dffm_df = dffm_df * fat_mass + ffm
+        ffm = ffm * fat_mass + (const + years_coefficient * years + height_coefficient * height)
+        dffm_dyears = dffm_dyears * fat_mass + years_coefficient
+    return ffm, dffm_df, dffm_dyears
+
 def calculate_ffm(fat_mass, age, t, height, sex):
     """
     Calculate Fat-Free Mass (FFM), also known as lean mass, based on fat mass, age, time, height, and sex, 
@@ -172,40 +267,12 @@ def calculate_ffm(fat_mass, age, t, height, sex):
     Returns:
         float: Fat-Free Mass (FFM) in kilograms.
     """
-    if sex == "male":
-        ffm = (
-            -71.7
-            + 3.6 * fat_mass
-            - 0.04 * (age + t / 365)
-            + 0.7 * height
-            - 0.002 * fat_mass * (age + t / 365)
-            - 0.01 * fat_mass * height
-            + 0.00003 * fat_mass**2 * (age + t / 365)
-            - 0.07 * fat_mass**2
-            + 0.0006 * fat_mass**3
-            - 0.000002 * fat_mass**4
-            + 0.0003 * fat_mass**2 * height
-            - 0.000002 * fat_mass**3 * height
-        )
-    elif sex == "female":
-        ffm = (
-            -72.1
-            + 2.5 * fat_mass
-            - 0.04 * (age + t / 365)
-            + 0.7 * height
-            - 0.002 * (age + t / 365)
-            - 0.01 * fat_mass * height
-            - 0.04 * fat_mass**2 * (age + t / 365)
-            + 0.0000004 * fat_mass**4
-            + 0.0002 * fat_mass**3
-            + 0.0003 * fat_mass**2 * height
-            - 0.000002 * fat_mass**3 * height
-        )
-    else:
-        raise ValueError("Sex must be 'male' or 'female'.")
+    ffm = evaluate_ffm_polynomial(fat_mass, age + t / 365, height, sex)[0]
+    if isinstance(ffm, np.ndarray):
+        return np.maximum(ffm, 0)
     return max(ffm, 0)
 
-def calculate_baseline_fat_mass(weight_kg, age, height_cm, sex):
+def calculate_baseline_fat_mass(weight_kg, age, height_cm, sex, method="regression"):
     """
     This calculation is used when the user enters a weight and does not provide a fat mass or 
     body fat percentage.
@@ -215,15 +282,28 @@ def calculate_baseline_fat_mass(weight_kg, age, height_cm, sex):
 
     weight_kg = calculate_ffm(fat_mass, age, 0, height, sex) + fat_mass
 
+    method="regression" (default) uses a linear regression approximation of that solution. method="exact"
+    solves the equation itself (see fat_mass_inversion) and falls back to the regression where it has
+    no valid root.
+
     Parameters:
         weight_kg (float): Weight in kilograms.
         age (int): Age in years.
         height_cm (float): Height in centimeters.
         sex (str): "male" or "female"
+        method (str): "regression" or "exact".
 
     Returns:
         float: Baseline fat mass in kilograms.
     """
+    if method == "exact":
+        from fat_mass_inversion import calculate_baseline_fat_mass_exact
+
+        fat_mass = calculate_baseline_fat_mass_exact(weight_kg, age, height_cm, sex)
+        if not np.isnan(fat_mass):
+            return fat_mass
+    elif method != "regression":
+        raise ValueError("Method must be 'regression' or 'exact'.")
     # t = 0  # Fixed time value for calculation
 
     # # Define the equation to solve: weight_kg = ffm + fat_mass
@@ -281,22 +361,18 @@ def calculate_baseline_energy_requirements(weight_kg, age, height_cm, sex):
 # Function for partial derivatives
 def calculate_partial_derivatives(fat_mass, age, t, height, sex):
     """
-    Calculate numerical partial derivatives of FFM with respect to fat_mass and time.
+    Calculate the partial derivatives of FFM with respect to fat_mass and time (days), in closed form.
+    Where FFM is clamped at zero both derivatives are zero. Works on scalars and NumPy arrays.
     """
-    epsilon = 0.002  # Small perturbation
-    # Partial derivative with respect to fat_mass
-    ffm_f_plus = calculate_ffm(fat_mass + epsilon, age, t, height, sex)
-    ffm_f_minus = calculate_ffm(fat_mass - epsilon, age, t, height, sex)
-    dFFM_dF = (ffm_f_plus - ffm_f_minus) / (2 * epsilon)
-
-    # Partial derivative with respect to time
-    ffm_t_plus = calculate_ffm(fat_mass, age, t + epsilon, height, sex)
-    ffm_t_minus = calculate_ffm(fat_mass, age, t - epsilon, height, sex)
-    dFFM_dt = (ffm_t_plus - ffm_t_minus) / (2 * epsilon)
-
+    ffm, dFFM_dF, dFFM_dyears = evaluate_ffm_polynomial(fat_mass, age + t / 365, height, sex)
+    dFFM_dt = dFFM_dyears / 365
+    if isinstance(ffm, np.ndarray):
+        return np.where(ffm > 0, dFFM_dF, 0.0), np.where(ffm > 0, dFFM_dt, 0.0)
+    if ffm <= 0:
+        return 0.0, 0.0
     return dFFM_dF, dFFM_dt
 
-def run_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days, body_fat_percentage=0):
+def run_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days, body_fat_percentage=0, observer=None, fat_mass_method="regression"):
     """
     Run a simulation of weight loss or gain over a specified duration based on the Thomas et al. (2011) model.
     
@@ -305,28 +381,35 @@ def run_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days,
         age (int): Age in years
         weight_kg (float): Weight in kilograms
         height_cm (float): Height in centimeters
-        energy_intake (float): Energy intake in kcal/day
+        energy_intake (float or schedule): Energy intake in kcal/day, or a per-day / piecewise schedule
+            (see intake_schedule). The step into day d uses the intake of day d - 1.
         duration_days (int): Duration of the simulation in days
+        observer (observers.Observer): Optional per-step tracing hooks (see observers). None disables tracing.
+        fat_mass_method (str): How to estimate the baseline fat mass when no body fat percentage is given
+            ("regression" or "exact", see calculate_baseline_fat_mass).
 
     Returns:
-        list: A list of dictionaries containing the results of the simulation for each day. 
-        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        Trajectory: Columnar results of the simulation for each day; rows behave like the former
+        dictionaries {day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}.
         
         """
 
     # Initialize variables
     baseline_energy = calculate_baseline_energy_requirements(weight_kg, age, height_cm, sex)
-    weight_change_phase = "loss" if energy_intake < baseline_energy else "gain"
+    if isinstance(energy_intake, np.ndarray):
+        energy_intake = energy_intake.tolist()  # Keep the simulation state JSON-serializable
+    initial_intake = intake_on_day(energy_intake, 0)
+    weight_change_phase = "loss" if initial_intake < baseline_energy else "gain"
 
     # Use user input for body fat percentage if provided, otherwise estimate baseline fat mass
     if (body_fat_percentage is None or body_fat_percentage <= 0):
-        fat_mass = calculate_baseline_fat_mass(weight_kg, age, height_cm, sex)
+        fat_mass = calculate_baseline_fat_mass(weight_kg, age, height_cm, sex, fat_mass_method)
     else:
         fat_mass = weight_kg * body_fat_percentage
     ffm = weight_kg - fat_mass
 
     rmr = calculate_rmr(weight_kg, age, sex)
-    dit = calculate_dit(energy_intake, weight_change_phase)
+    dit = calculate_dit(initial_intake, weight_change_phase)
     
     spa0 = BASELINE_SPA_FACTOR * baseline_energy # initial SPA needed to calculate PA
     pa = calculate_baseline_pa(baseline_energy, dit, spa0, rmr) 
@@ -337,38 +420,29 @@ def run_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days,
     # TEE should now equal baseline_energy
     tee = rmr + dit + spa + pa
 
-    results = []
-    results.append({
-            "day": 0,
-            "weight": weight_kg,
-            "fat_mass": fat_mass,
-            "lean_mass": ffm,
-            "body_fat_percentage": fat_mass / weight_kg,
-            "tee": tee,
-            "rmr": rmr,
-            "dit": dit,
-            "spa": spa,
-            "pa": pa
-        })
+    results = Trajectory(RESULT_FIELDS, capacity=duration_days + 1)
+    results.append_values(0, weight_kg, fat_mass, ffm, fat_mass / weight_kg, tee, rmr, dit, spa, pa)
 
     # Iterate / integrate the calculations over the specified duration with an interval of 1 day
     results = iterate_simulation(
-        sex, age, weight_kg, height_cm, energy_intake, duration_days, rmr, dit, spa, pa, constant_c, fat_mass, ffm, results
+        sex, age, weight_kg, height_cm, energy_intake, duration_days, rmr, dit, spa, pa, constant_c, fat_mass, ffm, results,
+        observer=observer,
     )
 
     return results
 
-def iterate_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days, rmr, dit, spa, pa, c, fat_mass, ffm, results):
+def iterate_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days, rmr, dit, spa, pa, c, fat_mass, ffm, results, start_day=1, baseline_pa=None, baseline_weight=None, observer=None):
     """
     Iterate the simulation over the specified duration, updating the weight, fat mass, lean mass, and energy expenditure
-    for each day.
+    for each day. The final state is stored in results.metadata["state"] so the run can be extended later
+    with `continue_simulation`.
     
     Parameters:
         sex (str): "male" or "female"
         age (int): Age in years
         weight_kg (float): Weight in kilograms
         height_cm (float): Height in centimeters
-        energy_intake (float): Energy intake in kcal/day
+        energy_intake (float or schedule): Energy intake in kcal/day, or a per-day / piecewise schedule
         duration_days (int): Duration of the simulation in days
         rmr (float): Resting Metabolic Rate (RMR) in kcal/day
         dit (float): Dietary-Induced Thermogenesis (DIT) in kcal/day
@@ -377,89 +451,315 @@ def iterate_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_d
         c (float): Constant calculated based on baseline energy
         fat_mass (float): Fat mass in kilograms
         ffm (float): Fat-Free Mass (FFM) or lean mass in kilograms
-        results (list): A list of dictionaries containing the results of the simulation for each day.
+        results (Trajectory): Results of the simulation so far (day 0 holds the baseline values).
+        start_day (int): First day to simulate (1 for a new run).
+        baseline_pa (float): Baseline PA in kcal/day. Defaults to results[0]["pa"].
+        baseline_weight (float): Baseline weight in kilograms. Defaults to results[0]["weight"].
+        observer (observers.Observer): Optional per-step tracing hooks. None disables tracing.
         
         Returns:
-        list: A list of dictionaries containing the updated results of the simulation for each day.
+        Trajectory: The updated results of the simulation for each day.
         [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
         """
     delta_t = 1  # Time step (1 day)
-    for day in range(1, duration_days + 1):
-        
+    if baseline_pa is None:
+        baseline_pa = results[0]["pa"]
+    if baseline_weight is None:
+        baseline_weight = results[0]["weight"]
+    last_day = start_day - 1
+    first_row = len(results)
+    termination = 0  # 1: fat mass reached the essential limit, 2: lean mass reached the healthy limit
+    if observer is not None:
+        observer.on_run_start("thomas", start_day)
+    # Per-day intake for scheduled runs (one extra day for the DIT of the following step);
+    # None keeps the constant-intake loop free of lookups
+    schedule = daily_intake(energy_intake, start_day - 1, duration_days + 1)
+    day_intake = next_intake = energy_intake
+
+    if jit_backend.USE_JIT and duration_days > 0:
+        # Compiled loop
+        intake = np.full(duration_days + 1, float(energy_intake)) if schedule is None else np.asarray(schedule, dtype=float)
+        constants = RMR[sex]
+        values = np.empty((len(RESULT_FIELDS), duration_days))
+        rows, termination, fat_mass, ffm, rmr, dit, spa, pa = thomas_euler_kernel(
+            intake, start_day, float(age), float(height_cm), FFM_COEFFICIENT_ARRAYS[sex],
+            float(constants["c"]), float(constants["p"]), float(constants["y"]),
+            float(ESSENTIAL_FAT_MASS[sex]), float(ESSENTIAL_LEAN_MASS[sex]), float(baseline_pa), float(baseline_weight), float(c),
+            float(fat_mass), float(ffm), float(rmr), float(dit), float(spa), float(pa), values,
+        )
+        results.extend_values(np.arange(start_day, start_day + rows), values[:, :rows])
+        last_day = start_day + rows - 1
+    else:
+        for day in range(start_day, start_day + duration_days):
+            if schedule is not None:
+                day_intake = schedule[day - start_day]
+                next_intake = schedule[day - start_day + 1]
+
+            tee = rmr + dit + spa + pa
+            delta_energy = day_intake - tee
+            weight_change_phase = "loss" if delta_energy < 0 else "gain"
+
+           # Calculate partial derivatives
+            part_dFFM_dF, part_dFFM_dt = calculate_partial_derivatives(fat_mass, age, day, height_cm, sex)
+
+
+            # Solve for dF/dt
+            dF_dt = (delta_energy - CL * part_dFFM_dt) / (CL * part_dFFM_dF + CF)
+            #print(f"dF_dt: {dF_dt}")
+
+            # Calculate dFFM/dt using the relationship
+            dFFM_dt_calc = part_dFFM_dF * dF_dt + part_dFFM_dt
+            #print(f"dFFM_dt: {dFFM_dt_calc}")
+
+            # Update fat mass and lean mass
+            fat_mass += delta_t * dF_dt
+            ffm += delta_t * dFFM_dt_calc
+
+            # Check if weight loss is within healthy limits, terminate simulation if not.
+            if fat_mass < ESSENTIAL_FAT_MASS[sex]:
+                fat_mass = ESSENTIAL_FAT_MASS[sex]
+                termination = 1
+                break
+            if ffm < ESSENTIAL_LEAN_MASS[sex]:
+                ffm = ESSENTIAL_LEAN_MASS[sex]
+                termination = 2
+                break
+
+            metabolic_adaptation = select_metabolic_adaptation(day, delta_energy)
+
+            # Update dependent variables
+            weight_kg = fat_mass + ffm
+            rmr = calculate_rmr(weight_kg, age + day/365, sex, metabolic_adaptation)
+            dit = calculate_dit(next_intake, weight_change_phase)
+            pa = calculate_pa(weight_kg, baseline_pa, baseline_weight)
+            spa = calculate_spa(rmr, pa, dit, weight_change_phase, c)
+            tee = rmr + dit + pa + spa
+
+
+            # Store results
+            results.append_values(day, weight_kg, fat_mass, ffm, fat_mass / weight_kg, tee, rmr, dit, spa, pa)
+            last_day = day
+
+    if termination:
+        message = (
+            f"Fat mass is below essential fat mass on day {last_day + 1}. Simulation ended early." if termination == 1
+            else f"Lean mass is below healthy limit on day {last_day + 1}. Simulation ended early."
+        )
+        logger.warning(message)
+    if observer is not None:
+        trace_rows(observer, "thomas", results, first_row)
+        if termination:
+            observer.on_event("thomas", last_day + 1, "terminated", message)
+        observer.on_run_end("thomas", last_day, len(results) - first_row)
+
+    results.metadata["state"] = {
+        "model": "thomas",
+        "day": last_day,
+        "terminated": termination != 0,
+        "sex": sex,
+        "age": age,
+        "height_cm": height_cm,
+        "energy_intake": energy_intake,
+        "c": c,
+        "baseline_pa": baseline_pa,
+        "baseline_weight": baseline_weight,
+        "fat_mass": fat_mass,
+        "ffm": ffm,
+        "rmr": rmr,
+        "dit": dit,
+        "spa": spa,
+        "pa": pa,
+    }
+    return results
+
+@njit(cache=True)
+def thomas_ffm_partials_kernel(fat_mass, years, height, coefficients):
+    """
+    Compiled form of `calculate_partial_derivatives` for the JIT kernel (same Horner pass).
+
+    Parameters:
+        fat_mass, years, height (float): As for `evaluate_ffm_polynomial`.
+        coefficients (np.ndarray): FFM_COEFFICIENT_ARRAYS entry for the profile's sex.
+
+    Returns:
+        tuple: (dFFM/dF, dFFM/dt) with t in days.
+    """
+    ffm = dffm_df = dffm_dyears = 0.0
+    for k in range(coefficients.shape[0] - 1, -1, -1):
+        dffm_df = dffm_df * fat_mass + ffm
+        ffm = ffm * fat_mass + (coefficients[k, 0] + coefficients[k, 1] * years + coefficients[k, 2] * height)
+        dffm_dyears = dffm_dyears * fat_mass + coefficients[k, 1]
+    if ffm <= 0:
+        return 0.0, 0.0
+    return dffm_df, dffm_dyears / 365
+
+# The daily helpers compiled for thomas_euler_kernel. They are built from the same functions the
+# reference loop calls, so the two paths cannot drift apart.
+_compiled_adaptation = njit(cache=True)(select_metabolic_adaptation)
+_compiled_rmr = njit(cache=True)(livingston_kohlstadt_rmr)
+_compiled_dit = njit(cache=True)(calculate_dit)
+_compiled_pa = njit(cache=True)(calculate_pa)
+_compiled_spa = njit(cache=True)(calculate_spa)
+
+@njit(cache=True)
+def thomas_euler_kernel(intake, start_day, age, height_cm, ffm_coefficients, rmr_c, rmr_p, rmr_y, essential_fat_mass, essential_lean_mass, baseline_pa, baseline_weight, c, fat_mass, ffm, rmr, dit, spa, pa, values):
+    """
+    Compiled form of the daily loop in `iterate_simulation` (same helpers, same order), used when the
+    JIT backend is available. Writes one column per day into `values` in RESULT_FIELDS order.
+
+    Parameters:
+        intake (np.ndarray): Energy intake for days start_day - 1 .. start_day + N - 1 in kcal/day.
+        start_day (int): First day to simulate.
+        age, height_cm (float): Profile parameters.
+        ffm_coefficients (np.ndarray): FFM_COEFFICIENT_ARRAYS entry for the profile's sex.
+        rmr_c, rmr_p, rmr_y (float): Livingston-Kohlstadt RMR constants for the profile's sex.
+        essential_fat_mass, essential_lean_mass (float): Early-termination limits in kilograms.
+        baseline_pa, baseline_weight, c (float): Baseline PA, baseline weight and the SPA constant.
+        fat_mass, ffm, rmr, dit, spa, pa (float): State before the first day.
+        values (np.ndarray): Output array of shape (len(RESULT_FIELDS), N).
+
+    Returns:
+        tuple: (rows written, termination code (0 none, 1 fat mass, 2 lean mass),
+        fat_mass, ffm, rmr, dit, spa, pa).
+    """
+    for i in range(values.shape[1]):
+        day = start_day + i
         tee = rmr + dit + spa + pa
-        delta_energy = energy_intake - tee
+        delta_energy = intake[i] - tee
         weight_change_phase = "loss" if delta_energy < 0 else "gain"
 
-       # Calculate partial derivatives
-        part_dFFM_dF, part_dFFM_dt = calculate_partial_derivatives(fat_mass, age, day, height_cm, sex)
-        
-
-        # Solve for dF/dt
+        part_dFFM_dF, part_dFFM_dt = thomas_ffm_partials_kernel(fat_mass, age + day / 365, height_cm, ffm_coefficients)
         dF_dt = (delta_energy - CL * part_dFFM_dt) / (CL * part_dFFM_dF + CF)
-        #print(f"dF_dt: {dF_dt}")
-
-        # Calculate dFFM/dt using the relationship
         dFFM_dt_calc = part_dFFM_dF * dF_dt + part_dFFM_dt
-        #print(f"dFFM_dt: {dFFM_dt_calc}")
-
-        # Update fat mass and lean mass
-        fat_mass += delta_t * dF_dt
-        ffm += delta_t * dFFM_dt_calc
-        print(f"Day {day}:")
-        print(f"Fat Mass change: {delta_t * dF_dt * CONVERSION_FACTOR} lbs")
-        print(f"Lean Mass change: {delta_t * dFFM_dt_calc * CONVERSION_FACTOR} lbs")
-        print("-----------------")
-
-        # Check if weight loss is within healthy limits, terminate simulation if not.
-        if fat_mass < ESSENTIAL_FAT_MASS[sex]:
-            fat_mass = ESSENTIAL_FAT_MASS[sex]
-            print(f"Warning: Fat mass is below essential fat mass on day {day}. Simulation ended early.")
-            break
-        if ffm < ESSENTIAL_LEAN_MASS[sex]:
-            ffm = ESSENTIAL_LEAN_MASS[sex]
-            print(f"Warning: Lean mass is below healthy limit on day {day}. Simulation ended early.")
-            break
-
-        metabolic_adaptation = 0
-        if day >= 180:
-            if (delta_energy < -1000):  # Very Low Calorie Diet 6 months
-                metabolic_adaptation = A_METABOLIC["VLCR6"]
-            elif (delta_energy < 0): # Calorie Restriction 6 month
-                metabolic_adaptation = A_METABOLIC["CR6"]
-        elif day >= 90:
-            if (delta_energy < -1000): # Very Low Calorie Diet 3 months
-                metabolic_adaptation = A_METABOLIC["VLCR3"]
-            elif (delta_energy < 0): # Calorie Restriction 3 months
-                metabolic_adaptation = A_METABOLIC["CR3"]
-        else:
-            if (delta_energy < -1000): # Very Low Calorie Diet 0 months
-                metabolic_adaptation = A_METABOLIC["VLCR0"]
-            elif (delta_energy < 0): # Calorie Restriction 0 months
-                metabolic_adaptation = A_METABOLIC["CR0"]
-
-        # Update dependent variables
+        fat_mass += dF_dt
+        ffm += dFFM_dt_calc
+
+        if fat_mass < essential_fat_mass:
+            return i, 1, essential_fat_mass, ffm, rmr, dit, spa, pa
+        if ffm < essential_lean_mass:
+            return i, 2, fat_mass, essential_lean_mass, rmr, dit, spa, pa
+
+        metabolic_adaptation = _compiled_adaptation(day, delta_energy)
         weight_kg = fat_mass + ffm
-        rmr = calculate_rmr(weight_kg, age + day/365, sex, metabolic_adaptation)
-        dit = calculate_dit(energy_intake, weight_change_phase)
-        pa = calculate_pa(weight_kg, results[0]["pa"], results[0]["weight"])
-        spa = calculate_spa(rmr, pa, dit, weight_change_phase, c)
+        rmr = _compiled_rmr(weight_kg, age + day / 365, rmr_c, rmr_p, rmr_y, metabolic_adaptation)
+        dit = _compiled_dit(intake[i + 1], weight_change_phase)
+        pa = _compiled_pa(weight_kg, baseline_pa, baseline_weight)
+        spa = _compiled_spa(rmr, pa, dit, weight_change_phase, c)
         tee = rmr + dit + pa + spa
 
+        values[0, i] = weight_kg
+        values[1, i] = fat_mass
+        values[2, i] = ffm
+        values[3, i] = fat_mass / weight_kg
+        values[4, i] = tee
+        values[5, i] = rmr
+        values[6, i] = dit
+        values[7, i] = spa
+        values[8, i] = pa
+    return values.shape[1], 0, fat_mass, ffm, rmr, dit, spa, pa
 
-        # Store results
-        results.append({
-            "day": day,
-            "weight": weight_kg,
-            "fat_mass": fat_mass,
-            "lean_mass": ffm,
-            "body_fat_percentage": fat_mass / weight_kg,
-            "tee": tee,
-            "rmr": rmr,
-            "dit": dit,
-            "spa": spa,
-            "pa": pa
-        })
-    return results
+def continue_simulation(state, days, observer=None):
+    """
+    Extend a Thomas model forecast from a saved state. Only the new days are simulated, and the result
+    matches the corresponding rows of one longer `run_simulation` call.
+
+    Parameters:
+        state (dict): State from results.metadata["state"] of a previous run (not modified).
+        days (int): Number of additional days to simulate.
+        observer (observers.Observer): Optional per-step tracing hooks. None disables tracing.
+
+    Returns:
+        Trajectory: Results for the new days only, with the new state in metadata["state"]. Empty if the
+        previous run ended early at the essential fat or lean mass limit.
+    """
+    if state.get("model") != "thomas":
+        raise ValueError("State was not produced by the Thomas model.")
+    results = Trajectory(RESULT_FIELDS, capacity=max(days, 1))
+    if state["terminated"]:
+        results.metadata["state"] = dict(state)
+        return results
+    return iterate_simulation(
+        state["sex"], state["age"], state["fat_mass"] + state["ffm"], state["height_cm"], state["energy_intake"], days,
+        state["rmr"], state["dit"], state["spa"], state["pa"], state["c"], state["fat_mass"], state["ffm"], results,
+        start_day=state["day"] + 1, baseline_pa=state["baseline_pa"], baseline_weight=state["baseline_weight"],
+        observer=observer,
+    )
+
+def state_at_row(state, results, index):
+    """
+    Rebuild the state after a row of a run, so the run can be cut there and continued without
+    re-simulating (the rows hold every quantity that changes from day to day).
+
+    Parameters:
+        state (dict): State at the end of `results` (its metadata["state"]).
+        results (Trajectory): Rows of the run.
+        index (int): Row to cut at.
+
+    Returns:
+        dict: The state after that row.
+    """
+    if index in (-1, len(results) - 1):
+        return dict(state)
+    state = dict(state, day=results.value("day", index), terminated=False, ffm=results.value("lean_mass", index))
+    for field in ("fat_mass", "rmr", "dit", "spa", "pa"):
+        state[field] = results.value(field, index)
+    return state
+
+def run_simulation_until(sex, age, weight_kg, height_cm, energy_intake, max_days, body_fat_percentage=0, events=(), chunk_days=DEFAULT_CHUNK_DAYS, observer=None):
+    """
+    Run the Thomas model until the first of several events (target weight, body fat percentage or
+    plateau, see simulation_events) or for at most `max_days` days. Days after the event are not kept.
+
+    Parameters:
+        sex, age, weight_kg, height_cm, energy_intake, body_fat_percentage: As for `run_simulation`.
+        max_days (int): Maximum number of days to simulate.
+        events (list of dict): Event specs, e.g. [{"type": "weight", "value": 80.0}].
+        chunk_days (int): Days simulated between event checks.
+        observer (observers.Observer): Optional per-step tracing hooks.
+
+    Returns:
+        Trajectory: Results up to the first day on or after the event. metadata["event"] holds
+        {"type", "value", "day"} with the interpolated event day, or None if no event occurred.
+    """
+    results = run_simulation(sex, age, weight_kg, height_cm, energy_intake, 0, body_fat_percentage)
+    return run_until_event(continue_simulation, state_at_row, results, max_days, events, chunk_days, observer)
+
+def calculate_energy_intake_for_target_weight(duration_days, target_weight, sex, age, weight_kg, height_cm, body_fat_percentage=0, tolerance=0.01, max_iterations=20, initial_intake=None):
+    """
+    Calculate the constant daily energy intake that reaches a target weight after `duration_days`,
+    using the bracketed secant search of `intake_solver.solve_target_intake`. Final weight increases smoothly
+    with intake, so this typically takes 4-6 simulations; passing the answer of a nearby problem as
+    `initial_intake` (a warm start) usually saves one or two more.
+
+    Parameters:
+        duration_days (int): Number of days to reach the target weight.
+        target_weight (float): Desired target weight in kilograms.
+        sex (str): "male" or "female"
+        age (int): Age in years
+        weight_kg (float): Weight in kilograms
+        height_cm (float): Height in centimeters
+        body_fat_percentage (float): Initial body fat fraction (0 or None to estimate).
+        tolerance (float): Allowable weight difference in kilograms to consider the target met.
+        max_iterations (int): Maximum number of simulations to run.
+        initial_intake (float): First guess in kcal/day. Defaults to the baseline energy requirement.
+
+    Returns:
+        tuple: (results, required_energy_intake, maintenance_calories)
+            results: Simulation results for the required intake.
+            required_energy_intake: Energy intake (kcal/day) needed to reach the target weight.
+            maintenance_calories: TEE (kcal/day) on the final day, i.e. the intake that maintains the new weight.
+    """
+    def evaluate(energy_intake):
+        results = run_simulation(sex, age, weight_kg, height_cm, energy_intake, duration_days, body_fat_percentage)
+        return results, results[-1]["weight"] - target_weight
+
+    if initial_intake is None:
+        initial_intake = calculate_baseline_energy_requirements(weight_kg, age, height_cm, sex)
+    required_energy_intake, results = solve_target_intake(
+        evaluate, initial_intake, TARGET_INTAKE_BOUNDS, MIXED_TISSUE_ENERGY_DENSITY, duration_days, tolerance, max_iterations, min_bracket=1.0
+    )
+    maintenance_calories = results[-1]["tee"]
+    return results, required_energy_intake, maintenance_calories
 
 
 # Plotting Functions
@@ -469,13 +769,13 @@ def create_weight_loss_plot(results):
     Generate the weight loss plot (weight, fat mass, and lean mass) over time.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
     """
-    days = [res['day'] for res in results]
-    weights = [res['weight'] * CONVERSION_FACTOR for res in results]
-    fat_mass = [res['fat_mass'] * CONVERSION_FACTOR for res in results]
-    lean_mass = [res['lean_mass'] * CONVERSION_FACTOR for res in results]
+    days = results.column("day")
+    weights = results.column("weight", CONVERSION_FACTOR)
+    fat_mass = results.column("fat_mass", CONVERSION_FACTOR)
+    lean_mass = results.column("lean_mass", CONVERSION_FACTOR)
 
     matplotlib.use('Agg')
 
@@ -503,8 +803,8 @@ def save_weight_loss_plot(results):
     Generate the plot and save it to memory for use in Flask.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
 
     Returns:
         io.BytesIO: BytesIO object containing the saved image.
@@ -521,8 +821,8 @@ def get_weight_loss_plot_image(results):
     Create a plot and return its image data for use in Flask app.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
 
     Returns:
         bytes: Image data in PNG format.
@@ -535,8 +835,8 @@ def plot_weight_loss_display(results):
     Generate and display the weight loss plot locally.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
     """
     create_weight_loss_plot(results)  # Generate the plot
     plt.show()  # Display the plot locally
@@ -547,15 +847,15 @@ def create_energy_expenditure_plot(results):
     Generate the energy expenditure plot (TEE, RMR, DIT, SPA, PA) over time.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
     """
-    days = [res['day'] for res in results]
-    tee = [res['tee'] for res in results]
-    rmr = [res['rmr'] for res in results]
-    dit = [res['dit'] for res in results]
-    spa = [res['spa'] for res in results]
-    pa = [res['pa'] for res in results]
+    days = results.column("day")
+    tee = results.column("tee")
+    rmr = results.column("rmr")
+    dit = results.column("dit")
+    spa = results.column("spa")
+    pa = results.column("pa")
 
     matplotlib.use('Agg')
 
@@ -586,8 +886,8 @@ def save_energy_expenditure_plot(results):
     Generate the energy expenditure plot and save it to memory for use in Flask.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
 
     Returns:
         io.BytesIO: BytesIO object containing the saved image.
@@ -604,8 +904,8 @@ def get_energy_expenditure_plot_image(results):
     Create a plot and return its image data for use in Flask app.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
 
     Returns:
         bytes: Image data in PNG format.
@@ -618,8 +918,8 @@ def plot_energy_expenditure_display(results):
     Generate and display the energy expenditure plot locally.
 
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
     """
     create_energy_expenditure_plot(results)  # Generate the plot
     plt.show()  # Display the plot locally
@@ -632,8 +932,8 @@ def print_results(results):
     Print the results of the simulation in tabular format.
     
     Parameters:
-        results (list): A list of dictionaries containing the results of the simulation for
-        each day. [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
+        results (Trajectory): Results of the simulation for each day.
+        [{day, weight, fat_mass, lean_mass, tee, rmr, dit, spa, pa}]
         
     """
     print("Day\tWeight(lb)\tBody Fat (%)\tFat Mass(lb)\tLean Mass(lb)\tTEE(kcal)\tRMR(kcal)\tDIT(kcal)\tSPA(kcal)\tPA(kcal)")
@@ -0,0 +1,332 @@
+"""
+Batch (vectorized) cohort engine for the Thomas model.
+
+Runs N individuals through the same daily scheme as `thomas_model.run_simulation`, stepping the whole
+cohort together with NumPy. The string branches of the scalar loop become masks: the weight-change
+phase ("loss"/"gain") is a boolean array that selects DIT and SPA constants with np.where, and the
+metabolic adaptation constant is picked from ADAPTATION_CONSTANTS by indexing with the day period and
+the very-low-calorie mask. Early termination at ESSENTIAL_FAT_MASS / ESSENTIAL_LEAN_MASS clears an
+individual's entry in an `active` mask instead of breaking out of the loop; terminated individuals keep
+their final state and report NaN for the remaining days.
+
+The update order and every formula are identical to the scalar path, so results match
+`run_simulation` to within floating-point rounding (see BATCH_TOLERANCE).
+"""
+import numpy as np
+
+from thomas_model import (
+    CF, CL, S_LOSS, S_GAIN, BETA_LOSS, BETA_GAIN, RMR, BASELINE_SPA_FACTOR,
+    ESSENTIAL_FAT_MASS, ESSENTIAL_LEAN_MASS, ADAPTATION_CONSTANTS, RESULT_FIELDS,
+    MIXED_TISSUE_ENERGY_DENSITY, TARGET_INTAKE_BOUNDS,
+    calculate_partial_derivatives,
+)
+from fat_mass_inversion import calculate_baseline_fat_mass_exact
+
+BATCH_TOLERANCE = 1e-9  # Max relative difference versus the scalar run_simulation results
+VLCR_DEFICIT = -1000    # Energy imbalance (kcal/day) below which the very-low-calorie constants apply
+
+
+def calculate_rmr_batch(weight, age, is_male, a=0):
+    """
+    Vectorized version of `thomas_model.calculate_rmr` (Livingston-Kohlstadt formula).
+
+    Parameters:
+        weight (np.ndarray): Weight in kilograms.
+        age (np.ndarray): Age in years.
+        is_male (np.ndarray): Boolean array, True for "male".
+        a (np.ndarray): Metabolic adaptation constant.
+
+    Returns:
+        np.ndarray: Resting Metabolic Rate (RMR) in kcal/day.
+    """
+    c = np.where(is_male, RMR["male"]["c"], RMR["female"]["c"])
+    p = np.where(is_male, RMR["male"]["p"], RMR["female"]["p"])
+    y = np.where(is_male, RMR["male"]["y"], RMR["female"]["y"])
+    return np.maximum((1 - a) * c * (np.maximum(weight, 0) ** p) - y * age, 0)
+
+
+def calculate_dit_batch(energy_intake, losing):
+    """
+    Vectorized version of `thomas_model.calculate_dit`.
+
+    Parameters:
+        energy_intake (np.ndarray): Energy intake in kcal/day.
+        losing (np.ndarray): Boolean array, True in the "loss" phase.
+
+    Returns:
+        np.ndarray: Dietary-Induced Thermogenesis (DIT) in kcal/day.
+    """
+    return np.maximum(np.where(losing, BETA_LOSS, BETA_GAIN) * energy_intake, 0)
+
+
+def calculate_pa_batch(weight, baseline_pa, baseline_weight):
+    """
+    Vectorized version of `thomas_model.calculate_pa`.
+
+    Parameters:
+        weight (np.ndarray): Current weight in kilograms.
+        baseline_pa (np.ndarray): Baseline physical activity in kcal/day.
+        baseline_weight (np.ndarray): Baseline weight in kilograms.
+
+    Returns:
+        np.ndarray: Physical Activity (PA) in kcal/day.
+    """
+    return np.maximum(baseline_pa / baseline_weight * weight, 0)
+
+
+def calculate_spa_batch(rmr, pa, dit, losing, constant_c=0):
+    """
+    Vectorized version of `thomas_model.calculate_spa`.
+
+    Parameters:
+        rmr, pa, dit (np.ndarray): Energy terms in kcal/day.
+        losing (np.ndarray): Boolean array, True in the "loss" phase.
+        constant_c (np.ndarray): Constant from `thomas_model.calculate_constant_c`.
+
+    Returns:
+        np.ndarray: Spontaneous Physical Activity (SPA) in kcal/day.
+    """
+    s = np.where(losing, S_LOSS, S_GAIN)
+    return np.maximum((s / (1 - s)) * (dit + pa + rmr) + constant_c, 0)
+
+
+def calculate_baseline_fat_mass_batch(weight_kg, age, height_cm, is_male, method="regression"):
+    """
+    Vectorized version of `thomas_model.calculate_baseline_fat_mass`.
+
+    Parameters:
+        weight_kg (np.ndarray): Weight in kilograms.
+        age (np.ndarray): Age in years.
+        height_cm (np.ndarray): Height in centimeters.
+        is_male (np.ndarray): Boolean array, True for "male".
+        method (str): "regression" or "exact" (table lookup, regression where there is no valid root).
+
+    Returns:
+        np.ndarray: Baseline fat mass in kilograms.
+    """
+    male = 24.96493 + 0.064761 * age - 0.28889 * height_cm + 0.55342 * weight_kg
+    female = 18.19812 + 0.043109 * age - 0.23014 * height_cm + 0.641413 * weight_kg
+    fat_mass = np.maximum(np.where(is_male, male, female), 0)
+    if method == "exact":
+        exact = calculate_baseline_fat_mass_exact(weight_kg, age, height_cm, np.where(is_male, "male", "female"))
+        fat_mass = np.where(np.isnan(exact), fat_mass, exact)
+    elif method != "regression":
+        raise ValueError("Method must be 'regression' or 'exact'.")
+    return fat_mass
+
+
+def calculate_baseline_energy_requirements_batch(weight_kg, is_male):
+    """
+    Vectorized version of `thomas_model.calculate_baseline_energy_requirements`.
+
+    Parameters:
+        weight_kg (np.ndarray): Weight in kilograms.
+        is_male (np.ndarray): Boolean array, True for "male".
+
+    Returns:
+        np.ndarray: Baseline energy requirements in kcal/day.
+    """
+    male = -0.0971 * weight_kg**2 + 40.853 * weight_kg + 323.59
+    female = 0.0278 * weight_kg**2 + 9.2893 * weight_kg + 1528.9
+    return np.where(is_male, male, female)
+
+
+def run_simulation_batch(sex, age, weight_kg, height_cm, energy_intake, duration_days, body_fat_percentage=0, fields=RESULT_FIELDS, fat_mass_method="regression"):
+    """
+    Run the Thomas model for a cohort of individuals at once.
+
+    Every profile argument may be a scalar or an array; all of them are broadcast to a common shape (N,).
+
+    Parameters:
+        sex (array of str): "male" or "female" per individual.
+        age (array of float): Age in years.
+        weight_kg (array of float): Weight in kilograms.
+        height_cm (array of float): Height in centimeters.
+        energy_intake (array of float): Energy intake in kcal/day per individual, or an (N, duration_days + 1)
+            array of daily intakes (the step into day d uses the intake of day d - 1).
+        duration_days (int): Duration of the simulation in days (shared by all individuals).
+        body_fat_percentage (array of float): Initial body fat fraction; NaN or <= 0 means estimate.
+        fields (iterable of str): Fields to record; recording fewer fields saves memory on large cohorts.
+        fat_mass_method (str): Baseline fat mass estimate when no body fat is given ("regression" or "exact").
+
+    Returns:
+        dict: Struct-of-arrays results. "day" is a 1-D array of days 0 .. duration_days; every field in
+        `fields` is a 2-D array of shape (N, len(day)) in the same units as the scalar path, NaN after an
+        individual's early termination. "days_simulated" (N,) is the last valid day of each individual
+        and "terminated" (N,) flags runs that ended at the essential fat or lean mass.
+    """
+    sex = np.atleast_1d(np.asarray(sex))
+    intake = np.asarray(energy_intake, dtype=float)
+    scheduled = intake.ndim == 2
+    if scheduled and intake.shape[1] < duration_days + 1:
+        raise ValueError("Daily intake arrays need duration_days + 1 columns.")
+    is_male, age, weight_kg, height_cm, body_fat_percentage, initial_intake = np.broadcast_arrays(
+        sex == "male", *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (age, weight_kg, height_cm, body_fat_percentage, intake[:, 0] if scheduled else intake))
+    )
+    n = is_male.shape[0]
+    sex = np.where(is_male, "male", "female")
+    intake = np.broadcast_to(intake, (n, intake.shape[1])) if scheduled else initial_intake
+
+    def intake_on(day):
+        return intake[:, day] if scheduled else intake
+
+    # Baseline (day 0), as in run_simulation
+    baseline_energy = calculate_baseline_energy_requirements_batch(weight_kg, is_male)
+    losing = intake_on(0) < baseline_energy
+    measured = (body_fat_percentage > 0) & ~np.isnan(body_fat_percentage)
+    fat_mass = np.where(measured, weight_kg * np.where(measured, body_fat_percentage, 0), calculate_baseline_fat_mass_batch(weight_kg, age, height_cm, is_male, fat_mass_method))
+    ffm = weight_kg - fat_mass
+    rmr = calculate_rmr_batch(weight_kg, age, is_male)
+    dit = calculate_dit_batch(intake_on(0), losing)
+    spa0 = BASELINE_SPA_FACTOR * baseline_energy
+    pa = np.maximum(baseline_energy - dit - spa0 - rmr, 0)
+    s = np.where(losing, S_LOSS, S_GAIN)
+    c = BASELINE_SPA_FACTOR * baseline_energy - (s / (1 - s)) * (dit + pa + rmr)
+    spa = calculate_spa_batch(rmr, pa, dit, losing, c)
+    tee = rmr + dit + spa + pa
+    baseline_pa = pa
+    essential_fat_mass = np.where(is_male, ESSENTIAL_FAT_MASS["male"], ESSENTIAL_FAT_MASS["female"])
+    essential_lean_mass = np.where(is_male, ESSENTIAL_LEAN_MASS["male"], ESSENTIAL_LEAN_MASS["female"])
+
+    # Day-major buffers so each day's write is contiguous; transposed on return
+    out = {field: np.full((duration_days + 1, n), np.nan) for field in fields}
+
+    def store(day, active, weight):
+        row = {
+            "weight": weight, "fat_mass": fat_mass, "lean_mass": ffm, "body_fat_percentage": fat_mass / weight,
+            "tee": tee, "rmr": rmr, "dit": dit, "spa": spa, "pa": pa,
+        }
+        for field, values in out.items():
+            values[day] = np.where(active, row[field], np.nan)
+
+    active = np.ones(n, dtype=bool)
+    days_simulated = np.zeros(n, dtype=int)
+    store(0, active, weight_kg)
+
+    for day in range(1, duration_days + 1):
+        if not active.any():
+            break
+        tee = rmr + dit + spa + pa
+        delta_energy = intake_on(day - 1) - tee
+        losing = delta_energy < 0
+
+        part_dFFM_dF, part_dFFM_dt = calculate_partial_derivatives(fat_mass, age, day, height_cm, sex)
+        dF_dt = (delta_energy - CL * part_dFFM_dt) / (CL * part_dFFM_dF + CF)
+        dFFM_dt = part_dFFM_dF * dF_dt + part_dFFM_dt
+        new_fat_mass = fat_mass + dF_dt
+        new_ffm = ffm + dFFM_dt
+
+        # Early termination: the fat mass limit is checked first, as in the scalar loop
+        fat_floor = active & (new_fat_mass < essential_fat_mass)
+        lean_floor = active & ~fat_floor & (new_ffm < essential_lean_mass)
+        fat_mass = np.where(fat_floor, essential_fat_mass, np.where(active, new_fat_mass, fat_mass))
+        ffm = np.where(lean_floor, essential_lean_mass, np.where(active & ~fat_floor, new_ffm, ffm))
+        active = active & ~fat_floor & ~lean_floor
+
+        # Metabolic adaptation: period 0/1/2 for days < 90, < 180 and later; VLCR constants follow CR ones
+        period = 2 if day >= 180 else (1 if day >= 90 else 0)
+        adaptation = np.where(delta_energy < VLCR_DEFICIT, ADAPTATION_CONSTANTS[3 + period], ADAPTATION_CONSTANTS[period])
+        adaptation = np.where(delta_energy < 0, adaptation, 0.0)
+
+        weight = fat_mass + ffm
+        new_rmr = calculate_rmr_batch(weight, age + day / 365, is_male, adaptation)
+        new_dit = calculate_dit_batch(intake_on(day), losing)
+        new_pa = calculate_pa_batch(weight, baseline_pa, weight_kg)
+        new_spa = calculate_spa_batch(new_rmr, new_pa, new_dit, losing, c)
+        rmr, dit, pa, spa = (np.where(active, new, old) for new, old in ((new_rmr, rmr), (new_dit, dit), (new_pa, pa), (new_spa, spa)))
+        tee = rmr + dit + pa + spa
+
+        days_simulated[active] = day
+        store(day, active, weight)
+
+    results = {field: values.T for field, values in out.items()}
+    results["day"] = np.arange(duration_days + 1)
+    results["days_simulated"] = days_simulated
+    results["terminated"] = days_simulated < duration_days
+    return results
+
+
+def calculate_energy_intake_for_target_weight_batch(duration_days, target_weight, sex, age, weight_kg, height_cm, body_fat_percentage=0, tolerance=0.01, max_iterations=20, initial_intake=None):
+    """
+    Vectorized form of `thomas_model.calculate_energy_intake_for_target_weight`: solves the target-weight
+    problem for many individuals at once. Every individual runs the same bracketed secant iteration,
+    and each round simulates only the individuals that have not yet converged, in one cohort run.
+
+    Parameters:
+        duration_days (int): Number of days to reach the target weight (shared by all individuals).
+        target_weight (array of float): Desired target weight in kilograms.
+        sex, age, weight_kg, height_cm, body_fat_percentage: As for `run_simulation_batch`.
+        tolerance (float): Allowable weight difference in kilograms to consider the target met.
+        max_iterations (int): Maximum number of cohort simulations.
+        initial_intake (array of float): First guesses (warm start) in kcal/day. Defaults to the baseline
+            energy requirement.
+
+    Returns:
+        dict: Arrays of shape (N,): "energy_intake" (kcal/day), "maintenance_calories" (TEE on the final
+        day, kcal/day), "final_weight" (kg), "converged" (final weight within tolerance) and
+        "iterations" (simulations each individual needed).
+    """
+    sex = np.atleast_1d(np.asarray(sex))
+    is_male, target_weight, age, weight_kg, height_cm, body_fat_percentage = np.broadcast_arrays(
+        sex == "male", *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (target_weight, age, weight_kg, height_cm, body_fat_percentage))
+    )
+    sex = np.where(is_male, "male", "female")
+    n = is_male.shape[0]
+    low_ei = np.full(n, TARGET_INTAKE_BOUNDS[0])
+    high_ei = np.full(n, TARGET_INTAKE_BOUNDS[1])
+    if initial_intake is None:
+        initial_intake = calculate_baseline_energy_requirements_batch(weight_kg, is_male)
+    ei = np.clip(np.broadcast_to(np.asarray(initial_intake, dtype=float), (n,)), low_ei, high_ei)
+
+    best_error = np.full(n, np.inf)
+    best_ei = ei.copy()
+    best_weight = np.full(n, np.nan)
+    best_tee = np.full(n, np.nan)
+    ei_prev = np.full(n, np.nan)
+    error_prev = np.full(n, np.nan)
+    iterations = np.zeros(n, dtype=int)
+    pending = np.ones(n, dtype=bool)
+
+    for iteration in range(max_iterations):
+        index = np.flatnonzero(pending)
+        if index.size == 0:
+            break
+        results = run_simulation_batch(
+            sex[index], age[index], weight_kg[index], height_cm[index], ei[index], duration_days, body_fat_percentage[index],
+            fields=("weight", "tee"),
+        )
+        last = results["days_simulated"][:, None]
+        final_weight = np.take_along_axis(results["weight"], last, axis=1)[:, 0]
+        final_tee = np.take_along_axis(results["tee"], last, axis=1)[:, 0]
+        error = final_weight - target_weight[index]
+        iterations[index] += 1
+
+        improved = np.abs(error) < best_error[index]
+        for values, new in ((best_error, np.abs(error)), (best_ei, ei[index]), (best_weight, final_weight), (best_tee, final_tee)):
+            values[index[improved]] = new[improved]
+
+        # Final weight increases with intake, so the sign of the error tightens the bracket
+        high_ei[index] = np.where(error > 0, ei[index], high_ei[index])
+        low_ei[index] = np.where(error > 0, low_ei[index], ei[index])
+
+        if iteration == 0:
+            # Second guess: spread the required energy change over the duration
+            ei_next = ei[index] - error * MIXED_TISSUE_ENERGY_DENSITY / max(duration_days, 1)
+        else:
+            # Secant step; a flat response falls back to bisection
+            slope_defined = error != error_prev[index]
+            secant = ei[index] - error * (ei[index] - ei_prev[index]) / np.where(slope_defined, error - error_prev[index], 1.0)
+            ei_next = np.where(slope_defined, secant, (low_ei[index] + high_ei[index]) / 2.0)
+        outside = ~((low_ei[index] < ei_next) & (ei_next < high_ei[index]))
+        ei_next = np.where(outside, (low_ei[index] + high_ei[index]) / 2.0, ei_next)
+        ei_prev[index], error_prev[index], ei[index] = ei[index], error, ei_next
+
+        pending[index] = (best_error[index] > tolerance) & (high_ei[index] - low_ei[index] > 1.0)
+
+    return {
+        "energy_intake": best_ei,
+        "maintenance_calories": best_tee,
+        "final_weight": best_weight,
+        "converged": best_error <= tolerance,
+        "iterations": iterations,
+    }
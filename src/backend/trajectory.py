@@ -0,0 +1,239 @@
+"""
+Columnar trajectory container for simulation results.
+
+Both models used to return a list with one dictionary per simulated day. A Trajectory stores the same
+data as one NumPy array per field (plus an integer day column), so a multi-year horizon costs a few
+bytes per field per day instead of a dictionary of boxed floats per day.
+
+Columns are available directly (`trajectory["weight"]`), and rows are exposed as lightweight
+read-only mappings (`trajectory[-1]["weight"]`, `for row in trajectory: ...`; slices such as
+`trajectory[:30]` return a new Trajectory) so code written against the old list-of-dicts results
+keeps working. Unit conversions are applied lazily on read: a field can be stored in model units
+(e.g. MJ/day) with a per-field scale (e.g. MJ -> kcal), and callers can ask for a column in other
+units (e.g. kg -> lbs) without the stored data being touched.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class TrajectoryRow(Mapping):
+    """
+    Read-only view of one simulated day in a Trajectory. Behaves like the dictionaries the models used
+    to return: row["weight"], row.get("tee"), dict(row).
+    """
+    __slots__ = ("_trajectory", "_index")
+
+    def __init__(self, trajectory, index):
+        self._trajectory = trajectory
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._trajectory.value(key, self._index)
+
+    def __iter__(self):
+        return iter(self._trajectory.keys())
+
+    def __len__(self):
+        return len(self._trajectory.fields) + 1
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Trajectory:
+    """
+    Growable struct-of-arrays container for daily simulation results.
+
+    Parameters:
+        fields (iterable of str): Names of the float fields stored per day (the "day" column is implicit).
+        scales (dict): Optional multiplier applied on read for each field, e.g. {"tee": MJ_TO_KCAL}.
+        capacity (int): Initial number of days to allocate. Storage doubles when full.
+    """
+
+    def __init__(self, fields, scales=None, capacity=64):
+        self.fields = tuple(fields)
+        self.scales = dict(scales or {})
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        capacity = max(int(capacity), 1)
+        self._day = np.empty(capacity, dtype=np.int32)
+        self._data = np.empty((len(self.fields), capacity))
+        self._length = 0
+        self.metadata = {}  # Free-form run information (e.g. integrator step counts)
+
+    @classmethod
+    def from_columns(cls, day, columns, scales=None):
+        """
+        Build a Trajectory from existing column arrays.
+
+        Parameters:
+            day (array of int): Simulated day for each row.
+            columns (dict): Field name -> 1-D array of values (same length as day), in stored units.
+            scales (dict): Optional multiplier applied on read for each field.
+
+        Returns:
+            Trajectory: Trajectory holding a copy of the columns.
+        """
+        day = np.asarray(day)
+        trajectory = cls(columns.keys(), scales, capacity=len(day))
+        trajectory._day[:len(day)] = day
+        for i, values in enumerate(columns.values()):
+            trajectory._data[i, :len(day)] = values
+        trajectory._length = len(day)
+        return trajectory
+
+    def _grow(self, capacity):
+        day = np.empty(capacity, dtype=np.int32)
+        day[:self._length] = self._day[:self._length]
+        data = np.empty((len(self.fields), capacity))
+        data[:, :self._length] = self._data[:, :self._length]
+        self._day, self._data = day, data
+
+    def append_values(self, day, *values):
+        """
+        Append one day of results given positionally in `fields` order (fast path used by the models).
+
+        Parameters:
+            day (int): Simulated day.
+            *values (float): One value per field, in stored units.
+        """
+        n = self._length
+        if n == self._day.shape[0]:
+            self._grow(2 * n)
+        self._day[n] = day
+        self._data[:, n] = values
+        self._length = n + 1
+
+    def extend_values(self, days, values):
+        """
+        Append many days at once (used by the compiled kernels).
+
+        Parameters:
+            days (array of int): Simulated day for each new row.
+            values (np.ndarray): Array of shape (len(fields), len(days)) in stored units.
+        """
+        n, count = self._length, len(days)
+        if n + count > self._day.shape[0]:
+            self._grow(max(2 * self._day.shape[0], n + count))
+        self._day[n:n + count] = days
+        self._data[:, n:n + count] = values
+        self._length = n + count
+
+    def extend(self, other):
+        """
+        Append every row of another Trajectory with the same fields (e.g. a continued forecast).
+
+        Parameters:
+            other (Trajectory): Rows to append, in the same stored units.
+        """
+        if other.fields != self.fields:
+            raise ValueError("Trajectories have different fields.")
+        self.extend_values(other._day[:len(other)], other._data[:, :len(other)])
+
+    def append(self, row):
+        """
+        Append one day of results from a mapping, like list.append on the old results list.
+
+        Parameters:
+            row (dict): {"day": int, field: value, ...} with values in stored units.
+        """
+        self.append_values(row["day"], *(row[field] for field in self.fields))
+
+    def truncate(self, length):
+        """
+        Drop every row after the first `length` rows.
+
+        Parameters:
+            length (int): Number of rows to keep.
+        """
+        self._length = max(0, min(int(length), self._length))
+
+    def keys(self):
+        """
+        Returns:
+            tuple: Column names, starting with "day".
+        """
+        return ("day",) + self.fields
+
+    def column(self, name, factor=1.0):
+        """
+        Return a column, converted lazily by the field's stored scale times `factor`.
+
+        Parameters:
+            name (str): Column name ("day" or one of `fields`).
+            factor (float): Extra unit conversion, e.g. CONVERSION_FACTOR for kg -> lbs.
+
+        Returns:
+            np.ndarray: A read-only view when no conversion is needed, otherwise a new array.
+        """
+        if name == "day":
+            values = self._day[:self._length]
+        else:
+            values = self._data[self._field_index[name], :self._length]
+            factor = factor * self.scales.get(name, 1.0)
+        if factor != 1.0:
+            return values * factor
+        values = values.view()
+        values.flags.writeable = False
+        return values
+
+    def value(self, name, index, scaled=True):
+        """
+        Return a single value as a Python number, with the field's scale applied.
+
+        Parameters:
+            name (str): Column name.
+            index (int): Row index (negative indices count from the end).
+            scaled (bool): False returns the value in stored units (e.g. to rebuild a model state).
+
+        Returns:
+            int or float: The value at that row.
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Trajectory index out of range.")
+        if name == "day":
+            return int(self._day[index])
+        value = float(self._data[self._field_index[name], index])
+        return value * self.scales.get(name, 1.0) if scaled else value
+
+    def to_records(self):
+        """
+        Convert to the legacy list-of-dicts format (e.g. for JSON responses).
+
+        Returns:
+            list: [{day, field: value, ...}] with scales applied.
+        """
+        columns = [self.column(name).tolist() for name in self.keys()]
+        return [dict(zip(self.keys(), values)) for values in zip(*columns)]
+
+    @property
+    def nbytes(self):
+        """
+        Returns:
+            int: Bytes used by the stored rows.
+        """
+        return self._length * (self._day.itemsize + len(self.fields) * self._data.itemsize)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, slice):
+            # Like slicing the old results list: a new Trajectory with copies of the selected rows (and no
+            # metadata, since the run state describes the end of the full trajectory)
+            return self.from_columns(self._day[:self._length][key], dict(zip(self.fields, self._data[:, :self._length][:, key])), self.scales)
+        index = key + self._length if key < 0 else key
+        if not 0 <= index < self._length:
+            raise IndexError("Trajectory index out of range.")
+        return TrajectoryRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield TrajectoryRow(self, index)
+
+    def __repr__(self):
+        return f"Trajectory(days={self._length}, fields={self.fields})"
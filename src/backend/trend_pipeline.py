@@ -0,0 +1,255 @@
+"""
+Multi-user trend computation over packed (CSR-style) arrays.
+
+Trend work used to run per user, through Python dicts (and, in the app, through
+`TrendMeasurementCollection` in Swift). `PackedSeries` instead holds every user's series in three flat
+arrays:
+
+    days     (M,)      measurement days, sorted within each user
+    values   (M,)      measurements (e.g. daily weights from weight_resampling.resample_daily)
+    offsets  (N + 1,)  user i owns days[offsets[i]:offsets[i + 1]]
+
+and the functions below compute the trend statistics of all users at once with segmented NumPy
+operations (prefix sums, bincount, searchsorted), so a nightly recomputation is one vectorized job
+instead of one Python call per user. They follow the app's definitions:
+
+    moving_average      TrendMeasurementCollection.calculateMovingAverage (trailing, over measurements)
+    detect_anomalies    TrendMeasurementCollection.detectAnomalies (percentage change from the previous one)
+    rate_of_change      slope of TrendMeasurementCollection.forecastLinearTrend (kg/day)
+    trend_average       TrendCalculator.calculateTrend (mean of the measurements within windowSize days),
+                        evaluated at the measurement days
+
+moving_average and detect_anomalies are rolling_statistics.rolling_mean and rolling_anomalies with the
+app's parameters. NaN measurements (gap days) are skipped throughout.
+"""
+import numpy as np
+
+from rolling_statistics import DEFAULT_ANOMALY_THRESHOLD, rolling_anomalies, rolling_mean
+
+DEFAULT_WINDOW_SIZE = 7              # Measurements (moving_average) or days (trend_average)
+
+
+class PackedSeries:
+    """
+    Every user's measurement series packed into flat arrays (see module docstring).
+
+    Parameters:
+        days (np.ndarray): Measurement days, sorted within each user.
+        values (np.ndarray): Measurements, aligned with days.
+        offsets (np.ndarray): Start of each user's series, plus the total length at the end.
+    """
+
+    def __init__(self, days, values, offsets):
+        self.days = np.asarray(days, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if self.days.shape != self.values.shape or self.offsets[0] != 0 or self.offsets[-1] != len(self.values) or (np.diff(self.offsets) < 0).any():
+            raise ValueError("days, values and offsets do not describe a packed series.")
+        if (np.diff(self.days)[~self.starts_mask()[1:]] < 0).any():
+            raise ValueError("Days must be sorted within each user.")
+
+    @classmethod
+    def from_series(cls, series):
+        """
+        Pack a list of (days, values) pairs, one per user.
+        """
+        lengths = [len(days) for days, _ in series]
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        days = np.concatenate([np.asarray(days, dtype=float) for days, _ in series]) if series else np.zeros(0)
+        values = np.concatenate([np.asarray(values, dtype=float) for _, values in series]) if series else np.zeros(0)
+        return cls(days, values, offsets)
+
+    @classmethod
+    def from_rows(cls, user_index, days, values, n_users=None):
+        """
+        Pack unordered (user, day, value) rows, e.g. straight from a database query.
+
+        Parameters:
+            user_index (np.ndarray): User number of each row, 0 .. n_users - 1.
+            days, values (np.ndarray): Day and value of each row.
+            n_users (int): Number of users (default: max(user_index) + 1); users without rows get
+                empty series.
+        """
+        user_index = np.asarray(user_index, dtype=np.int64)  # An empty list would otherwise be float
+        days, values = np.asarray(days), np.asarray(values)
+        sort = np.argsort(days, kind="stable")
+        sort = sort[np.argsort(user_index[sort], kind="stable")]
+        n_users = int(user_index.max(initial=-1)) + 1 if n_users is None else n_users
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(user_index, minlength=n_users), dtype=np.int64)))
+        return cls(days[sort], values[sort], offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def user_index(self):
+        """
+        Returns:
+            np.ndarray: The user of every element.
+        """
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def position(self):
+        """
+        Returns:
+            np.ndarray: The index of every element within its user's series.
+        """
+        return np.arange(len(self.values)) - np.repeat(self.offsets[:-1], self.lengths())
+
+    def starts_mask(self):
+        """
+        Returns:
+            np.ndarray: True for the first element of each user's series.
+        """
+        mask = np.zeros(len(self.values), dtype=bool)
+        mask[self.offsets[:-1][self.lengths() > 0]] = True
+        return mask
+
+    def series(self, user):
+        """
+        Returns:
+            tuple: (days, values) of one user.
+        """
+        start, stop = self.offsets[user], self.offsets[user + 1]
+        return self.days[start:stop], self.values[start:stop]
+
+
+def segment_sums(packed, x):
+    """
+    Sum an element-aligned array per user.
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+        x (np.ndarray): Values aligned with packed.values.
+
+    Returns:
+        np.ndarray: One sum per user (0 for empty series).
+    """
+    return np.bincount(packed.user_index(), weights=x, minlength=len(packed))
+
+
+def _centered(packed):
+    """
+    Values relative to each user's mean, so global prefix sums stay small and exact enough. Missing
+    (NaN) values, e.g. gap days from resample_daily, become 0 and are left out of the finite mask.
+
+    Returns:
+        tuple: (centered values, finite mask, per-element user mean).
+    """
+    finite = np.isfinite(packed.values)
+    users = packed.user_index()[finite]
+    counts = np.bincount(users, minlength=len(packed))
+    sums = np.bincount(users, weights=packed.values[finite], minlength=len(packed))
+    mean = np.repeat(np.divide(sums, counts, out=np.zeros(len(packed)), where=counts > 0), packed.lengths())
+    return np.where(finite, packed.values - mean, 0.0), finite, mean
+
+
+def _window_means(centered, finite, mean, start, stop):
+    # Mean of the finite values in [start, stop) of every element's window, NaN if there are none
+    prefix = np.concatenate(([0.0], np.cumsum(centered)))
+    finite_prefix = np.concatenate(([0], np.cumsum(finite)))
+    count = finite_prefix[stop] - finite_prefix[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, (prefix[stop] - prefix[start]) / count + mean, np.nan)
+
+
+def moving_average(packed, window_size=DEFAULT_WINDOW_SIZE):
+    """
+    Trailing moving average over the last window_size measurements of each user. NaN measurements are
+    skipped.
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+        window_size (int): Number of measurements averaged.
+
+    Returns:
+        np.ndarray: Aligned with packed.values; NaN for the first window_size - 1 measurements of each user
+        and where the window holds only NaN.
+    """
+    average = rolling_mean(packed, window_size, min_periods=1)
+    average[packed.position() < window_size - 1] = np.nan
+    return average
+
+
+def detect_anomalies(packed, threshold_percentage=DEFAULT_ANOMALY_THRESHOLD):
+    """
+    Flag measurements that changed by at least threshold_percentage percent from the user's previous one.
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+        threshold_percentage (float): Threshold in percent.
+
+    Returns:
+        np.ndarray: Boolean mask aligned with packed.values (never set for a user's first measurement, a
+        NaN measurement or the one after it).
+    """
+    return rolling_anomalies(packed, threshold_percentage)
+
+
+def rate_of_change(packed):
+    """
+    Least-squares slope of value against day for each user, over the non-NaN measurements.
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+
+    Returns:
+        np.ndarray: Slope per user in value units per day; NaN for users with fewer than two distinct days
+        with measurements.
+    """
+    centered, finite, _ = _centered(packed)
+    users, days, values = packed.user_index()[finite], packed.days[finite], centered[finite]
+    counts = np.maximum(np.bincount(users, minlength=len(packed)), 1)
+    day_offset = days - (np.bincount(users, weights=days, minlength=len(packed)) / counts)[users]
+    value_offset = values - (np.bincount(users, weights=values, minlength=len(packed)) / counts)[users]
+    numerator = np.bincount(users, weights=day_offset * value_offset, minlength=len(packed))
+    denominator = np.bincount(users, weights=day_offset * day_offset, minlength=len(packed))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def trend_average(packed, window_days=DEFAULT_WINDOW_SIZE):
+    """
+    Average of each user's non-NaN measurements less than window_days days away, at every measurement
+    day (including the days of NaN measurements, which this fills in).
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+        window_days (float): Half-width of the window in days (exclusive).
+
+    Returns:
+        np.ndarray: Aligned with packed.values; NaN where the window holds only NaN.
+    """
+    if len(packed.values) == 0:
+        return np.zeros(0)
+    # Sort key that keeps users apart: user * span + day, with span wider than any window
+    low = packed.days.min()
+    span = packed.days.max() - low + 2 * window_days + 1
+    key = packed.user_index() * span + (packed.days - low)
+    # Both window bounds are exclusive, as in TrendCalculator
+    start = np.searchsorted(key, key - window_days, side="right")
+    stop = np.searchsorted(key, key + window_days, side="left")
+    return _window_means(*_centered(packed), start, stop)
+
+
+def compute_trends(packed, window_size=DEFAULT_WINDOW_SIZE, window_days=DEFAULT_WINDOW_SIZE, threshold_percentage=DEFAULT_ANOMALY_THRESHOLD):
+    """
+    Compute every trend statistic for all users.
+
+    Parameters:
+        packed (PackedSeries): Packed series.
+        window_size (int): Measurements in the trailing moving average.
+        window_days (float): Half-width in days of the trend average.
+        threshold_percentage (float): Anomaly threshold in percent.
+
+    Returns:
+        dict: "moving_average", "trend" and "anomaly" aligned with packed.values, and "rate" per user.
+    """
+    return {
+        "moving_average": moving_average(packed, window_size),
+        "trend": trend_average(packed, window_days),
+        "anomaly": detect_anomalies(packed, threshold_percentage),
+        "rate": rate_of_change(packed),
+    }
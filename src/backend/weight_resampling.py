@@ -0,0 +1,156 @@
+"""
+Resampling of raw weigh-ins onto a daily grid.
+
+The smoothing and intake functions assume one weight per day. Raw data (e.g. HealthKit exports) has
+missed days, several weigh-ins on one day and long gaps. `resample_daily` turns (timestamp, value)
+arrays into one value per calendar day, fully vectorized (one sort plus reductions over day groups),
+so millions of rows can be processed in one call:
+
+    - Weigh-ins are assigned to local calendar days (utc_offset_hours) and aggregated per day with
+      one of AGGREGATIONS. Non-finite values are dropped.
+    - Missing days in gaps of at most max_gap_days are filled by linear interpolation (optional).
+      Days in longer gaps stay NaN and are flagged in the "gap" mask; `contiguous_segments` lists the
+      runs between them, which can be smoothed independently.
+"""
+import numpy as np
+
+AGGREGATIONS = ("min", "median", "last", "first", "mean", "max")
+DEFAULT_AGGREGATION = "median"
+DEFAULT_MAX_GAP_DAYS = 7
+SECONDS_PER_DAY = 86400
+EPOCH = np.datetime64("1970-01-01T00:00:00", "s")
+
+
+def timestamps_to_days(timestamps, utc_offset_hours=0):
+    """
+    Convert timestamps to local day numbers (days since 1970-01-01).
+
+    Parameters:
+        timestamps (np.ndarray): datetime64 values (UTC) or Unix times in seconds.
+        utc_offset_hours (float): Offset of local time from UTC; days start at local midnight.
+
+    Returns:
+        np.ndarray: int64 day numbers.
+    """
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        seconds = (timestamps - EPOCH) / np.timedelta64(1, "s")
+    else:
+        seconds = timestamps.astype(float)
+    return np.floor((seconds + utc_offset_hours * 3600) / SECONDS_PER_DAY).astype(np.int64)
+
+
+def aggregate_by_day(days, values, aggregation=DEFAULT_AGGREGATION, order=None):
+    """
+    Aggregate values per day.
+
+    Parameters:
+        days (np.ndarray): Day number of every value.
+        values (np.ndarray): Values.
+        aggregation (str): One of AGGREGATIONS. "first" and "last" follow `order`.
+        order (np.ndarray): Sort key within a day for "first"/"last" (e.g. the timestamps); defaults to
+            the input order.
+
+    Returns:
+        tuple: (unique days in increasing order, aggregated value per day, number of values per day).
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {aggregation}")
+    days, values = np.asarray(days), np.asarray(values, dtype=float)
+    # Sort by day, then by value (median) or order (first/last): sort by the secondary key, then
+    # stably by day, which is much faster than np.lexsort on large inputs
+    if aggregation == "median":
+        sort = np.argsort(values)
+    elif order is not None:
+        sort = np.argsort(order, kind="stable")  # Timestamps are usually sorted already
+    else:
+        sort = np.arange(days.size)
+    sort = sort[np.argsort(days[sort], kind="stable")]
+    days, values = days[sort], values[sort]
+    if days.size == 0:
+        return days, values, np.zeros(0, dtype=np.int64)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+    counts = np.diff(np.append(starts, days.size))
+    if aggregation == "min":
+        aggregated = np.minimum.reduceat(values, starts)
+    elif aggregation == "max":
+        aggregated = np.maximum.reduceat(values, starts)
+    elif aggregation == "mean":
+        aggregated = np.add.reduceat(values, starts) / counts
+    elif aggregation == "first":
+        aggregated = values[starts]
+    elif aggregation == "last":
+        aggregated = values[starts + counts - 1]
+    else:
+        aggregated = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+    return days[starts], aggregated, counts
+
+
+def contiguous_segments(mask):
+    """
+    Find the runs of True in a boolean mask.
+
+    Parameters:
+        mask (np.ndarray): Boolean mask.
+
+    Returns:
+        list: (start, stop) index pairs, one per run, stop exclusive.
+    """
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+def resample_daily(timestamps, values, aggregation=DEFAULT_AGGREGATION, max_gap_days=DEFAULT_MAX_GAP_DAYS,
+                   interpolate=True, utc_offset_hours=0):
+    """
+    Resample irregular weigh-ins onto a daily grid from the first to the last day with data.
+
+    Parameters:
+        timestamps (np.ndarray): datetime64 values (UTC) or Unix times in seconds.
+        values (np.ndarray): Weights (or any other measurement).
+        aggregation (str): How several values on one day are combined, one of AGGREGATIONS.
+        max_gap_days (int): Longest run of missing days that is still interpolated.
+        interpolate (bool): Fill missing days in short gaps by linear interpolation.
+        utc_offset_hours (float): Offset of local time from UTC, for assigning weigh-ins to days.
+
+    Returns:
+        dict: Arrays with one entry per day:
+            "date" (datetime64[D]), "day" (days since 1970-01-01), "value" (NaN where missing),
+            "count" (weigh-ins that day), "observed" (count > 0) and "gap" (inside a run of more than
+            max_gap_days missing days).
+    """
+    timestamps, values = np.asarray(timestamps), np.asarray(values, dtype=float)
+    if timestamps.shape != values.shape:
+        raise ValueError("timestamps and values must have the same shape.")
+    finite = np.isfinite(values)
+    days = timestamps_to_days(timestamps[finite], utc_offset_hours)
+    order = timestamps[finite] if aggregation in ("first", "last") else None
+    observed_days, aggregated, counts = aggregate_by_day(days, values[finite], aggregation, order)
+    if observed_days.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {"date": empty.astype("datetime64[D]"), "day": empty, "value": np.zeros(0), "count": empty,
+                "observed": np.zeros(0, dtype=bool), "gap": np.zeros(0, dtype=bool)}
+
+    grid = np.arange(observed_days[0], observed_days[-1] + 1)
+    index = observed_days - grid[0]
+    count = np.zeros(grid.size, dtype=np.int64)
+    count[index] = counts
+    observed = count > 0
+
+    # Mark the days between two weigh-ins more than max_gap_days apart
+    missing = np.diff(index) - 1
+    long_gaps = np.flatnonzero(missing > max_gap_days)
+    marks = np.zeros(grid.size + 1, dtype=np.int64)
+    np.add.at(marks, index[long_gaps] + 1, 1)
+    np.add.at(marks, index[long_gaps + 1], -1)
+    gap = np.cumsum(marks[:-1]) > 0
+
+    if interpolate:
+        value = np.interp(grid, observed_days, aggregated)
+        value[gap] = np.nan
+    else:
+        value = np.full(grid.size, np.nan)
+        value[index] = aggregated
+    return {"date": grid.astype("datetime64[D]"), "day": grid, "value": value, "count": count,
+            "observed": observed, "gap": gap}
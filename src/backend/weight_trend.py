@@ -0,0 +1,158 @@
+"""
+Online weight trend estimation, O(1) work per weigh-in.
+
+`smooth_weight_data` and `data_smoothing.dynamic_savgol_filter` rebuild the smoothed series from the
+full history on every call. Here each user instead keeps a small state dict, and every new weigh-in
+updates it in constant time. The state holds only floats and strings, so it can be stored as JSON
+between requests and picked up again with the same results as an uninterrupted run.
+
+Two estimators are available, both tracking a trend level (kg) and its rate of change (kg/day):
+
+    "ewma"    Holt's double exponential smoothing. alpha smooths the level and beta the rate; both are
+              per-day factors, compounded over gaps between weigh-ins.
+    "kalman"  A local linear trend Kalman filter (level and rate, both random walks). measurement_sd is
+              the day-to-day scale noise, level_sd and rate_sd the daily drift of level and rate. It
+              also reports the uncertainty of both estimates.
+
+Days may be irregular (gaps and several weigh-ins on one day), but must not go backwards.
+
+Example:
+    state = init_trend_state(0, 85.0)
+    state = update_trend_state(state, 1, 84.6)
+    trend_estimate(state)  # {"day": 1, "trend": ..., "rate": ..., ...}
+"""
+import math
+
+TREND_METHODS = ("ewma", "kalman")
+DEFAULT_EWMA_ALPHA = 0.1          # Share of each day's innovation absorbed by the level
+DEFAULT_EWMA_BETA = 0.05          # Share absorbed by the rate
+DEFAULT_MEASUREMENT_SD = 0.5      # kg, scale noise plus day-to-day water and gut content
+DEFAULT_LEVEL_SD = 0.05           # kg per sqrt(day), drift of the true weight beyond the trend
+DEFAULT_RATE_SD = 0.005           # kg/day per sqrt(day), drift of the rate of change
+DEFAULT_INITIAL_RATE_SD = 0.1     # kg/day, prior uncertainty of the rate
+
+
+def init_trend_state(day, weight, method="kalman", alpha=DEFAULT_EWMA_ALPHA, beta=DEFAULT_EWMA_BETA,
+                     measurement_sd=DEFAULT_MEASUREMENT_SD, level_sd=DEFAULT_LEVEL_SD, rate_sd=DEFAULT_RATE_SD,
+                     initial_rate_sd=DEFAULT_INITIAL_RATE_SD):
+    """
+    Start a trend from the first weigh-in.
+
+    Parameters:
+        day (float): Day of the weigh-in (any origin, e.g. days since the user signed up).
+        weight (float): Weight in kilograms.
+        method (str): "ewma" or "kalman".
+        alpha, beta (float): EWMA smoothing factors per day, in (0, 1].
+        measurement_sd, level_sd, rate_sd, initial_rate_sd (float): Kalman noise parameters (see module docstring).
+
+    Returns:
+        dict: Trend state (JSON serializable).
+    """
+    if method == "ewma":
+        if not (0 < alpha <= 1 and 0 < beta <= 1):
+            raise ValueError("alpha and beta must lie in (0, 1].")
+        parameters = {"alpha": float(alpha), "beta": float(beta)}
+    elif method == "kalman":
+        if measurement_sd <= 0 or level_sd < 0 or rate_sd < 0 or initial_rate_sd < 0:
+            raise ValueError("Kalman noise parameters must be non-negative (measurement_sd positive).")
+        parameters = {
+            "measurement_sd": float(measurement_sd), "level_sd": float(level_sd), "rate_sd": float(rate_sd),
+            # Covariance of (level, rate)
+            "p_level": float(measurement_sd) ** 2, "p_cross": 0.0, "p_rate": float(initial_rate_sd) ** 2,
+        }
+    else:
+        raise ValueError(f"Unknown trend method: {method}")
+    return {"method": method, "day": float(day), "level": float(weight), "rate": 0.0, "count": 1, **parameters}
+
+
+def update_trend_state(state, day, weight):
+    """
+    Fold one weigh-in into a trend state.
+
+    Parameters:
+        state (dict): State from init_trend_state or a previous update.
+        day (float): Day of the weigh-in, not before state["day"].
+        weight (float): Weight in kilograms.
+
+    Returns:
+        dict: The updated state (the given state is not modified).
+    """
+    dt = float(day) - state["day"]
+    if dt < 0:
+        raise ValueError(f"Weigh-in on day {day} is before the last update (day {state['day']}).")
+    state = dict(state, day=float(day), count=state["count"] + 1)
+    predicted = state["level"] + state["rate"] * dt
+
+    if state["method"] == "ewma":
+        # Compound the per-day factors over the gap; a same-day weigh-in counts as one day for the level
+        a = 1 - (1 - state["alpha"]) ** max(dt, 1)
+        level = predicted + a * (weight - predicted)
+        if dt > 0:
+            b = 1 - (1 - state["beta"]) ** dt
+            state["rate"] += b * ((level - state["level"]) / dt - state["rate"])
+        state["level"] = level
+        return state
+
+    # Kalman predict: x = F x, P = F P F' + Q with F = [[1, dt], [0, 1]]
+    p_level = state["p_level"] + 2 * dt * state["p_cross"] + dt * dt * state["p_rate"] + state["level_sd"] ** 2 * dt
+    p_cross = state["p_cross"] + dt * state["p_rate"]
+    p_rate = state["p_rate"] + state["rate_sd"] ** 2 * dt
+    # Update with the weigh-in
+    innovation = weight - predicted
+    variance = p_level + state["measurement_sd"] ** 2
+    gain_level, gain_rate = p_level / variance, p_cross / variance
+    state["level"] = predicted + gain_level * innovation
+    state["rate"] += gain_rate * innovation
+    state["p_level"] = (1 - gain_level) * p_level
+    state["p_cross"] = (1 - gain_level) * p_cross
+    state["p_rate"] = p_rate - gain_rate * p_cross
+    return state
+
+
+def trend_estimate(state, day=None):
+    """
+    Read the trend from a state, optionally projected to a later day.
+
+    Parameters:
+        state (dict): Trend state.
+        day (float): Day to report (default: the day of the last weigh-in).
+
+    Returns:
+        dict: "day", "trend" (kg), "rate" (kg/day) and "count" (weigh-ins so far). Kalman states also
+        report "trend_sd" and "rate_sd".
+    """
+    dt = 0.0 if day is None else float(day) - state["day"]
+    estimate = {
+        "day": state["day"] + dt,
+        "trend": state["level"] + state["rate"] * dt,
+        "rate": state["rate"],
+        "count": state["count"],
+    }
+    if state["method"] == "kalman":
+        p_level = state["p_level"] + 2 * dt * state["p_cross"] + dt * dt * state["p_rate"] + state["level_sd"] ** 2 * max(dt, 0)
+        estimate["trend_sd"] = math.sqrt(max(p_level, 0))
+        estimate["rate_sd"] = math.sqrt(max(state["p_rate"] + state["rate_sd"] ** 2 * max(dt, 0), 0))
+    return estimate
+
+
+def smooth_weight_series(days, weights, method="kalman", **parameters):
+    """
+    Run the online estimator over a full history (filtered, i.e. each value uses only earlier weigh-ins).
+
+    Parameters:
+        days (list of float): Weigh-in days, non-decreasing.
+        weights (list of float): Weights in kilograms.
+        method (str): "ewma" or "kalman".
+        **parameters: Passed to init_trend_state.
+
+    Returns:
+        tuple: (list of trend estimates, one per weigh-in; final state).
+    """
+    if len(days) != len(weights) or len(days) == 0:
+        raise ValueError("days and weights must be non-empty and of equal length.")
+    state = init_trend_state(days[0], weights[0], method, **parameters)
+    estimates = [trend_estimate(state)]
+    for day, weight in zip(days[1:], weights[1:]):
+        state = update_trend_state(state, day, weight)
+        estimates.append(trend_estimate(state))
+    return estimates, state